@@ -0,0 +1,188 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from .resilience import LatencyEstimate
+
+# Paths that are answered without taking a slot, so probes never queue behind work
+CRITICAL = 'critical'
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+CLIENT_HEADER = 'X-Client-Id'
+REQUEST_START_HEADER = 'X-Request-Start'
+
+
+class Rejected(Exception):
+    """Admission refused; carries the HTTP status, Retry-After seconds and reason"""
+
+    def __init__(self, status, retry_after, reason):
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def upstream_wait_ms(headers, now=None):
+    """Time a request spent queued in front of the worker, from X-Request-Start
+
+    Routers disagree on units ("t=1712345678.123" seconds, or milliseconds
+    or microseconds since the epoch), so the magnitude picks the unit.
+    """
+    raw = headers.get(REQUEST_START_HEADER)
+    if not raw:
+        return 0.0
+    try:
+        started = float(raw.strip().removeprefix('t='))
+    except ValueError:
+        return 0.0
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    now = time.time() if now is None else now
+    return max(0.0, (now - started) * 1000)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        """Seconds until a token is available; 0 if one was taken"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Bounded in-flight work per worker with fast rejection under overload
+
+    Interactive requests wait at most ``max_queue_wait_ms`` for one of
+    ``max_in_flight`` slots (counting time already spent in the router's
+    queue) and bulk requests may hold at most ``max_bulk_in_flight`` of
+    them, so a burst of batches can't starve single predictions. Critical
+    paths skip admission entirely. Overload answers 503 and per-client
+    rate limits 429, both with a Retry-After estimate.
+    """
+
+    def __init__(self, max_in_flight=8, max_bulk_in_flight=None, max_queue_wait_ms=200, max_queued=16,
+                 client_rate=0.0, client_burst=None, max_clients=10000):
+        self.max_in_flight = int(max_in_flight)
+        self.max_bulk_in_flight = int(max_bulk_in_flight or max(1, self.max_in_flight // 2))
+        self.max_queue_wait_ms = float(max_queue_wait_ms)
+        self.max_queued = int(max_queued)
+        self.client_rate = float(client_rate)
+        self.client_burst = float(client_burst or max(1.0, self.client_rate))
+        self.max_clients = int(max_clients)
+
+        self._condition = threading.Condition()
+        self._buckets = OrderedDict()
+        self.service_time = LatencyEstimate()
+
+        self.in_flight = 0
+        self.bulk_in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.admitted = 0
+        self.shed = {'queue_full': 0, 'queue_timeout': 0, 'upstream_wait': 0, 'rate_limited': 0}
+        self.shed_by_path = {}
+
+    def _retry_after(self):
+        """Whole seconds for the current backlog to drain at the observed service time"""
+        backlog = self.in_flight + self.waiting
+        drain_ms = backlog * max(self.service_time.value_ms, 1.0) / self.max_in_flight
+        return max(1, math.ceil(drain_ms / 1000))
+
+    def _reject(self, path, status, reason, retry_after=None):
+        self.shed[reason] += 1
+        self.shed_by_path[path] = self.shed_by_path.get(path, 0) + 1
+        raise Rejected(status, retry_after or self._retry_after(), reason)
+
+    def _check_rate(self, client, path, now):
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.client_rate, self.client_burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        wait = bucket.take(now)
+        if wait:
+            self._reject(path, 429, 'rate_limited', max(1, math.ceil(wait)))
+
+    def _has_slot(self, priority):
+        if self.in_flight >= self.max_in_flight:
+            return False
+        return priority != BULK or self.bulk_in_flight < self.max_bulk_in_flight
+
+    def acquire(self, path, priority, client=None, queued_ms=0.0):
+        """Take a slot or raise Rejected; returns a token for release()"""
+        start = time.perf_counter()
+        with self._condition:
+            if self.client_rate > 0 and client:
+                self._check_rate(client, path, time.monotonic())
+
+            if queued_ms > self.max_queue_wait_ms:
+                self._reject(path, 503, 'upstream_wait')
+
+            if not self._has_slot(priority):
+                if self.waiting >= self.max_queued:
+                    self._reject(path, 503, 'queue_full')
+
+                deadline = start + (self.max_queue_wait_ms - queued_ms) / 1000
+                self.waiting += 1
+                try:
+                    while not self._has_slot(priority):
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            self._reject(path, 503, 'queue_timeout')
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            self.in_flight += 1
+            if priority == BULK:
+                self.bulk_in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.admitted += 1
+        return (priority, time.perf_counter())
+
+    def release(self, token):
+        priority, started = token
+        with self._condition:
+            self.in_flight -= 1
+            if priority == BULK:
+                self.bulk_in_flight -= 1
+            self.service_time.observe((time.perf_counter() - started) * 1000)
+            # Bulk and interactive waiters share the condition
+            self._condition.notify_all()
+
+    def saturated(self):
+        with self._condition:
+            return self.waiting > 0 or self.in_flight >= self.max_in_flight
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'in_flight': self.in_flight,
+                'bulk_in_flight': self.bulk_in_flight,
+                'waiting': self.waiting,
+                'peak_in_flight': self.peak_in_flight,
+                'max_in_flight': self.max_in_flight,
+                'max_bulk_in_flight': self.max_bulk_in_flight,
+                'max_queue_wait_ms': self.max_queue_wait_ms,
+                'service_time_ms': round(self.service_time.value_ms, 2),
+                'admitted': self.admitted,
+                'shed': dict(self.shed),
+                'shed_total': sum(self.shed.values()),
+                'shed_by_path': dict(self.shed_by_path),
+                'client_rate_per_second': self.client_rate or None,
+            }
@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class FlatForest:
+    """All trees of a fitted sklearn forest concatenated into flat node arrays
+
+    Children are re-indexed into the shared arrays and leaves point at
+    themselves, so every tree can be walked at once with NumPy gathers.
+    ``value`` holds each node's normalized class distribution (classifier)
+    or mean target (regressor), shape (n_nodes, n_outputs).
+    """
+
+    def __init__(self, forest):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        left, right, feature, threshold, value = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            own = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left < 0
+            left.append(np.where(is_leaf, own, tree.children_left + offset))
+            right.append(np.where(is_leaf, own, tree.children_right + offset))
+            feature.append(np.where(is_leaf, -1, tree.feature))
+            threshold.append(tree.threshold)
+
+            node_value = tree.value[:, 0, :].astype(np.float64)
+            if hasattr(forest, 'classes_'):
+                totals = node_value.sum(axis=1, keepdims=True)
+                node_value = node_value / np.where(totals == 0, 1, totals)
+            value.append(node_value)
+
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold)
+        self.value = np.concatenate(value)
+        self.roots = offsets.astype(np.intp)
+        self.n_trees = len(trees)
+        self.n_features = int(forest.n_features_in_)
+        self.n_outputs = self.value.shape[1]
+        self.max_depth = int(max(tree.max_depth for tree in trees))
+        self.classes = [str(c) for c in forest.classes_] if hasattr(forest, 'classes_') else None
+
+    # Everything a walk needs besides the metadata below
+    ARRAYS = ('left', 'right', 'feature', 'threshold', 'value', 'roots')
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def metadata(self):
+        return {'n_features': self.n_features, 'max_depth': self.max_depth, 'classes': self.classes}
+
+    @classmethod
+    def from_arrays(cls, arrays, n_features, max_depth, classes=None):
+        """Rebuild around existing arrays (e.g. views of shared memory) without copying them"""
+        flat = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(flat, name, arrays[name])
+        flat.n_trees = len(flat.roots)
+        flat.n_features = int(n_features)
+        flat.n_outputs = flat.value.shape[1]
+        flat.max_depth = int(max_depth)
+        flat.classes = classes
+        return flat
+
+    def step(self, X, node):
+        """Advance every (row, tree) position one level; leaves stay put"""
+        feature = self.feature[node]
+        internal = feature >= 0
+        rows = np.arange(X.shape[0])[:, None]
+        x = X[rows, np.where(internal, feature, 0)]
+        go_left = x <= self.threshold[node]
+        child = np.where(go_left, self.left[node], self.right[node])
+        return child, feature, internal
+
+    def leaves(self, X, roots=None):
+        """Leaf index of every tree (or of the trees at ``roots``) for every row, shape (n_rows, n_trees)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        node = np.repeat((self.roots if roots is None else roots)[None, :], X.shape[0], axis=0)
+        for _ in range(self.max_depth):
+            node, _, internal = self.step(X, node)
+            if not internal.any():
+                break
+        return node
+
+    def predict(self, X):
+        """Forest output averaged over tree leaves; equals predict_proba for classifiers"""
+        return self.value[self.leaves(X)].mean(axis=1)
+
+
+class ForestExplainer:
+    """Path-based (Saabas) per-feature contributions for a fitted forest
+
+    Each split a sample passes through credits the change in node value
+    to the split feature, so ``bias + contributions.sum(features)``
+    reproduces the forest's prediction exactly. Results are cached per
+    unique feature vector.
+    """
+
+    def __init__(self, forest, cache_size=4096):
+        self.flat = FlatForest(forest)
+        self.bias = self.flat.value[self.flat.roots].mean(axis=0)
+        self.cache_size = int(cache_size)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _compute(self, X):
+        flat = self.flat
+        n_rows = X.shape[0]
+        node = np.repeat(flat.roots[None, :], n_rows, axis=0)
+        contributions = np.zeros((n_rows * flat.n_features, flat.n_outputs))
+        row_base = (np.arange(n_rows) * flat.n_features)[:, None]
+
+        for _ in range(flat.max_depth):
+            child, feature, internal = flat.step(X, node)
+            if not internal.any():
+                break
+            delta = flat.value[child[internal]] - flat.value[node[internal]]
+            slots = (row_base + feature)[internal]
+            for k in range(flat.n_outputs):
+                contributions[:, k] += np.bincount(slots, weights=delta[:, k], minlength=contributions.shape[0])
+            node = child
+
+        contributions /= flat.n_trees
+        return contributions.reshape(n_rows, flat.n_features, flat.n_outputs)
+
+    def contributions(self, X):
+        """Per-row, per-feature, per-output contributions, shape (n, n_features, n_outputs)"""
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        keys = [row.tobytes() for row in X]
+        result = np.empty((X.shape[0], self.flat.n_features, self.flat.n_outputs))
+
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    result[i] = cached
+            self.cache_hits += X.shape[0] - len(missing)
+            self.cache_misses += len(missing)
+
+        if missing:
+            computed = self._compute(X[missing])
+            result[missing] = computed
+            with self._lock:
+                for i, values in zip(missing, computed):
+                    self._cache[keys[i]] = values
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return result
+
+    def explain(self, X, output_index, feature_labels, top_k=3):
+        """Top contributing features toward an output (one index, or one per row)"""
+        contributions = self.contributions(X)
+        rows = np.arange(contributions.shape[0])
+        contributions = contributions[rows, :, np.broadcast_to(output_index, rows.shape)]
+        explanations = []
+        for row in contributions:
+            order = np.argsort(-np.abs(row))[:top_k]
+            explanations.append([(feature_labels[i], int(i), float(row[i])) for i in order])
+        return explanations
@@ -0,0 +1,179 @@
+"""Columnar binary bodies for bulk scoring
+
+Layout, all little-endian::
+
+    header   16 bytes   magic b'SCOL', version u1, reserved u1, n_columns u2, n_rows u4, reserved u4
+    table    28 bytes   per column: name (24 bytes, utf-8, NUL padded), numpy dtype str (4 bytes, e.g. '<f4')
+    padding             zeros up to an 8-byte boundary
+    data                each column's n_rows values back to back, in table order
+
+Requests carry one column per classifier input in FEATURE_COLUMNS order;
+responses use the same layout for the results. This module only needs
+numpy and the standard library so clients can import it on its own.
+"""
+import struct
+import urllib.request
+
+import numpy as np
+
+CONTENT_TYPE = 'application/vnd.student-columns'
+MAGIC = b'SCOL'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sBxHII')
+_COLUMN = struct.Struct('<24s4s')
+
+# Classifier inputs, in the positions prepare_ml_features fills
+FEATURE_COLUMNS = (
+    'gender',
+    'studyTime',
+    'absences',
+    'education',
+    'attendanceRate',
+    'englishAverage',
+    'testPrep',
+    'region',
+    'lunch',
+)
+
+ALLOWED_DTYPES = ('<f4', '<f8', '|u1', '<i4', '<i8')
+PROBABILITY_PREFIX = 'p:'
+
+
+class FormatError(ValueError):
+    pass
+
+
+def _data_offset(n_columns):
+    table_end = _HEADER.size + n_columns * _COLUMN.size
+    return (table_end + 7) & ~7
+
+
+def encode_columns(columns):
+    """Serialize [(name, array), ...] into one columnar body"""
+    columns = [(name, np.asarray(values)) for name, values in columns]
+    n_rows = len(columns[0][1]) if columns else 0
+
+    table = []
+    data = []
+    for name, values in columns:
+        if len(values) != n_rows:
+            raise FormatError(f'column {name} has {len(values)} rows, expected {n_rows}')
+        dtype = values.dtype.newbyteorder('<') if values.dtype.byteorder == '>' else values.dtype
+        if dtype.str not in ALLOWED_DTYPES:
+            raise FormatError(f'column {name} has unsupported dtype {dtype.str}')
+        table.append(_COLUMN.pack(name.encode(), dtype.str.encode()))
+        data.append(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+    header = _HEADER.pack(MAGIC, VERSION, len(columns), n_rows, 0)
+    head = header + b''.join(table)
+    return head + b'\0' * (_data_offset(len(columns)) - len(head)) + b''.join(data)
+
+
+def _read_table(body):
+    if len(body) < _HEADER.size:
+        raise FormatError('body shorter than the columnar header')
+    magic, version, n_columns, n_rows, _ = _HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise FormatError('not a columnar body (bad magic)')
+    if version != VERSION:
+        raise FormatError(f'unsupported columnar version {version}')
+
+    offset = _data_offset(n_columns)
+    if len(body) < offset:
+        raise FormatError('body shorter than its column table')
+
+    table = []
+    for i in range(n_columns):
+        raw_name, raw_dtype = _COLUMN.unpack_from(body, _HEADER.size + i * _COLUMN.size)
+        dtype_str = raw_dtype.rstrip(b'\0').decode('ascii', 'replace')
+        if dtype_str not in ALLOWED_DTYPES:
+            raise FormatError(f'unsupported dtype {dtype_str!r}')
+        table.append((raw_name.rstrip(b'\0').decode('utf-8', 'replace'), np.dtype(dtype_str)))
+
+    expected = offset + n_rows * sum(dtype.itemsize for _, dtype in table)
+    if len(body) != expected:
+        raise FormatError(f'body is {len(body)} bytes, header describes {expected}')
+    return table, n_rows, offset
+
+
+def decode_columns(body):
+    """{name: array} views over the body; nothing is copied"""
+    table, n_rows, offset = _read_table(body)
+    columns = {}
+    for name, dtype in table:
+        columns[name] = np.frombuffer(body, dtype=dtype, count=n_rows, offset=offset)
+        offset += n_rows * dtype.itemsize
+    return columns
+
+
+def feature_matrix(body, expected=FEATURE_COLUMNS):
+    """(n_rows, n_features) matrix for a request body whose columns are exactly ``expected``
+
+    When every column shares one dtype the matrix is a transposed view of
+    the data section itself; mixed dtypes are stacked into a new array.
+    """
+    table, n_rows, offset = _read_table(body)
+    names = tuple(name for name, _ in table)
+    if names != tuple(expected):
+        raise FormatError(f"columns must be {', '.join(expected)} in that order; got {', '.join(names)}")
+
+    dtypes = {dtype for _, dtype in table}
+    if len(dtypes) == 1:
+        dtype = dtypes.pop()
+        return np.frombuffer(body, dtype=dtype, count=n_rows * len(table), offset=offset).reshape(len(table), n_rows).T
+
+    columns = decode_columns(body)
+    return np.column_stack([columns[name].astype(np.float32) for name in names])
+
+
+def result_columns(classes, probabilities, scores=None, score_spread=None):
+    """Response columns for one scored batch: class index, confidence, per-class probability, scores"""
+    probabilities = np.asarray(probabilities, dtype=np.float32)
+    predicted = np.argmax(probabilities, axis=1)
+    columns = [
+        ('riskLevel', predicted.astype(np.uint8)),
+        ('confidence', probabilities[np.arange(len(predicted)), predicted]),
+    ]
+    columns.extend((PROBABILITY_PREFIX + str(name), probabilities[:, i]) for i, name in enumerate(classes))
+    if scores is not None:
+        columns.append(('predictedScore', np.asarray(scores, dtype=np.float32)))
+    if score_spread is not None:
+        columns.append(('scoreSpread', np.asarray(score_spread, dtype=np.float32)))
+    return columns
+
+
+def classes_of(columns):
+    """Class names in riskLevel index order, recovered from the probability column names"""
+    return [name[len(PROBABILITY_PREFIX):] for name in columns if name.startswith(PROBABILITY_PREFIX)]
+
+
+def predict_columns(url, features, fields=None, timeout=30, headers=None):
+    """Client helper: score a feature matrix through /predict/batch in columnar form
+
+    ``features`` is an (n_rows, 9) array in FEATURE_COLUMNS order (or a
+    dict of those columns). Returns the decoded result columns plus
+    ``classes`` and ``labels`` (the predicted class name per row).
+    """
+    if isinstance(features, dict):
+        columns = [(name, np.asarray(features[name], dtype=np.float32)) for name in FEATURE_COLUMNS]
+    else:
+        matrix = np.asarray(features, dtype=np.float32)
+        columns = [(name, matrix[:, i]) for i, name in enumerate(FEATURE_COLUMNS)]
+
+    target = url.rstrip('/') + '/predict/batch'
+    if fields:
+        target += '?fields=' + ','.join(fields)
+    req = urllib.request.Request(target, data=encode_columns(columns), method='POST')
+    req.add_header('Content-Type', CONTENT_TYPE)
+    req.add_header('Accept', CONTENT_TYPE)
+    for key, value in (headers or {}).items():
+        req.add_header(key, value)
+
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        result = decode_columns(response.read())
+
+    classes = classes_of(result)
+    result['classes'] = classes
+    result['labels'] = np.asarray(classes, dtype=object)[result['riskLevel']]
+    return result
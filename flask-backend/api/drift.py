@@ -0,0 +1,215 @@
+import glob
+import json
+import os
+import threading
+import time
+import zipfile
+from bisect import bisect_right
+
+import numpy as np
+
+# StudentRecord slot behind each payload key the reference describes
+FEATURE_SLOTS = {
+    'gender': 'gender',
+    'studyTimePerWeek': 'study_time_per_week',
+    'absences': 'absences',
+    'studentEducation': 'student_education',
+    'testPrep': 'test_prep',
+    'attendanceRate': 'attendance_rate',
+    'englishAverage': 'english_avg',
+}
+
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+# Floor for empty bins so PSI stays finite
+_EPSILON = 1e-4
+
+
+def load_reference(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def psi(expected, actual):
+    """Population stability index between two count vectors over the same bins"""
+    p = np.maximum(expected / max(expected.sum(), 1), _EPSILON)
+    q = np.maximum(actual / max(actual.sum(), 1), _EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def binned_ks(expected, actual):
+    """Kolmogorov-Smirnov statistic on binned data: the largest CDF gap at a bin edge"""
+    p = np.cumsum(expected) / max(expected.sum(), 1)
+    q = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.max(np.abs(p - q)))
+
+
+class DriftMonitor:
+    """Sliding-window input histograms compared against the training reference
+
+    The window is a ring of ``buckets`` sub-windows; observing a request
+    increments one counter per feature in the current sub-window and
+    clears a sub-window only when the ring wraps onto it, so each update
+    is O(1). Counts are plain integers, so workers merge by addition:
+    with ``state_dir`` set each worker publishes its ring there every
+    ``publish_seconds`` and reports include every live worker's counts.
+    """
+
+    def __init__(self, reference, window_seconds=3600, buckets=12, state_dir=None,
+                 publish_seconds=10, min_samples=100):
+        self.reference = reference
+        self.window_seconds = float(window_seconds)
+        self.buckets = int(buckets)
+        self.bucket_seconds = self.window_seconds / self.buckets
+        self.state_dir = state_dir
+        self.publish_seconds = float(publish_seconds)
+        self.min_samples = int(min_samples)
+
+        self._features = []
+        offset = 0
+        for feature in reference['features']:
+            if feature['name'] not in FEATURE_SLOTS:
+                continue
+            if feature['kind'] == 'category':
+                lookup = {value: i for i, value in enumerate(feature['categories'])}
+                size = len(feature['categories']) + 1
+            else:
+                lookup = feature['edges']
+                size = len(feature['edges']) - 1
+            self._features.append((feature, FEATURE_SLOTS[feature['name']], lookup, offset, size))
+            offset += size
+
+        self._counts = np.zeros((self.buckets, offset), dtype=np.int64)
+        self._epochs = np.full(self.buckets, -1, dtype=np.int64)
+        self._index = np.zeros(len(self._features), dtype=np.intp)
+        self._lock = threading.Lock()
+        self._last_publish = 0.0
+        self.observed = 0
+
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def _bins(self, student):
+        for i, (feature, slot, lookup, offset, size) in enumerate(self._features):
+            value = getattr(student, slot)
+            if feature['kind'] == 'category':
+                position = lookup.get(value, size - 1)
+            else:
+                position = min(max(bisect_right(lookup, value) - 1, 0), size - 1)
+            self._index[i] = offset + position
+        return self._index
+
+    def observe(self, student, now=None):
+        now = time.time() if now is None else now
+        epoch = int(now // self.bucket_seconds)
+        slot = epoch % self.buckets
+
+        with self._lock:
+            if self._epochs[slot] != epoch:
+                self._counts[slot] = 0
+                self._epochs[slot] = epoch
+            self._counts[slot, self._bins(student)] += 1
+            self.observed += 1
+
+            if self.state_dir and now - self._last_publish >= self.publish_seconds:
+                self._publish_locked(now)
+
+    def _live(self, epochs, now):
+        current = int(now // self.bucket_seconds)
+        return (epochs > current - self.buckets) & (epochs <= current)
+
+    def _publish_locked(self, now):
+        self._last_publish = now
+        path = os.path.join(self.state_dir, f'drift-{os.getpid()}.npz')
+        # Outside the drift-*.npz pattern readers glob; a file object stops savez appending .npz
+        staging = os.path.join(self.state_dir, f'.drift-{os.getpid()}.tmp')
+        try:
+            with open(staging, 'wb') as f:
+                np.savez(f, counts=self._counts, epochs=self._epochs, bucket_seconds=self.bucket_seconds)
+            os.replace(staging, path)
+        except OSError as e:
+            print(f" Drift state publish failed: {e}")
+
+    def window_counts(self, now=None, merge=True):
+        """Counts over the current window; summed across workers when merge is set"""
+        now = time.time() if now is None else now
+        with self._lock:
+            total = self._counts[self._live(self._epochs, now)].sum(axis=0)
+        workers = 1
+
+        if merge and self.state_dir:
+            own = f'drift-{os.getpid()}.npz'
+            for path in glob.glob(os.path.join(self.state_dir, 'drift-*.npz')):
+                if os.path.basename(path) == own:
+                    continue
+                try:
+                    if now - os.path.getmtime(path) > self.window_seconds:
+                        os.remove(path)
+                        continue
+                    with np.load(path) as state:
+                        if state['counts'].shape != self._counts.shape or float(state['bucket_seconds']) != self.bucket_seconds:
+                            continue
+                        total = total + state['counts'][self._live(state['epochs'], now)].sum(axis=0)
+                        workers += 1
+                except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+                    # A worker may be replacing its file right now
+                    continue
+
+        return total, workers
+
+    def report(self, now=None, merge=True):
+        counts, workers = self.window_counts(now, merge)
+        features = {}
+        worst = 0.0
+
+        for feature, _, _, offset, size in self._features:
+            actual = counts[offset:offset + size]
+            expected = np.asarray(feature['counts'], dtype=np.int64)
+            n = int(actual.sum())
+            entry = {'kind': feature['kind'], 'samples': n}
+
+            if n >= self.min_samples:
+                entry['psi'] = round(psi(expected, actual), 4)
+                worst = max(worst, entry['psi'])
+                if feature['kind'] == 'numeric':
+                    entry['ks'] = round(binned_ks(expected, actual), 4)
+                else:
+                    entry['unknown_share'] = round(float(actual[-1]) / n, 4)
+                entry['status'] = (
+                    'significant' if entry['psi'] >= PSI_SIGNIFICANT
+                    else 'moderate' if entry['psi'] >= PSI_MODERATE
+                    else 'stable'
+                )
+            else:
+                entry['status'] = 'insufficient_data'
+
+            labels = (
+                feature['categories'] + ['(other)'] if feature['kind'] == 'category'
+                else [f"{lo:g}-{hi:g}" for lo, hi in zip(feature['edges'][:-1], feature['edges'][1:])]
+            )
+            expected_share = expected / max(expected.sum(), 1)
+            actual_share = actual / max(n, 1)
+            shift = actual_share - expected_share
+            top = np.argsort(-np.abs(shift))[:3] if n else []
+            entry['largest_shifts'] = [
+                {'bin': labels[i], 'reference': round(float(expected_share[i]), 4), 'current': round(float(actual_share[i]), 4)}
+                for i in top
+            ]
+            features[feature['name']] = entry
+
+        samples = max((entry['samples'] for entry in features.values()), default=0)
+        return {
+            'window_seconds': self.window_seconds,
+            'samples': samples,
+            'workers': workers,
+            'reference_rows': self.reference.get('rows'),
+            'max_psi': round(worst, 4),
+            'status': (
+                'insufficient_data' if samples < self.min_samples
+                else 'significant' if worst >= PSI_SIGNIFICANT
+                else 'moderate' if worst >= PSI_MODERATE
+                else 'stable'
+            ),
+            'features': features,
+        }
@@ -0,0 +1,170 @@
+import math
+import threading
+
+import numpy as np
+
+from .attribution import FlatForest
+
+MODES = ('exact', 'confidence')
+# Slack on the exact bound so float summation order can't decide a tie
+EPSILON = 1e-9
+
+
+def tree_swing(flat):
+    """Per tree, the most any one leaf moves class b's vote above class a's: shape (n_trees, C, C)
+
+    ``swing[t, a, b] = max over t's leaves of (p_b - p_a)``; summed over
+    the trees not yet evaluated, it bounds how far b can still catch up.
+    """
+    ends = np.append(flat.roots[1:], len(flat.feature))
+    swing = np.empty((flat.n_trees, flat.n_outputs, flat.n_outputs))
+    for t, (start, end) in enumerate(zip(flat.roots, ends)):
+        leaves = flat.value[start:end][flat.feature[start:end] < 0]
+        swing[t] = (leaves[:, None, :] - leaves[:, :, None]).max(axis=0)
+    return swing
+
+
+def tree_purity(forest):
+    """Sample-weighted mean of each tree's largest leaf class share"""
+    purity = np.empty(len(forest.estimators_))
+    for t, estimator in enumerate(forest.estimators_):
+        tree = estimator.tree_
+        leaf = tree.children_left < 0
+        value = tree.value[leaf, 0, :]
+        share = value.max(axis=1) / np.maximum(value.sum(axis=1), 1e-12)
+        weight = tree.weighted_n_node_samples[leaf]
+        purity[t] = (share * weight).sum() / weight.sum()
+    return purity
+
+
+class EarlyExitForest:
+    """predict_proba for a fitted forest classifier that stops walking trees once the vote is settled
+
+    Trees run in an order fixed at load time: by agreement with the
+    whole forest on ``reference`` rows when given (most accurate first),
+    otherwise by leaf purity. The first block runs up to the earliest
+    tree count at which any row could stop, then blocks of ``block``
+    follow; after each a row stops if
+
+    * ``exact``: no leaves of the remaining trees could lift another
+      class past the leader, so the predicted label is always the full
+      forest's;
+    * ``confidence``: that, or after ``min_trees`` a Hoeffding bound
+      puts the leader's mean margin over every other class above zero
+      with probability at least ``1 - delta``. Cheaper, but the label
+      may (rarely) differ.
+
+    Probabilities are averaged over the trees a row actually used.
+
+    In exact mode, batches under ``min_rows`` walk every tree in one
+    pass: for a few rows the vectorized walk costs per depth level, not
+    per tree, and an exact exit comes too late (past half the forest)
+    to pay for the extra passes.
+    """
+
+    def __init__(self, forest, mode='exact', delta=0.01, min_trees=10, block=5, min_rows=32, reference=None,
+                 flat=None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        self.forest = forest
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+        self.flat = flat if flat is not None else FlatForest(forest)
+        self.mode = mode
+        self.delta = float(delta)
+        self.min_trees = int(min_trees)
+        self.block = max(1, int(block))
+        self.min_rows = int(min_rows) if mode == 'exact' else 0
+        self.n_trees = self.flat.n_trees
+
+        if reference is not None and len(reference):
+            reference = np.ascontiguousarray(reference, dtype=np.float32)
+            leaves = self.flat.leaves(reference)
+            labels = self.flat.value[leaves].mean(axis=1).argmax(axis=1)
+            agreement = (self.flat.value[leaves].argmax(axis=2) == labels[:, None]).mean(axis=0)
+            self.order = np.lexsort((-tree_purity(forest), -agreement))
+            self.ordered_by = 'agreement'
+        else:
+            self.order = np.argsort(-tree_purity(forest), kind='stable')
+            self.ordered_by = 'purity'
+        self.roots = self.flat.roots[self.order]
+
+        # remaining[k] bounds what trees order[k:] can still add to (b - a)
+        swing = tree_swing(self.flat)[self.order]
+        self.remaining = np.concatenate([np.cumsum(swing[::-1], axis=0)[::-1], np.zeros((1,) + swing.shape[1:])])
+        # Fewest trees after which even a unanimous vote (margin k) can settle; the first block walks them all
+        off_diagonal = ~np.eye(self.flat.n_outputs, dtype=bool)
+        feasible = [k for k in range(1, self.n_trees + 1)
+                    if ((k > self.remaining[k] + EPSILON) | ~off_diagonal).all(axis=1).any()]
+        self.first_exit = feasible[0] if feasible else self.n_trees
+
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.trees_walked = 0
+        self.exited = 0
+
+    def _settled(self, sums, k):
+        rows = np.arange(len(sums))
+        lead = sums.argmax(axis=1)
+        margin = sums[rows, lead][:, None] - sums
+        own = np.arange(sums.shape[1])[None, :] == lead[:, None]
+        settled = ((margin > self.remaining[k][lead] + EPSILON) | own).all(axis=1)
+        if self.mode == 'confidence' and k >= self.min_trees:
+            # Per-tree margins lie in [-1, 1]
+            bound = math.sqrt(2 * math.log(1 / self.delta) / k)
+            settled |= ((margin / k > bound) | own).all(axis=1)
+        return settled
+
+    def walk(self, X):
+        """Summed class distributions and the number of trees walked, per row"""
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        sums = np.zeros((X.shape[0], self.flat.n_outputs))
+        used = np.zeros(X.shape[0], dtype=np.intp)
+        active = np.arange(X.shape[0])
+
+        if X.shape[0] < self.min_rows:
+            leaves = self.flat.leaves(X)
+            return self.flat.value[leaves].sum(axis=1), np.full(X.shape[0], self.n_trees)
+
+        k = 0
+        first = self.first_exit if self.mode == 'exact' else min(self.first_exit, self.min_trees)
+        first = max(self.block, first)
+        while k < self.n_trees and len(active):
+            stop = min(self.n_trees, first if k == 0 else k + self.block)
+            leaves = self.flat.leaves(X[active], self.roots[k:stop])
+            sums[active] += self.flat.value[leaves].sum(axis=1)
+            k = stop
+            used[active] = k
+            if k < self.n_trees:
+                active = active[~self._settled(sums[active], k)]
+        return sums, used
+
+    def predict_proba(self, X):
+        sums, used = self.walk(X)
+        with self._lock:
+            self.rows += len(used)
+            self.trees_walked += int(used.sum())
+            self.exited += int(np.count_nonzero(used < self.n_trees))
+        return sums / used[:, None]
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def stats(self):
+        with self._lock:
+            rows, walked, exited = self.rows, self.trees_walked, self.exited
+        average = walked / rows if rows else None
+        return {
+            'mode': self.mode,
+            'ordered_by': self.ordered_by,
+            'n_trees': self.n_trees,
+            'block': self.block,
+            'first_exit': self.first_exit,
+            'min_rows': self.min_rows,
+            'min_trees': self.min_trees if self.mode == 'confidence' else None,
+            'delta': self.delta if self.mode == 'confidence' else None,
+            'rows': rows,
+            'avg_trees': round(average, 2) if average is not None else None,
+            'trees_saved_fraction': round(1 - average / self.n_trees, 4) if average is not None else None,
+            'early_exit_fraction': round(exited / rows, 4) if rows else None,
+        }
@@ -0,0 +1,346 @@
+import functools
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import Response, jsonify, make_response, request
+
+from .admission import CLIENT_HEADER
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Outcomes of claiming a key
+OWNER = 'owner'
+REPLAY = 'replay'
+CONFLICT = 'conflict'
+IN_PROGRESS = 'in_progress'
+
+StoredResponse = namedtuple('StoredResponse', ['fingerprint', 'created', 'status', 'content_type', 'body'])
+Claim = namedtuple('Claim', ['state', 'response'])
+
+
+def request_fingerprint(req):
+    """Hash of what the key promises to stand for: method, path, query and body"""
+    digest = hashlib.sha256()
+    for part in (req.method, req.path, req.query_string.decode('latin-1')):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    digest.update(req.get_data(cache=True))
+    return digest.hexdigest()[:32]
+
+
+class IdempotencyStore:
+    """Bounded in-process map from idempotency key to the response it produced
+
+    The first request with a key claims it and runs; duplicates that
+    arrive while it is still running wait up to ``wait_seconds`` for its
+    response instead of running the view again. Entries expire after
+    ``ttl_seconds`` and the oldest are evicted first once the store holds
+    more than ``max_entries`` responses or ``max_bytes`` of bodies.
+    """
+
+    def __init__(self, ttl_seconds=86400, max_entries=10000, max_bytes=32 * 1024 ** 2, wait_seconds=10):
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self.wait_seconds = float(wait_seconds)
+
+        self._condition = threading.Condition()
+        # Insertion order is creation order, so the oldest entry is always first
+        self._entries = OrderedDict()
+        self._pending = {}
+        self.bytes = 0
+
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+        self.evicted = 0
+
+    def _evict_locked(self, now):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if (
+                now - entry.created < self.ttl_seconds
+                and len(self._entries) <= self.max_entries
+                and self.bytes <= self.max_bytes
+            ):
+                break
+            del self._entries[key]
+            self.bytes -= len(entry.body)
+            self.evicted += 1
+
+    def _lookup_locked(self, key, fingerprint, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry.created >= self.ttl_seconds:
+            del self._entries[key]
+            self.bytes -= len(entry.body)
+            self.evicted += 1
+            return None
+        if entry.fingerprint != fingerprint:
+            self.conflicts += 1
+            return Claim(CONFLICT, None)
+        self.replayed += 1
+        return Claim(REPLAY, entry)
+
+    def claim(self, key, fingerprint, wait=True):
+        """Claim ``key``; with ``wait`` False a running original answers IN_PROGRESS at once"""
+        deadline = time.monotonic() + self.wait_seconds
+        with self._condition:
+            if wait and key in self._pending:
+                self.waited += 1
+            while key in self._pending:
+                if self._pending[key] != fingerprint:
+                    self.conflicts += 1
+                    return Claim(CONFLICT, None)
+                if not wait:
+                    return Claim(IN_PROGRESS, None)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return Claim(IN_PROGRESS, None)
+                self._condition.wait(remaining)
+
+            found = self._lookup_locked(key, fingerprint, time.time())
+            if found is not None:
+                return found
+            self._pending[key] = fingerprint
+            return Claim(OWNER, None)
+
+    def complete(self, key, fingerprint, status, content_type, body):
+        now = time.time()
+        with self._condition:
+            self._pending.pop(key, None)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous.body)
+            self._entries[key] = StoredResponse(fingerprint, now, status, content_type, body)
+            self.bytes += len(body)
+            self._evict_locked(now)
+            self._condition.notify_all()
+
+    def release(self, key):
+        """Give the key up without a response so a waiting duplicate can run it"""
+        with self._condition:
+            self._pending.pop(key, None)
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'in_progress': len(self._pending),
+                'replayed': self.replayed,
+                'waited': self.waited,
+                'conflicts': self.conflicts,
+                'evicted': self.evicted,
+                'ttl_seconds': self.ttl_seconds,
+                'max_entries': self.max_entries,
+            }
+
+
+class SQLiteIdempotencyStore:
+    """The same contract kept in a SQLite file, so every worker on a host shares it
+
+    A claim is a row with no status yet; other workers poll it until the
+    owner fills in the response. A claim older than ``lease_seconds`` is
+    treated as abandoned by a worker that died mid-request and taken over.
+    """
+
+    POLL_SECONDS = 0.02
+
+    def __init__(self, path, ttl_seconds=86400, max_entries=10000, wait_seconds=10, lease_seconds=60):
+        self.path = path
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = int(max_entries)
+        self.wait_seconds = float(wait_seconds)
+        self.lease_seconds = float(lease_seconds)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+
+        with self._transaction() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS idempotency ('
+                ' key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, created REAL NOT NULL,'
+                ' status INTEGER, content_type TEXT, body BLOB)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idempotency_created ON idempotency (created)')
+
+    def _transaction(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def claim(self, key, fingerprint, wait=True):
+        deadline = time.monotonic() + self.wait_seconds
+        waited = False
+        while True:
+            now = time.time()
+            with self._transaction() as conn:
+                row = conn.execute(
+                    'SELECT fingerprint, created, status, content_type, body FROM idempotency WHERE key = ?', (key,)
+                ).fetchone()
+
+                expired = row is not None and (
+                    now - row[1] >= (self.ttl_seconds if row[2] is not None else self.lease_seconds)
+                )
+                if row is None or expired:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO idempotency (key, fingerprint, created) VALUES (?, ?, ?)',
+                        (key, fingerprint, now)
+                    )
+                    return Claim(OWNER, None)
+
+            if row[0] != fingerprint:
+                self._count('conflicts')
+                return Claim(CONFLICT, None)
+            if row[2] is not None:
+                self._count('replayed')
+                return Claim(REPLAY, StoredResponse(*row))
+
+            if not wait:
+                return Claim(IN_PROGRESS, None)
+            if not waited:
+                waited = True
+                self._count('waited')
+            if time.monotonic() >= deadline:
+                return Claim(IN_PROGRESS, None)
+            time.sleep(self.POLL_SECONDS)
+
+    def complete(self, key, fingerprint, status, content_type, body):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'UPDATE idempotency SET status = ?, content_type = ?, body = ? WHERE key = ? AND fingerprint = ?',
+                (status, content_type, body, key, fingerprint)
+            )
+            conn.execute('DELETE FROM idempotency WHERE status IS NOT NULL AND created < ?', (now - self.ttl_seconds,))
+            conn.execute(
+                'DELETE FROM idempotency WHERE key IN ('
+                ' SELECT key FROM idempotency WHERE status IS NOT NULL ORDER BY created DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def release(self, key):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM idempotency WHERE key = ? AND status IS NULL', (key,))
+
+    def stats(self):
+        with self._transaction() as conn:
+            entries, in_progress, size = conn.execute(
+                'SELECT COUNT(status), COUNT(*) - COUNT(status), COALESCE(SUM(LENGTH(body)), 0) FROM idempotency'
+            ).fetchone()
+        with self._lock:
+            return {
+                'backend': 'sqlite',
+                'entries': entries,
+                'bytes': size,
+                'in_progress': in_progress,
+                'replayed': self.replayed,
+                'waited': self.waited,
+                'conflicts': self.conflicts,
+                'ttl_seconds': self.ttl_seconds,
+                'max_entries': self.max_entries,
+            }
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT around a block, so read-then-claim is atomic across processes"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+        return False
+
+
+def _error(status, message, retry_after=None):
+    response = jsonify({'success': False, 'error': message})
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def idempotent(get_store, suspend=None):
+    """Route decorator: replay the stored response for a repeated Idempotency-Key
+
+    ``get_store`` returns the store to use, or None to pass requests
+    straight through. Keys are scoped per client (X-Client-Id). A key
+    reused with a different body is a 422; a duplicate still waiting
+    when its original hasn't finished is a 409 with Retry-After.
+    Responses of 5xx are not stored, so those retries run again.
+
+    ``suspend`` is called before a duplicate waits, to give back what the
+    request holds (its admission slot); it returns a function to take it
+    again should the duplicate end up running the view, which returns a
+    response to answer with instead when that fails.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            store = get_store()
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if store is None or not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return _error(400, f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters')
+
+            scoped_key = f"{request.headers.get(CLIENT_HEADER, '')}:{key}"
+            fingerprint = request_fingerprint(request)
+            claim = store.claim(scoped_key, fingerprint, wait=False)
+            if claim.state == IN_PROGRESS:
+                resume = suspend() if suspend is not None else None
+                claim = store.claim(scoped_key, fingerprint)
+                if claim.state == OWNER and resume is not None:
+                    refused = resume()
+                    if refused is not None:
+                        store.release(scoped_key)
+                        return refused
+
+            if claim.state == REPLAY:
+                stored = claim.response
+                response = Response(stored.body, status=stored.status, content_type=stored.content_type)
+                response.headers[REPLAYED_HEADER] = 'true'
+                return response
+            if claim.state == CONFLICT:
+                return _error(422, f'{IDEMPOTENCY_HEADER} was already used for a different request')
+            if claim.state == IN_PROGRESS:
+                return _error(409, 'A request with this Idempotency-Key is still in progress', retry_after=1)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                store.release(scoped_key)
+                raise
+
+            if response.status_code >= 500 or response.direct_passthrough:
+                store.release(scoped_key)
+            else:
+                store.complete(scoped_key, fingerprint, response.status_code, response.content_type, response.get_data())
+            return response
+        return wrapper
+    return decorator
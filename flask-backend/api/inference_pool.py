@@ -0,0 +1,317 @@
+import json
+import math
+import os
+import queue
+import select
+import subprocess
+import sys
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .attribution import FlatForest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Rows below which a batch is not worth splitting across workers
+MIN_CHUNK_ROWS = 64
+
+
+class WorkerFailed(RuntimeError):
+    pass
+
+
+def _layout(arrays):
+    """Byte offset, dtype and shape of each array in one 64-byte aligned block"""
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        offset = (offset + 63) & ~63
+        layout[name] = [offset, array.dtype.str, list(array.shape)]
+        offset += array.nbytes
+    return layout, max(offset, 1)
+
+
+def _view(shm, spec):
+    offset, dtype, shape = spec
+    return np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    # Workers are not multiprocessing children, so their own resource tracker
+    # would unlink the parent's segments when they exit.
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class _Slot:
+    """One worker process with its own shared input and output buffers"""
+
+    def __init__(self, index, n_features, n_outputs, max_rows):
+        self.index = index
+        self.lock = threading.Lock()
+        self.input_shm = shared_memory.SharedMemory(create=True, size=max_rows * n_features * 4)
+        self.output_shm = shared_memory.SharedMemory(create=True, size=max_rows * n_outputs * 8)
+        self.inputs = np.ndarray((max_rows, n_features), dtype=np.float32, buffer=self.input_shm.buf)
+        self.outputs = np.ndarray((max_rows, n_outputs), dtype=np.float64, buffer=self.output_shm.buf)
+        self.process = None
+        self.rows = 0
+
+    def close(self):
+        # Views must go before the mappings can close
+        self.inputs = self.outputs = None
+        for shm in (self.input_shm, self.output_shm):
+            shm.close()
+            shm.unlink()
+
+
+class InferencePool:
+    """predict_proba in worker processes that share one copy of the forest
+
+    The classifier is flattened once into node arrays in a shared-memory
+    block; each worker maps it read-only and owns a pair of shared
+    buffers for feature rows in and probabilities out, so only a row
+    count crosses the pipe. Large batches are split across idle workers.
+    Workers found dead, or that miss ``timeout`` seconds, are restarted
+    and the batch is retried once on the fresh process.
+
+    Exposes ``classes_`` and ``predict_proba`` so it can stand in for the
+    classifier in score_batch.
+    """
+
+    def __init__(self, classifier, processes=2, max_rows=1024, timeout=30, supervise_seconds=1.0):
+        flat = FlatForest(classifier)
+        self.classes_ = classifier.classes_
+        self.n_features_in_ = flat.n_features
+        self.n_outputs = flat.n_outputs
+        self.processes = int(processes)
+        self.max_rows = int(max_rows)
+        self.timeout = float(timeout)
+
+        arrays = flat.arrays()
+        self._layout, size = _layout(arrays)
+        self._model_shm = shared_memory.SharedMemory(create=True, size=size)
+        for name, array in arrays.items():
+            _view(self._model_shm, self._layout[name])[...] = array
+        self._metadata = flat.metadata()
+        self.model_bytes = size
+
+        self._idle = queue.Queue()
+        self._slots = []
+        self._stats_lock = threading.Lock()
+        self._closed = threading.Event()
+        self.batches = 0
+        self.rows = 0
+        self.restarts = 0
+        self.failures = 0
+
+        for index in range(self.processes):
+            slot = _Slot(index, self.n_features_in_, self.n_outputs, self.max_rows)
+            self._start(slot)
+            self._slots.append(slot)
+            self._idle.put(slot)
+
+        self._supervisor = threading.Thread(
+            target=self._supervise, args=(float(supervise_seconds),), name='inference-supervisor', daemon=True
+        )
+        self._supervisor.start()
+
+    def _start(self, slot):
+        config = json.dumps({
+            'model': self._model_shm.name,
+            'layout': self._layout,
+            'metadata': self._metadata,
+            'inputs': slot.input_shm.name,
+            'outputs': slot.output_shm.name,
+            'max_rows': self.max_rows,
+        })
+        slot.process = subprocess.Popen(
+            [sys.executable, '-m', 'api.inference_pool', config],
+            cwd=BACKEND_DIR,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            # One thread per worker: the pool is the parallelism
+            env={**os.environ, 'OMP_NUM_THREADS': '1', 'OPENBLAS_NUM_THREADS': '1', 'MKL_NUM_THREADS': '1'}
+        )
+
+    def _restart(self, slot):
+        process = slot.process
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        for stream in (process.stdin, process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        self._start(slot)
+        with self._stats_lock:
+            self.restarts += 1
+        print(f" Inference worker {slot.index} restarted (exit code {process.returncode})")
+
+    def _supervise(self, interval):
+        while not self._closed.wait(interval):
+            for slot in self._slots:
+                # Busy slots are checked by the caller that holds them
+                if slot.process.poll() is not None and slot.lock.acquire(blocking=False):
+                    try:
+                        if not self._closed.is_set() and slot.process.poll() is not None:
+                            self._restart(slot)
+                    finally:
+                        slot.lock.release()
+
+    def _send(self, slot, n_rows):
+        slot.process.stdin.write(b'%d\n' % n_rows)
+        slot.process.stdin.flush()
+
+    def _submit(self, slot, rows):
+        slot.inputs[:len(rows)] = rows
+        slot.rows = len(rows)
+        try:
+            self._send(slot, slot.rows)
+        except (BrokenPipeError, OSError):
+            # Found dead on submit; collect() restarts and resends
+            pass
+
+    def _reply(self, slot):
+        stdout = slot.process.stdout
+        ready, _, _ = select.select([stdout], [], [], self.timeout)
+        if not ready:
+            raise TimeoutError(f'inference worker {slot.index} did not answer in {self.timeout:g}s')
+        line = stdout.readline()
+        if not line:
+            raise EOFError(f'inference worker {slot.index} exited')
+        if not line.startswith(b'ok'):
+            raise WorkerFailed(line.decode(errors='replace').strip())
+
+    def _collect(self, slot, out):
+        for attempt in range(2):
+            try:
+                if attempt:
+                    self._send(slot, slot.rows)
+                self._reply(slot)
+                out[...] = slot.outputs[:slot.rows]
+                return
+            except WorkerFailed:
+                with self._stats_lock:
+                    self.failures += 1
+                raise
+            except (TimeoutError, EOFError, BrokenPipeError, OSError):
+                with self._stats_lock:
+                    self.failures += 1
+                # The inputs are still in the slot's buffer, so a fresh worker can rerun them
+                self._restart(slot)
+        raise WorkerFailed(f'inference worker {slot.index} failed twice on one batch')
+
+    def _finish(self, slot, out, release=True):
+        try:
+            self._collect(slot, out)
+        except BaseException:
+            self._release(slot)
+            raise
+        if release:
+            self._release(slot)
+
+    def _acquire(self, block):
+        try:
+            slot = self._idle.get(block=block)
+        except queue.Empty:
+            return None
+        slot.lock.acquire()
+        return slot
+
+    def _release(self, slot):
+        slot.lock.release()
+        self._idle.put(slot)
+
+    def predict_proba(self, X):
+        if self._closed.is_set():
+            raise RuntimeError('inference pool is closed')
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        n = X.shape[0]
+        out = np.empty((n, self.n_outputs))
+
+        chunk = min(self.max_rows, max(MIN_CHUNK_ROWS, math.ceil(n / self.processes)))
+        pending = []
+        try:
+            for start in range(0, n, chunk):
+                # Only block for a worker while holding none, so callers can't deadlock each other
+                slot = self._acquire(block=not pending)
+                if slot is None:
+                    slot, span = pending.pop(0)
+                    self._finish(slot, out[span], release=False)
+                self._submit(slot, X[start:start + chunk])
+                pending.append((slot, slice(start, start + chunk)))
+
+            while pending:
+                slot, span = pending.pop(0)
+                self._finish(slot, out[span])
+        finally:
+            # After a failure, drain the other workers so no stale reply is left on their pipes
+            for slot, span in pending:
+                try:
+                    self._collect(slot, np.empty((slot.rows, self.n_outputs)))
+                except Exception:
+                    pass
+                self._release(slot)
+
+        with self._stats_lock:
+            self.batches += 1
+            self.rows += n
+        return out
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'processes': self.processes,
+                'alive': sum(slot.process.poll() is None for slot in self._slots),
+                'max_rows': self.max_rows,
+                'model_bytes': self.model_bytes,
+                'batches': self.batches,
+                'rows': self.rows,
+                'restarts': self.restarts,
+                'failures': self.failures,
+            }
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        for slot in self._slots:
+            with slot.lock:
+                try:
+                    slot.process.stdin.close()
+                    slot.process.wait(timeout=5)
+                except (OSError, subprocess.TimeoutExpired):
+                    slot.process.kill()
+                    slot.process.wait()
+                slot.process.stdout.close()
+                slot.close()
+        self._model_shm.close()
+        self._model_shm.unlink()
+
+
+def _serve(config):
+    model_shm = _attach(config['model'])
+    input_shm = _attach(config['inputs'])
+    output_shm = _attach(config['outputs'])
+
+    arrays = {name: _view(model_shm, spec) for name, spec in config['layout'].items()}
+    flat = FlatForest.from_arrays(arrays, **config['metadata'])
+    inputs = np.ndarray((config['max_rows'], flat.n_features), dtype=np.float32, buffer=input_shm.buf)
+    outputs = np.ndarray((config['max_rows'], flat.n_outputs), dtype=np.float64, buffer=output_shm.buf)
+
+    requests, replies = sys.stdin.buffer, sys.stdout.buffer
+    for line in requests:
+        try:
+            n = int(line)
+            outputs[:n] = flat.predict(inputs[:n])
+            replies.write(b'ok\n')
+        except Exception as e:
+            replies.write(f'error {type(e).__name__}: {e}\n'.encode())
+        replies.flush()
+
+
+if __name__ == '__main__':
+    _serve(json.loads(sys.argv[1]))
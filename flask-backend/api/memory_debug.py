@@ -0,0 +1,246 @@
+import functools
+import gc
+import hmac
+import linecache
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from flask import jsonify, request
+
+DEBUG_TOKEN_HEADER = 'X-Debug-Token'
+GROUPINGS = ('lineno', 'filename', 'traceback', 'package')
+# Deepest traceback tracemalloc.start accepts
+MAX_FRAMES = 65535
+
+# Frames of the profiler itself, left out of every report
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def _proc_kib(path, fields):
+    """Sum of the named 'Key: N kB' lines of a /proc file, in bytes; {} off Linux"""
+    totals = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in fields:
+                    totals[key] = totals.get(key, 0) + int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return {}
+    return totals
+
+
+def process_memory():
+    """RSS, peak RSS, USS (private pages), PSS and shared pages of this process"""
+    status = _proc_kib('/proc/self/status', {'VmRSS', 'VmHWM'})
+    smaps = _proc_kib('/proc/self/smaps_rollup', {'Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty',
+                                                  'Private_Clean', 'Private_Dirty'})
+    peak = status.get('VmHWM', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+    memory = {
+        'pid': os.getpid(),
+        'rss_bytes': status.get('VmRSS', smaps.get('Rss')),
+        'peak_rss_bytes': peak,
+        'uss_bytes': None,
+        'pss_bytes': smaps.get('Pss'),
+        'shared_bytes': None,
+    }
+    if smaps:
+        memory['uss_bytes'] = smaps.get('Private_Clean', 0) + smaps.get('Private_Dirty', 0)
+        memory['shared_bytes'] = smaps.get('Shared_Clean', 0) + smaps.get('Shared_Dirty', 0)
+    return memory
+
+
+def gc_summary():
+    return {
+        'counts': gc.get_count(),
+        'thresholds': gc.get_threshold(),
+        'collections': [generation['collections'] for generation in gc.get_stats()],
+        'uncollectable': len(gc.garbage),
+        'tracked_objects': len(gc.get_objects()),
+    }
+
+
+def collect_garbage():
+    """Full collection, with how much RSS and USS it gave back"""
+    before = process_memory()
+    start = time.perf_counter()
+    collected = gc.collect()
+    after = process_memory()
+    return {
+        'collected': collected,
+        'ms': round((time.perf_counter() - start) * 1000, 2),
+        'before': before,
+        'after': after,
+        'rss_released_bytes': before['rss_bytes'] - after['rss_bytes'] if before['rss_bytes'] else None,
+    }
+
+
+def _package(filename):
+    """Top-level package of a source file: site-packages/sklearn/tree/_classes.py -> 'sklearn'"""
+    parts = filename.replace('\\', '/').split('/')
+    for marker in ('site-packages', 'dist-packages'):
+        if marker in parts:
+            index = parts.index(marker)
+            if index + 1 < len(parts):
+                return parts[index + 1].split('.')[0]
+    if any(part.startswith('python3') for part in parts[:-1]):
+        return 'stdlib'
+    return filename
+
+
+def _site(stat, group_by):
+    frames = stat.traceback
+    if group_by == 'traceback':
+        return [f'{frame.filename}:{frame.lineno}' for frame in frames]
+    if group_by == 'filename':
+        return frames[0].filename
+    return f'{frames[0].filename}:{frames[0].lineno}'
+
+
+def top_sites(stats, limit):
+    return [
+        {'site': site, 'size_bytes': size, 'count': count}
+        for site, size, count in stats[:limit]
+    ]
+
+
+class MemoryProfiler:
+    """tracemalloc on demand, with a few named snapshots kept for diffing
+
+    Nothing is traced until ``start`` is called (or the process was
+    launched with PYTHONTRACEMALLOC, which also catches import-time
+    allocations), so while off the only cost is the idle module. Each
+    snapshot holds its own copy of every traced block's traceback; at
+    most ``max_snapshots`` are kept, oldest dropped first.
+    """
+
+    def __init__(self, frames=1, max_snapshots=4):
+        self.frames = int(frames)
+        self.max_snapshots = int(max_snapshots)
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()
+        self.started_at = time.time() if tracemalloc.is_tracing() else None
+
+    def start(self, frames=None):
+        """Start tracing ``frames`` deep (default: the configured depth); ValueError outside 1..MAX_FRAMES"""
+        try:
+            frames = int(self.frames if frames is None else frames)
+        except (TypeError, ValueError, OverflowError):
+            frames = 0
+        if not 1 <= frames <= MAX_FRAMES:
+            raise ValueError(f'frames must be between 1 and {MAX_FRAMES}')
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self.started_at = time.time()
+            return self.status_locked()
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            # Snapshots don't survive a restart of tracing in any useful way
+            self._snapshots.clear()
+            self.started_at = None
+            return self.status_locked()
+
+    def snapshot(self):
+        """Current allocations, not kept"""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError('tracing is off; enable it first')
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+    def take(self, name=None):
+        """Snapshot current allocations under ``name`` (default: a timestamp)"""
+        snapshot = self.snapshot()
+        name = name or time.strftime('%Y%m%dT%H%M%S')
+        with self._lock:
+            self._snapshots.pop(name, None)
+            self._snapshots[name] = snapshot
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return name, snapshot
+
+    def get(self, name):
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+        if snapshot is None:
+            raise KeyError(name)
+        return snapshot
+
+    def top(self, snapshot, group_by='lineno', limit=20):
+        if group_by == 'package':
+            totals = {}
+            for stat in snapshot.statistics('filename'):
+                package = _package(stat.traceback[0].filename)
+                size, count = totals.get(package, (0, 0))
+                totals[package] = (size + stat.size, count + stat.count)
+            ranked = sorted(totals.items(), key=lambda item: -item[1][0])
+            return top_sites([(package, size, count) for package, (size, count) in ranked], limit)
+
+        stats = snapshot.statistics(group_by)
+        return top_sites([(_site(stat, group_by), stat.size, stat.count) for stat in stats], limit)
+
+    def diff(self, older, newer, group_by='lineno', limit=20):
+        """Sites whose allocations grew the most from ``older`` to ``newer``"""
+        key = 'filename' if group_by == 'package' else group_by
+        changes = newer.compare_to(older, key)
+        return [
+            {
+                'site': _site(stat, key),
+                'size_diff_bytes': stat.size_diff,
+                'size_bytes': stat.size,
+                'count_diff': stat.count_diff,
+                'count': stat.count,
+            }
+            for stat in changes[:limit]
+        ]
+
+    def status_locked(self):
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            'tracing': tracing,
+            'frames': tracemalloc.get_traceback_limit() if tracing else self.frames,
+            'started_at': self.started_at,
+            'traced_bytes': current,
+            'traced_peak_bytes': peak,
+            'tracemalloc_overhead_bytes': tracemalloc.get_tracemalloc_memory() if tracing else 0,
+            'snapshots': list(self._snapshots),
+            'max_snapshots': self.max_snapshots,
+        }
+
+    def status(self):
+        with self._lock:
+            return self.status_locked()
+
+
+def debug_guarded(get_token):
+    """Route decorator: 404 unless a debug token is configured, 403 unless the request carries it
+
+    ``get_token`` returns the configured token or None. Hiding the
+    surface entirely when unset keeps it out of scanners' sight.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            token = get_token()
+            if not token:
+                response = jsonify({'success': False, 'error': 'Not found'})
+                response.status_code = 404
+                return response
+            supplied = request.headers.get(DEBUG_TOKEN_HEADER, '')
+            if not hmac.compare_digest(supplied.encode(), token.encode()):
+                response = jsonify({'success': False, 'error': f'Missing or wrong {DEBUG_TOKEN_HEADER}'})
+                response.status_code = 403
+                return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -3,6 +3,24 @@ import numpy as np
 from datetime import datetime
 import os
 
+from .attribution import ForestExplainer
+from .rules import rules_prediction
+
+# Labels for the positions produced by prepare_ml_features below
+ML_FEATURE_LABELS = [
+    'Study Time',
+    'Absences',
+    'Education Level',
+    'Gender',
+    'Attendance Rate',
+    'Previous English Score',
+    'Test Preparation',
+    'Region',
+    'Lunch Type',
+]
+# prepare_ml_features sends constants for these, whatever the student entered
+UNFILLED_FEATURES = (7, 8)
+
 def load_ml_model():
     try:
         classifier_path = 'data/models/student-model.pkl'
@@ -21,6 +39,7 @@ def load_ml_model():
         return None, None
 
 classifier, encoders = load_ml_model()
+explainer = ForestExplainer(classifier) if classifier is not None else None
 
 def predict_student(student_data):
     """
@@ -47,7 +66,7 @@ def predict_student(student_data):
             speaking = float(student_data.get('speakingScore', 0))
             english_avg = (writing + reading + speaking) / 3
 
-            feature_importance = classifier.feature_importances_
+            class_index = int(np.argmax(probabilities))
 
             return {
                 'riskLevel': risk_level,
@@ -59,7 +78,7 @@ def predict_student(student_data):
                     'satisfactory': float(probabilities[2]),
                     'high_achiever': float(probabilities[1])
                 },
-                'factors': get_ml_factors(student_data, feature_importance),
+                'factors': get_ml_factors(student_data, features, class_index),
                 'recommendations': get_recommendations(risk_level, english_avg),
                 'predictionMethod': 'real_ml_model',
                 'modelInfo': {
@@ -136,42 +155,41 @@ def prepare_ml_features(student_data, encoders):
     
     return features
 
-def get_ml_factors(student_data, feature_importance):
+def get_ml_factors(student_data, features, class_index):
     """
-    Generate factors based on feature importance
+    Generate factors from this prediction's per-feature contributions
     """
-    factors = []
+    contributions = explainer.contributions([features])[0, :, class_index]
+    class_name = str(classifier.classes_[class_index]).replace('_', ' ')
+    filled = np.setdiff1d(np.arange(len(contributions)), UNFILLED_FEATURES)
+    total = float(np.abs(contributions[filled]).sum()) or 1.0
 
     writing = float(student_data.get('writingScore', 0))
     reading = float(student_data.get('readingScore', 0))
     speaking = float(student_data.get('speakingScore', 0))
     english_avg = (writing + reading + speaking) / 3
-    
-    factors.append({
-        'name': 'Previous English Score',
-        'impact': 0.867,  
-        'value': f'{english_avg:.1f}/100',
-        'explanation': 'Most important predictor (86.7% impact)',
-        'percentage': '86.7%'
-    })
 
-    study_time = student_data.get('studyTimePerWeek', '2_to_5')
-    factors.append({
-        'name': 'Study Time',
-        'impact': 0.010,
-        'value': study_time.replace('_', ' '),
-        'explanation': 'Weekly study commitment affects performance',
-        'percentage': '1.0%'
-    })
-    
-    test_prep = student_data.get('testPrep', 'not_prepared')
-    factors.append({
-        'name': 'Test Preparation',
-        'impact': 0.022,
-        'value': 'Prepared' if test_prep == 'prepared' else 'Not Prepared',
-        'explanation': 'Preparation significantly impacts results',
-        'percentage': '2.2%'
-    })
+    values = {
+        0: student_data.get('studyTimePerWeek', '2_to_5').replace('_', ' '),
+        1: student_data.get('absences', 'none').replace('_', ' '),
+        2: student_data.get('studentEducation', 'secondary').title(),
+        3: student_data.get('gender', 'female').title(),
+        4: f"{float(student_data.get('attendanceRate', 65)):.0f}%",
+        5: f'{english_avg:.1f}/100',
+        6: 'Prepared' if student_data.get('testPrep') == 'prepared' else 'Not Prepared',
+    }
+
+    factors = []
+    for index in filled[np.argsort(-np.abs(contributions[filled]), kind='stable')][:3]:
+        impact = float(contributions[index])
+        direction = 'Raises' if impact >= 0 else 'Lowers'
+        factors.append({
+            'name': ML_FEATURE_LABELS[index],
+            'impact': round(impact, 4),
+            'value': values[int(index)],
+            'explanation': f'{direction} the {class_name} probability by {abs(impact):.1%}',
+            'percentage': f'{abs(impact) / total:.1%}'
+        })
     
     return factors
 
@@ -223,25 +241,8 @@ def fallback_prediction(student_data):
 
     avg = (writing + reading + speaking) / 3
 
-    if avg >= 80:
-        risk = 'high_achiever'
-        confidence = 0.9
-    elif avg >= 60:
-        risk = 'satisfactory'
-        confidence = 0.85
-    else:
-        risk = 'at_risk'
-        confidence = 0.8
+    risk, confidence, probabilities = rules_prediction(avg)
 
-    if avg >= 80:
-        probabilities = {'at_risk': 0.05, 'satisfactory': 0.25, 'high_achiever': 0.70}
-    elif avg >= 70:
-        probabilities = {'at_risk': 0.15, 'satisfactory': 0.70, 'high_achiever': 0.15}
-    elif avg >= 60:
-        probabilities = {'at_risk': 0.30, 'satisfactory': 0.60, 'high_achiever': 0.10}
-    else:
-        probabilities = {'at_risk': 0.70, 'satisfactory': 0.25, 'high_achiever': 0.05}
-    
     return {
         'riskLevel': risk,
         'confidence': confidence,
@@ -0,0 +1,268 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+
+from .attribution import ForestExplainer
+from .prediction_log import model_version
+
+TENANT_HEADER = 'X-Tenant-Id'
+MODEL_FILE = 'student-model.pkl'
+ENCODER_FILE = 'encoders.pkl'
+
+# sklearn's Tree keeps its nodes in a C array: 7 eight-byte fields plus a flag, padded
+_TREE_NODE_BYTES = 64
+
+
+def tenant_slug(tenant):
+    """Directory name for a tenant key: 'North East' -> 'north-east'"""
+    return re.sub(r'[^a-z0-9]+', '-', str(tenant).strip().lower()).strip('-')
+
+
+def deep_size(obj, _seen=None):
+    """Approximate resident bytes of an object graph, counting array buffers and tree nodes"""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        # A view's buffer belongs to its base
+        return sys.getsizeof(obj) if obj.base is not None else obj.nbytes + sys.getsizeof(obj)
+
+    size = sys.getsizeof(obj)
+    if type(obj).__name__ == 'Tree' and hasattr(obj, 'node_count'):
+        return size + obj.capacity * _TREE_NODE_BYTES + obj.value.nbytes
+    if isinstance(obj, dict):
+        return size + sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(deep_size(item, seen) for item in obj)
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return size
+    if hasattr(obj, '__dict__'):
+        size += deep_size(vars(obj), seen)
+    for slot in getattr(type(obj), '__slots__', ()):
+        if hasattr(obj, slot):
+            size += deep_size(getattr(obj, slot), seen)
+    return size
+
+
+class ModelBundle:
+    """One tenant's classifier, encoders and the helpers built from them"""
+
+    def __init__(self, tenant, classifier, encoders, version=None, path=None, explainer=None):
+        self.tenant = tenant
+        self.classifier = classifier
+        self.encoders = encoders or {}
+        # Same dict-lookup encoding flask_app builds for the global model
+        self.encoder_maps = {
+            key: {label: index for index, label in enumerate(encoder.classes_)}
+            for key, encoder in self.encoders.items()
+        }
+        self.explainer = explainer
+        self.version = version
+        self.path = path
+        self.loaded_at = time.time()
+        self.size_bytes = deep_size((self.classifier, self.encoders, self.encoder_maps, self.explainer))
+
+    @classmethod
+    def load(cls, directory, tenant, n_features=None):
+        """Bundle from ``directory/<slug>/``, or None when the tenant has no model
+
+        Raises ValueError when the classifier doesn't take ``n_features``
+        inputs, the number the server sends.
+        """
+        path = os.path.join(directory, tenant_slug(tenant))
+        model_path = os.path.join(path, MODEL_FILE)
+        if not os.path.exists(model_path):
+            return None
+
+        classifier = joblib.load(model_path)
+        width = getattr(classifier, 'n_features_in_', None)
+        if n_features is not None and width != n_features:
+            raise ValueError(f"{model_path} takes {width} features, requests send {n_features}")
+        if hasattr(classifier, 'n_jobs'):
+            # Per-request scoring; fanning out per tenant would oversubscribe the box
+            classifier.n_jobs = 1
+        encoder_path = os.path.join(path, ENCODER_FILE)
+        encoders = joblib.load(encoder_path) if os.path.exists(encoder_path) else {}
+        return cls(
+            tenant, classifier, encoders, version=model_version(model_path), path=path,
+            explainer=ForestExplainer(classifier, cache_size=1024)
+        )
+
+    def describe(self):
+        return {
+            'tenant': self.tenant,
+            'version': self.version,
+            'size_bytes': self.size_bytes,
+            'loaded_at': self.loaded_at,
+        }
+
+    def footprint(self):
+        """Deep size measured now, per part; shared objects count once, under the first part holding them
+
+        Unlike ``size_bytes`` (taken at load) this includes whatever the
+        explainer's attribution cache has grown to since.
+        """
+        seen = set()
+        parts = {
+            name: deep_size(obj, seen)
+            for name, obj in (
+                ('classifier', self.classifier),
+                ('encoders', self.encoders),
+                ('encoder_maps', self.encoder_maps),
+                ('explainer', self.explainer),
+            )
+        }
+        parts['total'] = sum(parts.values())
+        return parts
+
+
+class TenantModelCache:
+    """Per-tenant model bundles loaded on first use and kept within a memory budget
+
+    Bundles live under ``directory/<tenant slug>/``. The least recently
+    used are evicted once their summed ``size_bytes`` passes
+    ``budget_bytes`` (the bundle just loaded always stays). Concurrent
+    requests for a tenant that is still loading wait for that one load.
+    Tenants without a bundle get ``fallback``, and that answer is
+    remembered for ``missing_ttl`` seconds so the disk isn't probed on
+    every request; tenant keys come from clients, so at most
+    ``max_missing`` such answers are kept, oldest dropped first. With ``n_features`` set, bundles whose classifier takes
+    a different number of inputs fail to load and fall back the same way.
+    """
+
+    def __init__(self, directory, budget_bytes=512 * 1024 ** 2, fallback=None, missing_ttl=60, loader=None,
+                 n_features=None, max_missing=1024):
+        self.directory = directory
+        self.n_features = n_features
+        self.budget_bytes = int(budget_bytes)
+        self.fallback = fallback
+        self.missing_ttl = float(missing_ttl)
+        self.max_missing = max(1, int(max_missing))
+        self._loader = loader or ModelBundle.load
+
+        self._lock = threading.Lock()
+        self._bundles = OrderedDict()
+        self._loading = {}
+        self._missing = OrderedDict()
+        self.resident_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_failures = 0
+        self.evictions = 0
+        self.fallbacks = 0
+        self.load_ms_total = 0.0
+
+    def get(self, tenant):
+        """The tenant's bundle, loading it if needed; the fallback when it has none"""
+        key = tenant_slug(tenant) if tenant else ''
+        if not key:
+            # Nothing in the name maps to a directory ('!!!'); don't probe or remember it
+            return self.fallback
+
+        while True:
+            with self._lock:
+                bundle = self._bundles.get(key)
+                if bundle is not None:
+                    self._bundles.move_to_end(key)
+                    self.hits += 1
+                    return bundle
+
+                missing_until = self._missing.get(key)
+                if missing_until is not None and missing_until > time.monotonic():
+                    self.fallbacks += 1
+                    return self.fallback
+
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Someone else is loading this tenant; take their result
+            loading.wait()
+
+        bundle = None
+        start = time.perf_counter()
+        try:
+            bundle = self._loader(self.directory, tenant, self.n_features)
+        except Exception as e:
+            print(f" Error loading model bundle for tenant {tenant}: {e}")
+            with self._lock:
+                self.load_failures += 1
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            del self._loading[key]
+            if bundle is None:
+                self._remember_missing_locked(key)
+                self.fallbacks += 1
+            else:
+                self._missing.pop(key, None)
+                self._bundles[key] = bundle
+                self.resident_bytes += bundle.size_bytes
+                self.loads += 1
+                self.load_ms_total += elapsed_ms
+                self._evict_locked()
+        loading.set()
+        return bundle if bundle is not None else self.fallback
+
+    def _remember_missing_locked(self, key):
+        now = time.monotonic()
+        self._missing.pop(key, None)
+        self._missing[key] = now + self.missing_ttl
+        # One TTL for all, so insertion order is expiry order
+        while self._missing and next(iter(self._missing.values())) <= now:
+            self._missing.popitem(last=False)
+        while len(self._missing) > self.max_missing:
+            self._missing.popitem(last=False)
+
+    def _evict_locked(self):
+        while self.resident_bytes > self.budget_bytes and len(self._bundles) > 1:
+            key, bundle = self._bundles.popitem(last=False)
+            self.resident_bytes -= bundle.size_bytes
+            self.evictions += 1
+            print(f" Evicted model bundle for tenant {bundle.tenant} ({bundle.size_bytes / 1024 ** 2:.1f} MB)")
+
+    def invalidate(self, tenant=None):
+        """Drop one tenant (or all) so the next request reloads from disk"""
+        with self._lock:
+            keys = list(self._bundles) if tenant is None else [tenant_slug(tenant)]
+            for key in keys:
+                bundle = self._bundles.pop(key, None)
+                if bundle is not None:
+                    self.resident_bytes -= bundle.size_bytes
+            if tenant is None:
+                self._missing.clear()
+            else:
+                self._missing.pop(tenant_slug(tenant), None)
+
+    def resident(self):
+        """Loaded bundles, most recently used first"""
+        with self._lock:
+            return list(reversed(self._bundles.values()))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'budget_bytes': self.budget_bytes,
+                'resident_bytes': self.resident_bytes,
+                'resident': [bundle.describe() for bundle in reversed(self._bundles.values())],
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'load_failures': self.load_failures,
+                'avg_load_ms': round(self.load_ms_total / self.loads, 2) if self.loads else None,
+                'evictions': self.evictions,
+                'fallbacks': self.fallbacks,
+                'missing': len(self._missing),
+            }
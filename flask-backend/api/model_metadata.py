@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+from datetime import datetime
+
+from flask import Response, request
+
+from .negotiation import ENCODINGS
+
+ACCURACY_KEYS = ['accuracy', 'test_accuracy', 'testing_accuracy', 'training_accuracy', 'model_accuracy']
+TRAINED_DATE_KEYS = ['trained_date', 'training_date', 'created_at']
+
+# Pre-serialized response body and its strong ETag; built once per model load
+JsonSnapshot = namedtuple('JsonSnapshot', ['body', 'etag'])
+
+
+def json_snapshot(payload):
+    body = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode()
+    return JsonSnapshot(body, hashlib.sha256(body).hexdigest()[:32])
+
+
+def conditional_json(snapshot):
+    """304 if the client already holds this exact body, otherwise the stored bytes"""
+    # A compressed copy of the body carries the encoding as an ETag suffix
+    for etag in [snapshot.etag] + [f'{snapshot.etag}-{encoding}' for encoding in ENCODINGS]:
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            break
+    else:
+        response = Response(snapshot.body, mimetype='application/json')
+        response.set_etag(snapshot.etag)
+    # Clients may keep the body but must revalidate before reusing it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def model_accuracy(model_config, default=0.85):
+    metadata = (model_config or {}).get('metadata', {})
+    for key in ACCURACY_KEYS:
+        if key in metadata:
+            return float(metadata[key])
+    return default
+
+
+def trained_date(model_config, model_path):
+    metadata = (model_config or {}).get('metadata', {})
+    for key in TRAINED_DATE_KEYS:
+        if key in metadata:
+            return metadata[key]
+    if model_path and os.path.exists(model_path):
+        return datetime.fromtimestamp(os.path.getmtime(model_path)).isoformat()
+    return None
+
+
+def model_info_snapshot(classifier, model_config, version, model_path):
+    """/model-info body for the loaded classifier, or for the rules fallback when it is None"""
+    loaded_at = datetime.now().isoformat()
+    if classifier is None:
+        info = {
+            'status': 'not_loaded',
+            'message': 'Using fallback prediction system'
+        }
+    else:
+        info = {
+            'status': 'loaded',
+            'model_type': type(classifier).__name__,
+            'accuracy': model_accuracy(model_config),
+            'classes': classifier.classes_.tolist(),
+            'n_features': int(getattr(classifier, 'n_features_in_', 6)),
+            # A property that averages every tree's importances on each access
+            'feature_importance': (
+                classifier.feature_importances_.tolist() if hasattr(classifier, 'feature_importances_') else []
+            ),
+            'version': version,
+            'trained_date': trained_date(model_config, model_path),
+            'loaded_at': loaded_at,
+        }
+
+    return json_snapshot({
+        'success': True,
+        'model_info': info,
+        'timestamp': loaded_at
+    })
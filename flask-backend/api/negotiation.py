@@ -0,0 +1,164 @@
+import io
+import json
+import zlib
+
+from werkzeug.wrappers import Response
+
+from .schema import ValidationError
+
+PREDICTION_FIELDS = (
+    'riskLevel', 'confidence', 'probabilities', 'predictionMethod', 'modelLoaded',
+    'degradedReason', 'predictedScore', 'modelsUsed', 'scoreSpread', 'englishAverage',
+    'factors', 'recommendations', 'modelInfo',
+)
+BATCH_FIELDS = PREDICTION_FIELDS + ('name',)
+
+# Fields produced by the score models; when none is wanted they are not run
+SCORE_FIELDS = frozenset(('predictedScore', 'modelsUsed', 'scoreSpread'))
+
+ENCODINGS = ('gzip', 'deflate')
+
+
+class FieldSet:
+    """The fields a client asked for with ?fields=; everything when it didn't ask"""
+
+    def __init__(self, names=None):
+        self.names = None if names is None else frozenset(names)
+
+    def __contains__(self, name):
+        return self.names is None or name in self.names
+
+    def wants_any(self, names):
+        return self.names is None or not self.names.isdisjoint(names)
+
+    def apply(self, result):
+        if self.names is None:
+            return result
+        return {key: value for key, value in result.items() if key in self.names}
+
+
+def requested_fields(args, allowed=PREDICTION_FIELDS):
+    """Parse ?fields=a,b,c; unknown names are a 400 rather than silently dropped"""
+    raw = args.get('fields')
+    if raw is None or not raw.strip():
+        return FieldSet()
+
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValidationError([{
+            'field': 'fields',
+            'message': f"unknown field(s) {', '.join(unknown)}; choose from {', '.join(allowed)}"
+        }])
+    return FieldSet(names)
+
+
+def accepted_encoding(header):
+    """Preferred of gzip/deflate from an Accept-Encoding value, or None"""
+    best, best_q = None, 0.0
+    for part in (header or '').split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        candidates = ENCODINGS if token == '*' else (token,)
+        for encoding in candidates:
+            if encoding in ENCODINGS and q > best_q:
+                best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding, level=6):
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress_body(data, encoding, max_bytes):
+    """Inflate a gzip or deflate request body, refusing anything that expands past max_bytes"""
+    wbits = 31 if encoding == 'gzip' else 15
+    decompressor = zlib.decompressobj(wbits)
+    try:
+        body = decompressor.decompress(data, max_bytes + 1)
+    except zlib.error as e:
+        raise ValueError(f"invalid {encoding} body: {e}")
+    if len(body) > max_bytes or decompressor.unconsumed_tail:
+        raise OverflowError(f"decompressed body exceeds {max_bytes} bytes")
+    return body
+
+
+def compress_response(response, accept_encoding, min_bytes=1024, level=6):
+    """Encode a JSON response in place when the client accepts it and it is worth it"""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+        or response.mimetype != 'application/json'
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = accepted_encoding(accept_encoding)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < min_bytes:
+        return response
+
+    response.set_data(compress(data, encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # A different byte sequence needs its own strong validator
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+
+class RequestDecompressionMiddleware:
+    """WSGI wrapper that inflates gzip/deflate request bodies before Flask sees them"""
+
+    def __init__(self, app, max_bytes=16 * 1024 ** 2):
+        self.app = app
+        self.max_bytes = int(max_bytes)
+
+    def _error(self, environ, start_response, status, message):
+        body = json.dumps({'success': False, 'error': message})
+        return Response(body, status=status, mimetype='application/json')(environ, start_response)
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not encoding or encoding == 'identity':
+            return self.app(environ, start_response)
+        if encoding not in ENCODINGS:
+            return self._error(environ, start_response, 415, f'Unsupported Content-Encoding: {encoding}')
+
+        # The compressed body is never larger than what it inflates to, so it gets the same cap
+        length = environ.get('CONTENT_LENGTH')
+        try:
+            length = int(length) if length else None
+        except ValueError:
+            return self._error(environ, start_response, 400, 'invalid Content-Length')
+        if length is not None and length > self.max_bytes:
+            return self._error(environ, start_response, 413, f"compressed body exceeds {self.max_bytes} bytes")
+        raw = environ['wsgi.input'].read(self.max_bytes + 1 if length is None else length)
+        if len(raw) > self.max_bytes:
+            return self._error(environ, start_response, 413, f"compressed body exceeds {self.max_bytes} bytes")
+        try:
+            body = decompress_body(raw, encoding, self.max_bytes)
+        except OverflowError as e:
+            return self._error(environ, start_response, 413, str(e))
+        except ValueError as e:
+            return self._error(environ, start_response, 400, str(e))
+
+        environ['wsgi.input'] = io.BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        del environ['HTTP_CONTENT_ENCODING']
+        return self.app(environ, start_response)
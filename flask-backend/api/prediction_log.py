@@ -0,0 +1,239 @@
+import atexit
+import glob
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b'PLOG'
+FORMAT_VERSION = 1
+HEADER_ALIGN = 64
+VERSION_BYTES = 16
+
+# magic, format version, length of the JSON descriptor that follows
+_PREFIX = struct.Struct('<4sHI')
+
+
+def record_dtype(n_features, n_classes):
+    """Fixed-width little-endian record; the same layout on disk and in memory"""
+    return np.dtype([
+        ('timestamp', '<f8'),
+        ('latency_ms', '<f4'),
+        ('model_version', f'S{VERSION_BYTES}'),
+        ('features', '<f4', (n_features,)),
+        ('probabilities', '<f4', (n_classes,)),
+    ])
+
+
+def model_version(path, length=12):
+    """Short content hash of a model file, so logged rows name the exact artifact"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def _header(n_features, classes):
+    descriptor = json.dumps({
+        'n_features': int(n_features),
+        'classes': [str(c) for c in classes],
+        'version_bytes': VERSION_BYTES,
+    }).encode()
+    header = _PREFIX.pack(MAGIC, FORMAT_VERSION, len(descriptor)) + descriptor
+    # Pad so records start on an aligned offset for memory-mapping
+    return header + b'\0' * (-len(header) % HEADER_ALIGN)
+
+
+class PredictionLog:
+    """Buffered, append-only log of scored feature vectors in size-rotated segments
+
+    Records accumulate in a preallocated structured array and reach disk
+    in one write when it fills or ``flush_seconds`` have passed since the
+    last write. Each process writes its own segments (the pid is in the
+    file name), so gunicorn workers never share a file.
+    """
+
+    def __init__(self, directory, n_features, classes, max_segment_bytes=64 * 1024 ** 2,
+                 buffer_records=256, flush_seconds=1.0):
+        self.directory = directory
+        self.classes = [str(c) for c in classes]
+        self.dtype = record_dtype(n_features, len(self.classes))
+        self.max_segment_bytes = int(max_segment_bytes)
+        self.flush_seconds = float(flush_seconds)
+
+        self._buffer = np.zeros(int(buffer_records), dtype=self.dtype)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._segment_bytes = 0
+        self._segment_index = 0
+        self._last_flush = time.monotonic()
+
+        self.written = 0
+        self.segments = 0
+        self.failed = 0
+
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.close)
+
+    def append(self, features, model_version, probabilities, latency_ms, timestamp=None):
+        """Buffer one or more rows; features and probabilities may be 1-D or 2-D"""
+        features = np.atleast_2d(np.asarray(features, dtype=np.float32))
+        probabilities = np.atleast_2d(np.asarray(probabilities, dtype=np.float32))
+        now = time.time() if timestamp is None else timestamp
+
+        version = model_version.encode()[:VERSION_BYTES]
+
+        with self._lock:
+            row = 0
+            while row < len(features):
+                if self._pending == len(self._buffer):
+                    self._flush_locked()
+                n = min(len(features) - row, len(self._buffer) - self._pending)
+                block = self._buffer[self._pending:self._pending + n]
+                block['timestamp'] = now
+                block['latency_ms'] = latency_ms
+                block['model_version'] = version
+                block['features'] = features[row:row + n]
+                block['probabilities'] = probabilities[row:row + n]
+                self._pending += n
+                row += n
+
+            if time.monotonic() - self._last_flush >= self.flush_seconds:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'written': self.written,
+                'buffered': self._pending,
+                'segments': self.segments,
+                'failed': self.failed,
+                'record_bytes': self.dtype.itemsize,
+            }
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        data = self._buffer[:self._pending].tobytes()
+        count = self._pending
+        self._pending = 0
+
+        try:
+            if self._file is None or self._segment_bytes + len(data) > self.max_segment_bytes:
+                self._rotate_locked()
+            self._file.write(data)
+            self._file.flush()
+            self._segment_bytes += len(data)
+            self.written += count
+        except OSError as e:
+            # Losing log rows must never fail a prediction
+            print(f" Prediction log write failed: {e}")
+            self.failed += count
+
+    def _rotate_locked(self):
+        if self._file is not None:
+            self._file.close()
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        path = os.path.join(self.directory, f'predictions-{stamp}-{os.getpid()}-{self._segment_index:04d}.plog')
+        self._segment_index += 1
+        self._file = open(path, 'ab')
+        header = _header(self.dtype['features'].shape[0], self.classes)
+        self._file.write(header)
+        self._segment_bytes = len(header)
+        self.segments += 1
+
+
+def read_segment(path):
+    """Memory-map one segment as a structured array; returns (records, classes)
+
+    A torn trailing record from a crashed writer is ignored.
+    """
+    with open(path, 'rb') as f:
+        magic, version, length = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} prediction log segment")
+        descriptor = json.loads(f.read(length))
+
+    offset = _PREFIX.size + length
+    offset += -offset % HEADER_ALIGN
+    dtype = record_dtype(descriptor['n_features'], len(descriptor['classes']))
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if count <= 0:
+        return np.zeros(0, dtype=dtype), descriptor['classes']
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,)), descriptor['classes']
+
+
+def segment_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, 'predictions-*.plog')))
+
+
+def read_log(directory, since=None):
+    """All records in a log directory as one array, oldest segment first
+
+    Segments are memory-mapped and only copied when there is more than
+    one to join; ``since`` (a Unix timestamp) drops older records.
+    """
+    parts = []
+    classes = None
+    for path in segment_paths(directory):
+        records, segment_classes = read_segment(path)
+        if classes is None:
+            classes = segment_classes
+        elif segment_classes != classes:
+            raise ValueError(f"{path} logs classes {segment_classes}, expected {classes}")
+        if since is not None:
+            records = records[records['timestamp'] >= since]
+        if len(records):
+            parts.append(records)
+
+    if not parts:
+        return None, classes
+    records = parts[0] if len(parts) == 1 else np.concatenate(parts)
+    return records, classes
+
+
+def replay(records, classes, model, batch_size=65536):
+    """Re-score logged feature vectors with another model and compare with what was served"""
+    model_classes = [str(c) for c in model.classes_]
+    columns = [model_classes.index(c) for c in classes]
+
+    agreements = 0
+    delta_sum = np.zeros(len(classes))
+    delta_max = np.zeros(len(classes))
+    for start in range(0, len(records), batch_size):
+        chunk = records[start:start + batch_size]
+        replayed = model.predict_proba(np.asarray(chunk['features'], dtype=np.float64))[:, columns]
+        logged = np.asarray(chunk['probabilities'], dtype=np.float64)
+        agreements += int((replayed.argmax(axis=1) == logged.argmax(axis=1)).sum())
+        delta = np.abs(replayed - logged)
+        delta_sum += delta.sum(axis=0)
+        delta_max = np.maximum(delta_max, delta.max(axis=0))
+
+    n = max(len(records), 1)
+    return {
+        'records': len(records),
+        'agreement_rate': agreements / n,
+        'probability_delta': {
+            name: {'mean_abs': float(delta_sum[i] / n), 'max_abs': float(delta_max[i])}
+            for i, name in enumerate(classes)
+        },
+    }
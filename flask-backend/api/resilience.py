@@ -0,0 +1,148 @@
+import threading
+import time
+
+BUDGET_HEADER = 'X-Latency-Budget-Ms'
+BUDGET_FIELD = 'latencyBudgetMs'
+
+
+def request_budget_ms(headers, data, default_ms):
+    """Latency budget for a request: header, then body field, then server default"""
+    raw = headers.get(BUDGET_HEADER)
+    if raw is None and isinstance(data, dict):
+        raw = data.get(BUDGET_FIELD)
+    if raw is None:
+        return float(default_ms)
+
+    try:
+        budget = float(raw)
+    except (TypeError, ValueError):
+        return float(default_ms)
+    return budget if budget > 0 else float(default_ms)
+
+
+class Deadline:
+    """Wall-clock deadline for one request"""
+
+    def __init__(self, budget_ms):
+        self.budget_ms = float(budget_ms)
+        self.started_at = time.perf_counter()
+        self.expires_at = self.started_at + self.budget_ms / 1000.0
+
+    def remaining_ms(self):
+        return max(0.0, (self.expires_at - time.perf_counter()) * 1000)
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def allows(self, cost_ms):
+        """True if a step expected to take ``cost_ms`` still fits"""
+        return self.remaining_ms() >= cost_ms
+
+
+class LatencyEstimate:
+    """Exponentially weighted moving average of a stage's latency"""
+
+    def __init__(self, initial_ms=0.0, alpha=0.2):
+        self.value_ms = float(initial_ms)
+        self.alpha = alpha
+        self.samples = 0
+
+    def observe(self, elapsed_ms):
+        if self.samples == 0:
+            self.value_ms = float(elapsed_ms)
+        else:
+            self.value_ms += self.alpha * (elapsed_ms - self.value_ms)
+        self.samples += 1
+
+    def decay(self):
+        """Shrink the estimate for a call that was skipped because of it
+
+        A skipped stage produces no new sample, so without this one slow
+        call would keep the stage skipped until restart; each skip moves
+        the estimate toward zero until a real call fits and re-measures.
+        """
+        self.value_ms -= self.alpha * self.value_ms
+
+
+class CircuitBreaker:
+    """Open after repeated slow or failing calls, half-open to probe recovery"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, slow_call_ms=250.0):
+        self.failure_threshold = int(failure_threshold)
+        self.recovery_timeout = float(recovery_timeout)
+        self.slow_call_ms = float(slow_call_ms)
+
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_failure_reason = None
+
+    def allow(self):
+        """Whether a call may go to the model; half-open lets one probe through"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+
+            if self.state == self.HALF_OPEN:
+                if self.probe_in_flight:
+                    self.rejected += 1
+                    return False
+                self.probe_in_flight = True
+
+            return True
+
+    def record_success(self, elapsed_ms):
+        if elapsed_ms > self.slow_call_ms:
+            self.record_failure('slow_call')
+            return
+
+        with self._lock:
+            if self.state == self.OPEN:
+                # A call admitted before the breaker tripped; only a probe may close it.
+                return
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+            if self.state != self.CLOSED:
+                print(" Circuit breaker closed: model inference recovered")
+            self.state = self.CLOSED
+
+    def record_failure(self, reason='error'):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_failure_reason = reason
+            self.probe_in_flight = False
+
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                    print(f" Circuit breaker opened after {self.consecutive_failures} failures ({reason})")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'slow_call_ms': self.slow_call_ms,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+                'last_failure_reason': self.last_failure_reason,
+                'retry_in_seconds': retry_in,
+            }
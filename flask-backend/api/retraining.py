@@ -0,0 +1,580 @@
+"""Background retraining from the prediction log
+
+The scheduler thread (one per server process) watches the prediction log
+and, once enough new records have arrived or enough time has passed,
+trains a candidate in a separate process:
+
+* scheduled SCHED_IDLE where available (otherwise nice 19), so it only
+  gets CPU the serving workers leave unused;
+* capped at ``threads`` BLAS/OpenMP/joblib threads, ``memory_mb`` of
+  address space and ``cpu_seconds`` of CPU, and killed past
+  ``timeout`` seconds of wall-clock;
+* writing a versioned directory ``<artifact_dir>/<stamp>-<hash>/`` with
+  the classifier, the serving encoders and a training.json report.
+
+The server then validates the candidate on the newest logged records,
+which the trainer held out, and accepts it if it does not regress
+against the model in service. An accepted candidate is only recorded as
+pending unless the scheduler auto-activates; ``python -m api.retraining
+promote <artifact_dir>`` puts it in service. ``<artifact_dir>/CURRENT``
+names the version in service, so every gunicorn worker (and the next
+restart) picks it up; a lock file makes sure only one of them trains at
+a time.
+
+Labels are the observed outcomes logged with each row (an ``outcome``
+field). The log currently records only the model's inputs and answers,
+and risk levels derived from those inputs are thresholds on the English
+average the model is given: training on them only relearns the
+thresholds. So until outcomes are logged nothing is trained or
+accepted, and the scheduler reports why.
+"""
+import fcntl
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from .prediction_log import model_version, read_log, segment_paths, read_segment
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODEL_FILE = 'student-model.pkl'
+ENCODER_FILE = 'encoders.pkl'
+REPORT_FILE = 'training.json'
+CURRENT_FILE = 'CURRENT'
+STATE_FILE = 'state.json'
+LOCK_FILE = '.retrain.lock'
+
+# Record field holding the risk level actually observed for a logged row
+OUTCOME_FIELD = 'outcome'
+NO_OUTCOMES = 'the prediction log has no outcome labels independent of the model inputs'
+
+
+def outcome_labels(records):
+    """Observed risk levels of logged rows as strings, or None when the log doesn't record them"""
+    if records is None or OUTCOME_FIELD not in (records.dtype.names or ()):
+        return None
+    return np.asarray(records[OUTCOME_FIELD]).astype(str)
+
+
+def log_has_outcomes(log_dir):
+    """Whether the newest segment records outcomes; older ones may predate the field"""
+    paths = segment_paths(log_dir)
+    if not paths:
+        return False
+    records, _ = read_segment(paths[-1])
+    return outcome_labels(records) is not None
+
+
+def count_records(log_dir, since):
+    """Logged records newer than ``since``, read from the segments' timestamp column only"""
+    total = 0
+    for path in segment_paths(log_dir):
+        if os.path.getmtime(path) < since:
+            continue
+        records, _ = read_segment(path)
+        if len(records):
+            total += int(np.count_nonzero(records['timestamp'] >= since))
+    return total
+
+
+def _json_params(params):
+    return {key: value for key, value in params.items() if isinstance(value, (str, int, float, bool, type(None)))}
+
+
+# ---------------------------------------------------------------------------
+# Trainer process
+
+
+def _limit_resources(config):
+    """Lowest CPU priority, bounded memory and CPU time; applied by the trainer to itself"""
+    applied = {}
+    if hasattr(os, 'sched_setscheduler') and hasattr(os, 'SCHED_IDLE'):
+        try:
+            os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+            applied['scheduler'] = 'idle'
+        except OSError:
+            pass
+    applied['nice'] = os.nice(19 - os.nice(0))
+
+    memory_bytes = int(config['memory_mb'] * 1024 ** 2)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    applied['memory_mb'] = config['memory_mb']
+    cpu_seconds = int(config['cpu_seconds'])
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+    applied['cpu_seconds'] = cpu_seconds
+    applied['threads'] = config['threads']
+    return applied
+
+
+def train(config):
+    """Fit a candidate on all but the newest holdout share of the log and write its artifact"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, f1_score
+
+    start = time.perf_counter()
+    limits = _limit_resources(config)
+
+    records, classes = read_log(config['log_dir'])
+    if records is None:
+        raise RuntimeError('the prediction log is empty')
+    records = records[-config['max_records']:]
+    features = np.asarray(records['features'], dtype=np.float32)
+    if features.shape[1] != config['n_features']:
+        raise RuntimeError(f"logged rows have {features.shape[1]} features, the model takes {config['n_features']}")
+
+    # Time-ordered split: the newest rows are what the server validates on
+    order = np.argsort(records['timestamp'], kind='stable')
+    features = features[order]
+    timestamps = np.asarray(records['timestamp'])[order]
+    labels = outcome_labels(records[order])
+    if labels is None:
+        raise RuntimeError(NO_OUTCOMES)
+    n_holdout = max(1, int(len(features) * config['holdout_fraction']))
+    train_X, train_y = features[:-n_holdout], labels[:-n_holdout]
+    test_X, test_y = features[-n_holdout:], labels[-n_holdout:]
+
+    missing = sorted(set(config['classes']) - set(train_y))
+    if missing:
+        raise RuntimeError(f"no training rows labelled {', '.join(missing)}")
+
+    classifier = RandomForestClassifier(**{**config['params'], 'n_jobs': config['threads']})
+    fit_start = time.perf_counter()
+    classifier.fit(train_X, train_y)
+    fit_seconds = time.perf_counter() - fit_start
+    predicted = classifier.predict(test_X)
+    # Saved with the serving process's own n_jobs, as the model it replaces was
+    classifier.n_jobs = config['params'].get('n_jobs')
+
+    staging = os.path.join(config['artifact_dir'], f'.staging-{os.getpid()}')
+    os.makedirs(staging, exist_ok=True)
+    joblib.dump(classifier, os.path.join(staging, MODEL_FILE))
+    shutil.copyfile(config['encoder_path'], os.path.join(staging, ENCODER_FILE))
+    version = model_version(os.path.join(staging, MODEL_FILE))
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{version}"
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    report = {
+        'version': version,
+        'artifact': name,
+        'created': time.time(),
+        'trigger': config['trigger'],
+        'base_version': config['base_version'],
+        'records': len(features),
+        'train_rows': len(train_X),
+        'holdout_rows': len(test_X),
+        'holdout_since': float(timestamps[-n_holdout]),
+        'classes': [str(c) for c in classifier.classes_],
+        'metrics': {
+            'accuracy': float(accuracy_score(test_y, predicted)),
+            'f1': float(f1_score(test_y, predicted, average='weighted')),
+        },
+        'params': _json_params(classifier.get_params()),
+        'limits': limits,
+        'resources': {
+            'duration_seconds': time.perf_counter() - start,
+            'fit_seconds': fit_seconds,
+            'cpu_user_seconds': usage.ru_utime,
+            'cpu_system_seconds': usage.ru_stime,
+            'max_rss_mb': usage.ru_maxrss / 1024,
+        },
+    }
+    with open(os.path.join(staging, REPORT_FILE), 'w') as f:
+        json.dump(report, f, indent=2)
+    os.rename(staging, os.path.join(config['artifact_dir'], name))
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Server side
+
+
+def read_current(artifact_dir):
+    try:
+        with open(os.path.join(artifact_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_json(path, document):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(document, f, indent=2)
+    os.replace(tmp, path)
+
+
+def publish(artifact_dir, name):
+    """Name ``name`` in CURRENT, which every worker's scheduler activates on its next check"""
+    tmp = os.path.join(artifact_dir, CURRENT_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        f.write(name)
+    os.replace(tmp, os.path.join(artifact_dir, CURRENT_FILE))
+
+
+def promote(artifact_dir, name=None):
+    """Put an accepted candidate (default: the pending one) in service; returns its name"""
+    state_path = os.path.join(artifact_dir, STATE_FILE)
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    name = name or state.get('pending')
+    if not name:
+        raise RuntimeError('no pending candidate to promote')
+    if not os.path.isfile(os.path.join(artifact_dir, name, MODEL_FILE)):
+        raise RuntimeError(f'{name} is not an artifact in {artifact_dir}')
+    publish(artifact_dir, name)
+    if state.get('pending') == name:
+        state['pending'] = None
+        _write_json(state_path, state)
+    return name
+
+
+def _predict_seconds(model, row, repeat=20):
+    model.predict_proba(row)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model.predict_proba(row)
+    return (time.perf_counter() - start) / repeat
+
+
+def validate_candidate(directory, active, log_dir, max_regression=0.01, max_latency_ratio=2.0):
+    """Accept or reject an artifact against the model in service, on the trainer's holdout rows
+
+    Both models score the logged features as served, against the
+    outcomes observed for them.
+    """
+    with open(os.path.join(directory, REPORT_FILE)) as f:
+        report = json.load(f)
+    candidate = joblib.load(os.path.join(directory, MODEL_FILE))
+    result = {'artifact': os.path.basename(directory), 'version': report['version'], 'accepted': False}
+
+    if not hasattr(candidate, 'predict_proba'):
+        result['reason'] = 'not a probabilistic classifier'
+        return result, candidate
+    if getattr(candidate, 'n_features_in_', None) != getattr(active, 'n_features_in_', None):
+        result['reason'] = f'takes {candidate.n_features_in_} features, the active model {active.n_features_in_}'
+        return result, candidate
+    if [str(c) for c in candidate.classes_] != [str(c) for c in active.classes_]:
+        result['reason'] = f'classes {list(candidate.classes_)} differ from {list(active.classes_)}'
+        return result, candidate
+
+    records, _ = read_log(log_dir, since=report['holdout_since'])
+    if records is None or not len(records):
+        result['reason'] = 'no holdout records to validate on'
+        return result, candidate
+    y = outcome_labels(records)
+    if y is None:
+        result['reason'] = NO_OUTCOMES
+        return result, candidate
+    X = np.asarray(records['features'], dtype=np.float32)
+    result['rows'] = len(X)
+    result['candidate_accuracy'] = float((candidate.predict(X) == y).mean())
+    result['active_accuracy'] = float((active.predict(X) == y).mean())
+
+    # Single-row latency, each model on one thread so the comparison is like for like
+    row = X[:1]
+    saved = candidate.n_jobs, getattr(active, 'n_jobs', None)
+    candidate.n_jobs = 1
+    if saved[1] is not None:
+        active.n_jobs = 1
+    try:
+        result['candidate_ms'] = _predict_seconds(candidate, row) * 1000
+        result['active_ms'] = _predict_seconds(active, row) * 1000
+    finally:
+        candidate.n_jobs = saved[0]
+        if saved[1] is not None:
+            active.n_jobs = saved[1]
+
+    if result['candidate_accuracy'] < result['active_accuracy'] - max_regression:
+        result['reason'] = 'accuracy regressed on the holdout'
+    elif result['candidate_ms'] > result['active_ms'] * max_latency_ratio:
+        result['reason'] = 'single-row latency regressed'
+    else:
+        result['accepted'] = True
+    return result, candidate
+
+
+class RetrainScheduler:
+    """Trains candidates from the prediction log in the background and activates accepted ones
+
+    ``get_active`` returns the (classifier, version) in service;
+    ``activate(directory)`` swaps an artifact directory into service.
+    Training starts once ``min_records`` rows were logged since the last
+    run, or ``interval_seconds`` passed with at least one new row. An
+    accepted candidate is activated only with ``auto_activate``;
+    otherwise it is kept as pending until promoted.
+    """
+
+    def __init__(self, log_dir, artifact_dir, get_active, activate, encoder_path, min_records=5000,
+                 interval_seconds=86400, check_seconds=60, threads=1, memory_mb=1024, cpu_seconds=1800,
+                 timeout_seconds=3600, holdout_fraction=0.2, max_records=500_000, max_regression=0.01,
+                 max_latency_ratio=2.0, keep_versions=5, auto_activate=False):
+        self.log_dir = os.path.abspath(log_dir)
+        self.artifact_dir = os.path.abspath(artifact_dir)
+        self.get_active = get_active
+        self.activate = activate
+        self.encoder_path = os.path.abspath(encoder_path)
+        self.min_records = int(min_records)
+        self.interval_seconds = float(interval_seconds)
+        self.check_seconds = float(check_seconds)
+        self.threads = max(1, int(threads))
+        self.memory_mb = float(memory_mb)
+        self.cpu_seconds = int(cpu_seconds)
+        self.timeout_seconds = float(timeout_seconds)
+        self.holdout_fraction = float(holdout_fraction)
+        self.max_records = int(max_records)
+        self.max_regression = float(max_regression)
+        self.max_latency_ratio = float(max_latency_ratio)
+        self.keep_versions = max(1, int(keep_versions))
+        self.auto_activate = bool(auto_activate)
+        os.makedirs(self.artifact_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.rejected = 0
+        self.activations = 0
+        self.last_run = None
+        self.last_validation = None
+        self.last_error = None
+        self.blocked = None
+
+    # State shared by every worker through the artifact directory
+
+    def _state(self):
+        try:
+            with open(os.path.join(self.artifact_dir, STATE_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'last_trained_at': 0.0}
+
+    def _save_state(self, **changes):
+        state = self._state()
+        state.update(changes)
+        _write_json(os.path.join(self.artifact_dir, STATE_FILE), state)
+
+    def start(self):
+        self.sync()
+        self.check_outcomes()
+        self._thread = threading.Thread(target=self._loop, name='retrain-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.check_seconds):
+            try:
+                self.sync()
+                trigger = self.due()
+                if trigger:
+                    self.run(trigger)
+            except Exception as e:
+                with self._lock:
+                    self.last_error = f'{type(e).__name__}: {e}'
+                print(f" Retraining check failed: {e}")
+
+    def sync(self):
+        """Activate the accepted version if another worker (or a previous run) published one"""
+        current = read_current(self.artifact_dir)
+        if current is None:
+            return False
+        _, active_version = self.get_active()
+        if current.endswith(f'-{active_version}'):
+            return False
+        directory = os.path.join(self.artifact_dir, current)
+        self.activate(directory)
+        with self._lock:
+            self.activations += 1
+        print(f" Activated retrained model {current}")
+        return True
+
+    def check_outcomes(self):
+        """Why nothing can be trained now (NO_OUTCOMES), or None; kept in ``blocked`` and ``last_error``"""
+        blocked = None if log_has_outcomes(self.log_dir) else NO_OUTCOMES
+        with self._lock:
+            self.blocked = blocked
+            if blocked:
+                self.last_error = blocked
+        return blocked
+
+    def due(self):
+        """'records', 'interval' or None"""
+        if self.check_outcomes():
+            return None
+        last = self._state().get('last_trained_at', 0.0)
+        new = count_records(self.log_dir, last)
+        if new >= self.min_records:
+            return 'records'
+        if new and time.time() - last >= self.interval_seconds:
+            return 'interval'
+        return None
+
+    def run(self, trigger='manual'):
+        """Train, validate and activate once, unless another worker holds the training lock"""
+        blocked = self.check_outcomes()
+        if blocked:
+            return {'trigger': trigger, 'error': blocked}
+        with open(os.path.join(self.artifact_dir, LOCK_FILE), 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            # Another worker may have finished a run while this one was deciding
+            if trigger != 'manual' and not self.due():
+                return None
+            with self._lock:
+                self.running = True
+            try:
+                return self._run_locked(trigger)
+            finally:
+                with self._lock:
+                    self.running = False
+
+    def _run_locked(self, trigger):
+        active, active_version = self.get_active()
+        started = time.time()
+        # Stamp first so a failing run isn't retried on every check
+        self._save_state(last_trained_at=started)
+        config = {
+            'log_dir': self.log_dir,
+            'artifact_dir': self.artifact_dir,
+            'encoder_path': self.encoder_path,
+            'n_features': int(active.n_features_in_),
+            'classes': [str(c) for c in active.classes_],
+            'params': _json_params(active.get_params()),
+            'threads': self.threads,
+            'memory_mb': self.memory_mb,
+            'cpu_seconds': self.cpu_seconds,
+            'holdout_fraction': self.holdout_fraction,
+            'max_records': self.max_records,
+            'trigger': trigger,
+            'base_version': active_version,
+        }
+        threads = str(self.threads)
+        env = {**os.environ, 'OMP_NUM_THREADS': threads, 'OPENBLAS_NUM_THREADS': threads,
+               'MKL_NUM_THREADS': threads, 'LOKY_MAX_CPU_COUNT': threads}
+        log_path = os.path.join(self.artifact_dir, f"train-{time.strftime('%Y%m%dT%H%M%S')}.log")
+
+        print(f" Retraining ({trigger}) in a background process, {self.threads} thread(s), {self.memory_mb:.0f} MB cap")
+        with open(log_path, 'w') as log:
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'api.retraining', json.dumps(config)],
+                cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT, env=env
+            )
+            try:
+                process.wait(timeout=self.timeout_seconds)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+        run = {
+            'trigger': trigger,
+            'started': started,
+            'wall_seconds': time.time() - started,
+            'exit_code': process.returncode,
+            'log': log_path,
+        }
+        if process.returncode != 0:
+            with open(log_path) as f:
+                run['error'] = (f.read().strip().splitlines() or ['no output'])[-1]
+            with self._lock:
+                self.runs += 1
+                self.failures += 1
+                self.last_run = run
+            print(f" Retraining failed (exit {process.returncode}): {run['error']}")
+            return run
+
+        with open(log_path) as f:
+            report = json.loads(f.read().strip().splitlines()[-1])
+        run.update(report)
+        directory = os.path.join(self.artifact_dir, report['artifact'])
+        validation, _ = validate_candidate(
+            directory, active, self.log_dir, self.max_regression, self.max_latency_ratio
+        )
+        run['validation'] = validation
+        with self._lock:
+            self.runs += 1
+            self.last_run = run
+            self.last_validation = validation
+
+        if not validation['accepted']:
+            with self._lock:
+                self.rejected += 1
+            print(f" Retrained model {report['artifact']} rejected: {validation['reason']}")
+            shutil.rmtree(directory, ignore_errors=True)
+            return run
+
+        if not self.auto_activate:
+            self._save_state(pending=report['artifact'])
+            print(f" Retrained model {report['artifact']} accepted, pending; "
+                  f"activate it with python -m api.retraining promote {self.artifact_dir}")
+            self._prune()
+            return run
+
+        publish(self.artifact_dir, report['artifact'])
+        self.sync()
+        self._prune()
+        return run
+
+    def _prune(self):
+        keep = {read_current(self.artifact_dir), self._state().get('pending')}
+        versions = sorted(
+            name for name in os.listdir(self.artifact_dir)
+            if os.path.isdir(os.path.join(self.artifact_dir, name)) and not name.startswith('.')
+        )
+        for name in versions[:-self.keep_versions]:
+            if name not in keep:
+                shutil.rmtree(os.path.join(self.artifact_dir, name), ignore_errors=True)
+        logs = sorted(name for name in os.listdir(self.artifact_dir) if name.startswith('train-'))
+        for name in logs[:-self.keep_versions]:
+            os.remove(os.path.join(self.artifact_dir, name))
+
+    def stats(self):
+        state = self._state()
+        with self._lock:
+            return {
+                'artifact_dir': self.artifact_dir,
+                'current': read_current(self.artifact_dir),
+                'pending': state.get('pending'),
+                'auto_activate': self.auto_activate,
+                'running': self.running,
+                'blocked': self.blocked,
+                'last_trained_at': state.get('last_trained_at') or None,
+                'min_records': self.min_records,
+                'interval_seconds': self.interval_seconds,
+                'limits': {
+                    'threads': self.threads,
+                    'memory_mb': self.memory_mb,
+                    'cpu_seconds': self.cpu_seconds,
+                    'timeout_seconds': self.timeout_seconds,
+                },
+                'runs': self.runs,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'activations': self.activations,
+                'last_run': self.last_run,
+                'last_error': self.last_error,
+            }
+
+
+if __name__ == '__main__':
+    if sys.argv[1] == 'promote':
+        # python -m api.retraining promote <artifact_dir> [artifact]
+        print(f" Promoted {promote(*sys.argv[2:4])}; workers activate it on their next check")
+    else:
+        # The report is the last line on stdout; the scheduler reads it back from the run's log
+        print(json.dumps(train(json.loads(sys.argv[1]))))
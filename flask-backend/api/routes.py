@@ -3,6 +3,13 @@ from datetime import datetime
 import joblib
 import numpy as np
 import os
+import time
+
+from .idempotency import IdempotencyStore, SQLiteIdempotencyStore, idempotent
+from .resilience import CircuitBreaker, Deadline, LatencyEstimate, request_budget_ms
+from .rules import rules_prediction
+from .schema import ValidationError, validate_payload
+from . import tracing
 
 try:
     from .ml_predictor import predict_student
@@ -13,20 +20,13 @@ except ImportError:
         reading = float(student_data.get('readingScore', 0))
         speaking = float(student_data.get('speakingScore', 0))
         avg = (writing + reading + speaking) / 3
-        
-        if avg >= 80:
-            risk = 'high_achiever'
-            confidence = 0.9
-        elif avg >= 60:
-            risk = 'satisfactory'
-            confidence = 0.85
-        else:
-            risk = 'at_risk'
-            confidence = 0.8
+
+        risk, confidence, probabilities = rules_prediction(avg)
         
         return {
             'riskLevel': risk,
             'confidence': confidence,
+            'probabilities': probabilities,
             'predictedScore': round(avg, 1),
             'englishAverage': round(avg, 1),
             'predictionMethod': 'fallback'
@@ -40,6 +40,29 @@ classifier = None
 encoders = None
 model_loaded = False
 
+PREDICT_BUDGET_MS = float(os.environ.get('PREDICT_BUDGET_MS', 500))
+
+inference_latency = LatencyEstimate()
+db_write_latency = LatencyEstimate()
+inference_breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 5)),
+    recovery_timeout=float(os.environ.get('BREAKER_RECOVERY_SECONDS', 30)),
+    slow_call_ms=float(os.environ.get('BREAKER_SLOW_CALL_MS', 250))
+)
+
+# A retried /predict replays the first response instead of inserting another Student and Prediction
+if os.environ.get('IDEMPOTENCY_DB'):
+    idempotency_store = SQLiteIdempotencyStore(
+        os.environ['IDEMPOTENCY_DB'],
+        ttl_seconds=float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400)),
+        max_entries=int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 10000))
+    )
+else:
+    idempotency_store = IdempotencyStore(
+        ttl_seconds=float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400)),
+        max_entries=int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 10000))
+    )
+
 def load_ml_models():
     """Load trained ML models"""
     global classifier, encoders, model_loaded
@@ -206,29 +229,81 @@ def health_check():
         'message': 'Flask ML Backend is running',
         'ml_models_loaded': model_loaded,
         'model_type': 'RandomForest' if model_loaded else 'None',
+        'circuit_breaker': inference_breaker.snapshot(),
+        'inference_latency_ms': round(inference_latency.value_ms, 2),
+        'db_write_latency_ms': round(db_write_latency.value_ms, 2),
+        'default_budget_ms': PREDICT_BUDGET_MS,
+        'idempotency': idempotency_store.stats(),
         'timestamp': datetime.now().isoformat()
     })
 
 @api_bp.route('/predict', methods=['POST'])
+@idempotent(lambda: idempotency_store)
 def predict():
     try:
-        data = request.json
-        print(f" Received prediction request for: {data.get('name', 'Unknown')}")
-
+        try:
+            student_record = validate_payload(request.get_json(silent=True))
+        except ValidationError as e:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid prediction payload',
+                'details': e.errors
+            }), 400
+
+        # Downstream code reads the normalized payload, so every value is already typed.
+        data = student_record.to_dict()
+        print(f" Received prediction request for: {student_record.name}")
+
+        deadline = Deadline(request_budget_ms(request.headers, data, PREDICT_BUDGET_MS))
         prediction_result = None
         prediction_method = 'fallback'
+        degraded_reason = None
+
+        if model_loaded:
+            if not deadline.allows(inference_latency.value_ms + db_write_latency.value_ms):
+                degraded_reason = 'deadline'
+                inference_latency.decay()
+            elif not inference_breaker.allow():
+                degraded_reason = 'circuit_open'
         
         try:
-            if model_loaded:
-                prediction_result = predict_with_ml_model(data)
-                prediction_method = 'random_forest'
-                print(f" Using ML model prediction: {prediction_result['riskLevel']}")
-            else:
+            if degraded_reason:
+                raise Exception(f"ML inference skipped ({degraded_reason})")
+            if not model_loaded:
                 raise Exception("ML model not loaded")
+
+            inference_start = time.perf_counter()
+            try:
+                with tracing.span('inference', rows=1):
+                    prediction_result = predict_with_ml_model(data)
+            except Exception:
+                inference_breaker.record_failure('error')
+                degraded_reason = 'inference_error'
+                raise
+            inference_ms = (time.perf_counter() - inference_start) * 1000
+            inference_latency.observe(inference_ms)
+            inference_breaker.record_success(inference_ms)
+
+            prediction_method = 'random_forest'
+            print(f" Using ML model prediction: {prediction_result['riskLevel']}")
         except Exception as ml_error:
             print(f" ML prediction failed, using fallback: {ml_error}")
-            prediction_result = predict_student(data)
-            prediction_method = 'simple_rules'
+            tracing.annotate(fallback_reason=degraded_reason or 'no_model')
+            if degraded_reason:
+                avg = student_record.english_avg
+                risk, confidence, probabilities = rules_prediction(avg)
+                prediction_result = {
+                    'riskLevel': risk,
+                    'confidence': confidence,
+                    'probabilities': probabilities,
+                    'predictedScore': round(avg, 1),
+                    'englishAverage': round(avg, 1),
+                    'degradedReason': degraded_reason
+                }
+                prediction_method = 'simple_rules_degraded'
+            else:
+                prediction_result = predict_student(data)
+                prediction_method = 'simple_rules'
         
         if 'probabilities' not in prediction_result:
             risk = prediction_result['riskLevel']
@@ -240,10 +315,10 @@ def predict():
                 probabilities = {'at_risk': 0.70, 'satisfactory': 0.25, 'high_achiever': 0.05}
             prediction_result['probabilities'] = probabilities
 
-        writing = float(data.get('writingScore', 0))
-        reading = float(data.get('readingScore', 0))
-        speaking = float(data.get('speakingScore', 0))
-        english_avg = (writing + reading + speaking) / 3
+        writing = student_record.writing_score
+        reading = student_record.reading_score
+        speaking = student_record.speaking_score
+        english_avg = student_record.english_avg
         
 
         if 'factors' not in prediction_result:
@@ -307,7 +382,7 @@ def predict():
 
         student = Student(
             name=data.get('name', 'Unknown'),
-            age=int(data.get('age', 0)),
+            age=student_record.age,
             gender=data.get('gender', ''),
             student_education=data.get('studentEducation', ''),
             study_time_per_week=data.get('studyTimePerWeek', ''),
@@ -322,8 +397,10 @@ def predict():
             tutoring=bool(data.get('tutoring', False))
         )
         
-        db.session.add(student)
-        db.session.commit()
+        db_write_start = time.perf_counter()
+        with tracing.span('db.commit', table='students'):
+            db.session.add(student)
+            db.session.commit()
         print(f"Saved student to database: {student.name} (ID: {student.id})")
 
         prediction = Prediction(
@@ -336,8 +413,10 @@ def predict():
             recommendations=prediction_result.get('recommendations', [])
         )
         
-        db.session.add(prediction)
-        db.session.commit()
+        with tracing.span('db.commit', table='predictions'):
+            db.session.add(prediction)
+            db.session.commit()
+        db_write_latency.observe((time.perf_counter() - db_write_start) * 1000)
         print(f"Saved prediction to database for student: {student.id}")
 
         prediction_result['student_id'] = student.id
@@ -0,0 +1,22 @@
+def rules_prediction(english_avg):
+    """Risk level, confidence and class probabilities from the English average alone"""
+    if english_avg >= 80:
+        risk = 'high_achiever'
+        confidence = 0.9
+    elif english_avg >= 60:
+        risk = 'satisfactory'
+        confidence = 0.85
+    else:
+        risk = 'at_risk'
+        confidence = 0.8
+
+    if english_avg >= 80:
+        probabilities = {'at_risk': 0.05, 'satisfactory': 0.25, 'high_achiever': 0.70}
+    elif english_avg >= 70:
+        probabilities = {'at_risk': 0.15, 'satisfactory': 0.70, 'high_achiever': 0.15}
+    elif english_avg >= 60:
+        probabilities = {'at_risk': 0.30, 'satisfactory': 0.60, 'high_achiever': 0.10}
+    else:
+        probabilities = {'at_risk': 0.70, 'satisfactory': 0.25, 'high_achiever': 0.05}
+
+    return risk, confidence, probabilities
@@ -0,0 +1,188 @@
+import math
+
+STUDY_TIME_VALUES = ('less_than_2', '2_to_5', '5_to_10', 'more_than_10')
+ABSENCE_VALUES = ('none', '1_to_5', '6_to_10', 'more_than_10')
+EDUCATION_VALUES = ('secondary', 'bachelors', 'masters', 'doctorate')
+TEST_PREP_VALUES = ('prepared', 'not_prepared')
+GENDER_VALUES = ('male', 'female')
+
+MAX_BATCH_ROWS = 1000
+
+
+class ValidationError(Exception):
+    """Raised with a list of {'field', 'message'} (and 'index' for batches) entries"""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid field(s)")
+        self.errors = errors
+
+
+class StudentRecord:
+    """Validated and normalized prediction payload"""
+
+    __slots__ = (
+        'name', 'age', 'gender', 'student_education', 'study_time_per_week',
+        'absences', 'test_prep', 'attendance_rate', 'writing_score',
+        'reading_score', 'speaking_score', 'english_avg', 'extra_curricular',
+        'internet_access', 'tutoring', 'latency_budget_ms', 'region',
+    )
+
+    def replace(self, **changes):
+        """Copy of this record with some fields changed and english_avg kept in sync"""
+        clone = StudentRecord.__new__(StudentRecord)
+        for slot in StudentRecord.__slots__:
+            setattr(clone, slot, changes.get(slot, getattr(self, slot)))
+        clone.english_avg = (clone.writing_score + clone.reading_score + clone.speaking_score) / 3
+        return clone
+
+    def to_dict(self):
+        return {key: getattr(self, slot) for key, slot in _PAYLOAD_KEYS}
+
+
+def _number(kind, minimum=None, maximum=None):
+    def parse(value):
+        # bool is an int subclass; "true" is never a score
+        if isinstance(value, bool):
+            raise ValueError(f"expected a number, got {type(value).__name__}")
+        if isinstance(value, str):
+            value = value.strip()
+        try:
+            number = kind(float(value)) if kind is int else float(value)
+        except OverflowError:
+            # int() of an infinity; 1e400 parses to one too
+            raise ValueError("must be a finite number")
+        except (TypeError, ValueError):
+            raise ValueError(f"expected a number, got {value!r}")
+        if kind is int and float(value) != number:
+            raise ValueError(f"expected a whole number, got {value!r}")
+        if math.isnan(number) or math.isinf(number):
+            raise ValueError("must be a finite number")
+        if minimum is not None and number < minimum:
+            raise ValueError(f"must be >= {minimum}")
+        if maximum is not None and number > maximum:
+            raise ValueError(f"must be <= {maximum}")
+        return number
+    return parse
+
+
+def _choice(allowed):
+    """Enum parser; a blank string (what the app's unset pickers send) returns None, meaning missing"""
+    allowed_set = frozenset(allowed)
+
+    def parse(value):
+        if not isinstance(value, str):
+            raise ValueError(f"expected one of {', '.join(allowed)}")
+        normalized = value.strip().lower()
+        if not normalized:
+            return None
+        if normalized not in allowed_set:
+            raise ValueError(f"expected one of {', '.join(allowed)}, got {value!r}")
+        return normalized
+    return parse
+
+
+def _text(max_length):
+    def parse(value):
+        if not isinstance(value, str):
+            raise ValueError("expected a string")
+        value = value.strip()
+        if len(value) > max_length:
+            raise ValueError(f"must be at most {max_length} characters")
+        return value or 'Unknown'
+    return parse
+
+
+_TRUE = frozenset(('true', '1', 'yes'))
+_FALSE = frozenset(('false', '0', 'no', ''))
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in _TRUE | _FALSE:
+        return value.strip().lower() in _TRUE
+    raise ValueError(f"expected a boolean, got {value!r}")
+
+
+# (payload key, record slot, parser, default). Defaults match what the
+# feature code assumed when a field was missing.
+FIELDS = (
+    ('name', 'name', _text(200), 'Unknown'),
+    ('age', 'age', _number(int, 0, 120), 0),
+    ('gender', 'gender', _choice(GENDER_VALUES), 'female'),
+    ('studentEducation', 'student_education', _choice(EDUCATION_VALUES), 'secondary'),
+    ('studyTimePerWeek', 'study_time_per_week', _choice(STUDY_TIME_VALUES), '2_to_5'),
+    ('absences', 'absences', _choice(ABSENCE_VALUES), 'none'),
+    ('testPrep', 'test_prep', _choice(TEST_PREP_VALUES), 'not_prepared'),
+    ('attendanceRate', 'attendance_rate', _number(float, 0, 100), 65.0),
+    ('writingScore', 'writing_score', _number(float, 0, 100), 0.0),
+    ('readingScore', 'reading_score', _number(float, 0, 100), 0.0),
+    ('speakingScore', 'speaking_score', _number(float, 0, 100), 0.0),
+    ('extraCurricular', 'extra_curricular', _flag, False),
+    ('internetAccess', 'internet_access', _flag, True),
+    ('tutoring', 'tutoring', _flag, False),
+    ('latencyBudgetMs', 'latency_budget_ms', _number(float, 0), None),
+    # Picks a per-region model when one is deployed
+    ('region', 'region', _text(100), None),
+)
+
+_PAYLOAD_KEYS = tuple((key, slot) for key, slot, _, _ in FIELDS) + (('englishAverage', 'english_avg'),)
+
+
+def validate_payload(data, index=None):
+    """Validate one prediction payload into a StudentRecord in a single pass"""
+    if not isinstance(data, dict):
+        error = {'field': None, 'message': 'expected a JSON object'}
+        if index is not None:
+            error['index'] = index
+        raise ValidationError([error])
+
+    record = StudentRecord.__new__(StudentRecord)
+    errors = None
+
+    for key, slot, parse, default in FIELDS:
+        value = data.get(key)
+        if value is None:
+            setattr(record, slot, default)
+            continue
+        try:
+            parsed = parse(value)
+            setattr(record, slot, default if parsed is None else parsed)
+        except ValueError as e:
+            if errors is None:
+                errors = []
+            error = {'field': key, 'message': str(e)}
+            if index is not None:
+                error['index'] = index
+            errors.append(error)
+
+    if errors:
+        raise ValidationError(errors)
+
+    record.english_avg = (record.writing_score + record.reading_score + record.speaking_score) / 3
+    return record
+
+
+def validate_batch(data, max_rows=MAX_BATCH_ROWS):
+    """Validate a batch body ({'students': [...]} or a bare list); all rows or nothing"""
+    rows = data.get('students') if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        raise ValidationError([{'field': 'students', 'message': 'expected a list of student objects'}])
+    if not rows:
+        raise ValidationError([{'field': 'students', 'message': 'must contain at least one student'}])
+    if len(rows) > max_rows:
+        raise ValidationError([{'field': 'students', 'message': f'at most {max_rows} students per request'}])
+
+    records = []
+    errors = []
+    for i, row in enumerate(rows):
+        try:
+            records.append(validate_payload(row, index=i))
+        except ValidationError as e:
+            errors.extend(e.errors)
+
+    if errors:
+        raise ValidationError(errors)
+    return records
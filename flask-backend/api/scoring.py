@@ -0,0 +1,111 @@
+import os
+import time
+
+import joblib
+import numpy as np
+
+RISK_MODEL = 'random_forest_classifier'
+FOREST_SCORE_MODEL = 'random_forest_regressor'
+LINEAR_SCORE_MODEL = 'linear_regression'
+
+SCORE_MODEL_DIRS = ['models', '../assets/models', 'assets/models']
+
+
+def find_model_file(filename, search_dirs=None):
+    """Return the first existing path for a model artifact, or None"""
+    for directory in search_dirs or SCORE_MODEL_DIRS:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_score_models(search_dirs=None, n_features=None):
+    """Load the forest regressor and linear model used for predictedScore
+
+    A model that doesn't take ``n_features`` inputs (the classifier's
+    width) is left out rather than failing every request.
+    """
+    loaded = {}
+    for name in (FOREST_SCORE_MODEL, LINEAR_SCORE_MODEL):
+        path = find_model_file(f'{name}.pkl', search_dirs)
+        if path is None:
+            print(f" Score model not found: {name}.pkl")
+            loaded[name] = None
+            continue
+
+        model = joblib.load(path)
+        width = getattr(model, 'n_features_in_', None)
+        if n_features is not None and width != n_features:
+            print(f" Score model {path} takes {width} features, the classifier {n_features}; not used")
+            loaded[name] = None
+            continue
+        if hasattr(model, 'n_jobs'):
+            # Trees are walked one by one against the deadline below, so the
+            # joblib pool would only add dispatch overhead.
+            model.n_jobs = 1
+        loaded[name] = model
+        print(f" Score model loaded from: {path}")
+
+    return loaded[FOREST_SCORE_MODEL], loaded[LINEAR_SCORE_MODEL]
+
+
+def forest_scores(regressor, X, deadline):
+    """Mean and per-tree spread of the forest, or None if the deadline passes first"""
+    trees = regressor.estimators_
+    per_tree = np.empty((len(trees), X.shape[0]))
+
+    for i, tree in enumerate(trees):
+        if time.perf_counter() > deadline:
+            return None
+        per_tree[i] = tree.predict(X, check_input=False)
+
+    return per_tree.mean(axis=0), per_tree.std(axis=0)
+
+
+def score_batch(classifier, regressor, linear_model, X, budget_ms):
+    """Classifier probabilities and predicted scores for one shared feature matrix
+
+    The forest regressor is used while it fits inside ``budget_ms``; if it
+    cannot finish in time (or fails) the linear model answers instead.
+    Each field reports which model produced it, with None meaning the
+    caller must fall back to its own rule; a score model failing only
+    loses the scores, never the classifier's probabilities.
+    """
+    start = time.perf_counter()
+    deadline = start + budget_ms / 1000.0
+    X = np.ascontiguousarray(X, dtype=np.float32)
+
+    result = {
+        'classes': None,
+        'probabilities': None,
+        'risk_model': None,
+        'scores': None,
+        'score_spread': None,
+        'score_model': None,
+    }
+
+    if classifier is not None:
+        result['classes'] = [str(c) for c in classifier.classes_]
+        result['probabilities'] = classifier.predict_proba(X)
+        result['risk_model'] = RISK_MODEL
+
+    if regressor is not None:
+        try:
+            forest = forest_scores(regressor, X, deadline)
+        except Exception as e:
+            print(f" Score model {FOREST_SCORE_MODEL} failed: {e}")
+            forest = None
+        if forest is not None:
+            result['scores'], result['score_spread'] = forest
+            result['score_model'] = FOREST_SCORE_MODEL
+
+    if result['scores'] is None and linear_model is not None:
+        try:
+            result['scores'] = linear_model.predict(X)
+            result['score_model'] = LINEAR_SCORE_MODEL
+        except Exception as e:
+            print(f" Score model {LINEAR_SCORE_MODEL} failed: {e}")
+
+    result['elapsed_ms'] = (time.perf_counter() - start) * 1000
+    return result
@@ -0,0 +1,137 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class ShadowEvaluator:
+    """Score a sample of live feature vectors with a candidate model off the request path"""
+
+    def __init__(self, candidate, sample_rate=0.1, queue_size=256, max_batch=32, latency_window=1000):
+        self.candidate = candidate
+        self.sample_rate = float(sample_rate)
+        self.max_batch = int(max_batch)
+
+        # A single-row predict_proba with n_jobs=-1 fans out to every core,
+        # which is exactly what the shadow worker must not do.
+        if hasattr(candidate, 'n_jobs'):
+            candidate.n_jobs = 1
+
+        self._queue = queue.Queue(maxsize=int(queue_size))
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=int(latency_window))
+
+        self.submitted = 0
+        self.shed = 0
+        self.scored = 0
+        self.failed = 0
+        self.agreements = 0
+        self._delta_sum = {}
+        self._delta_max = {}
+
+        self._worker = threading.Thread(target=self._run, name='shadow-evaluator', daemon=True)
+        self._worker.start()
+
+    def submit(self, features, primary_classes, primary_probabilities):
+        """Queue one scored request for the candidate; never blocks the caller"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+
+        item = (
+            np.asarray(features, dtype=float),
+            [str(c) for c in primary_classes],
+            np.asarray(primary_probabilities, dtype=float),
+        )
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.shed += 1
+            return False
+
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._score(batch)
+            except Exception as e:
+                print(f" Shadow scoring failed: {e}")
+                with self._lock:
+                    self.failed += len(batch)
+
+    def _score(self, batch):
+        X = np.vstack([item[0] for item in batch])
+
+        start = time.perf_counter()
+        candidate_probabilities = self.candidate.predict_proba(X)
+        per_row_ms = (time.perf_counter() - start) * 1000 / len(batch)
+
+        candidate_classes = [str(c) for c in self.candidate.classes_]
+
+        with self._lock:
+            for (_, primary_classes, primary_probs), cand_probs in zip(batch, candidate_probabilities):
+                primary_label = primary_classes[int(np.argmax(primary_probs))]
+                candidate_label = candidate_classes[int(np.argmax(cand_probs))]
+                if primary_label == candidate_label:
+                    self.agreements += 1
+
+                primary_by_class = dict(zip(primary_classes, primary_probs))
+                for class_name, p in zip(candidate_classes, cand_probs):
+                    delta = abs(float(p) - float(primary_by_class.get(class_name, 0.0)))
+                    self._delta_sum[class_name] = self._delta_sum.get(class_name, 0.0) + delta
+                    self._delta_max[class_name] = max(self._delta_max.get(class_name, 0.0), delta)
+
+                self._latencies.append(per_row_ms)
+
+            self.scored += len(batch)
+
+    def stats(self):
+        """Aggregated agreement, probability deltas and candidate latency"""
+        with self._lock:
+            scored = self.scored
+            latencies = np.array(self._latencies) if self._latencies else None
+            stats = {
+                'sample_rate': self.sample_rate,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'submitted': self.submitted,
+                'shed': self.shed,
+                'scored': scored,
+                'failed': self.failed,
+                'agreement_rate': self.agreements / scored if scored else None,
+                'probability_delta': {
+                    class_name: {
+                        'mean_abs': self._delta_sum[class_name] / scored,
+                        'max_abs': self._delta_max[class_name],
+                    }
+                    for class_name in self._delta_sum
+                } if scored else {},
+            }
+
+        if latencies is not None:
+            stats['candidate_latency_ms'] = {
+                'mean': float(latencies.mean()),
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'max': float(latencies.max()),
+            }
+        else:
+            stats['candidate_latency_ms'] = None
+
+        return stats
@@ -0,0 +1,452 @@
+"""Per-request traces with stage spans, tail-sampled into OTLP/JSON files
+
+Each line a SpanFileExporter writes is one OTLP ``ExportTraceServiceRequest``
+in its JSON encoding (the format the OpenTelemetry Collector's
+``otlpjsonfile`` receiver reads), holding every span of one kept trace.
+Nothing here depends on the OpenTelemetry SDK.
+
+Views open stage spans through the module-level ``span``; with tracing
+off, or outside a request, it returns a shared no-op context, so the
+instrumentation costs one attribute lookup.
+"""
+import glob
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request
+
+TRACE_HEADER = 'X-Trace-Id'
+TRACEPARENT_HEADER = 'traceparent'
+SERVICE_NAME = 'student-performance-api'
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+_TRACE_ID = re.compile(r'^[0-9a-f]{32}$')
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+_ZERO_TRACE = '0' * 32
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        # OTLP/JSON carries 64-bit integers as strings
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Span:
+    __slots__ = ('name', 'span_id', 'parent_id', 'kind', 'start_ns', 'end_ns', 'attributes', 'status', 'message')
+
+    def __init__(self, name, span_id, parent_id, start_ns, kind=SPAN_KIND_INTERNAL, attributes=None):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = start_ns
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.message = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, message):
+        self.status = STATUS_ERROR
+        self.message = message
+
+    def to_otlp(self, trace_id):
+        span = {
+            'traceId': trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': _attributes(self.attributes),
+            'status': {'code': self.status},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.message:
+            span['status']['message'] = self.message
+        return span
+
+
+class _StageSpan:
+    """Context manager for one stage; an exception leaving it marks the span (and trace) failed"""
+
+    __slots__ = ('trace', 'span')
+
+    def __init__(self, trace, span):
+        self.trace = trace
+        self.span = span
+
+    def __enter__(self):
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.span.fail(f'{exc_type.__name__}: {exc}')
+            self.trace.error = True
+        self.trace.end(self.span)
+        return False
+
+
+class _NullSpan:
+    """Stands in for both the context manager and the span when nothing is traced"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, message):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """The spans of one request; the root is open for the request's whole life"""
+
+    def __init__(self, name, trace_id, parent_id=None, sampled=False, attributes=None, max_spans=256):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.error = False
+        self.max_spans = max_spans
+        self.dropped = 0
+        # Wall-clock anchor, with durations from the monotonic clock
+        self._epoch_ns = time.time_ns()
+        self._perf_ns = time.perf_counter_ns()
+        self.root = Span(name, os.urandom(8).hex(), parent_id, self._epoch_ns, SPAN_KIND_SERVER, attributes)
+        self.spans = [self.root]
+        self._open = [self.root]
+
+    def _now(self):
+        return self._epoch_ns + time.perf_counter_ns() - self._perf_ns
+
+    def span(self, name, **attributes):
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return NULL_SPAN
+        span = Span(name, os.urandom(8).hex(), self._open[-1].span_id, self._now(), attributes=attributes)
+        self.spans.append(span)
+        self._open.append(span)
+        return _StageSpan(self, span)
+
+    def end(self, span):
+        span.end_ns = self._now()
+        if span in self._open:
+            self._open.remove(span)
+
+    def set(self, **attributes):
+        self.root.set(**attributes)
+
+    @property
+    def duration_ms(self):
+        end = self.root.end_ns if self.root.end_ns is not None else self._now()
+        return (end - self.root.start_ns) / 1e6
+
+    def traceparent(self):
+        return f'00-{self.trace_id}-{self.root.span_id}-{"01" if self.sampled else "00"}'
+
+    def to_otlp(self, resource_attributes):
+        if self.dropped:
+            self.root.set(**{'trace.dropped_spans': self.dropped})
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': _attributes(resource_attributes)},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [span.to_otlp(self.trace_id) for span in self.spans if span.end_ns is not None],
+                }],
+            }]
+        }
+
+
+class SpanFileExporter:
+    """Kept traces as OTLP/JSON lines in size-rotated files, one set per process
+
+    Files are ``traces-<pid>-<index>.jsonl``; a new one starts past
+    ``max_file_bytes`` and this process's oldest are deleted beyond
+    ``max_files``, so disk use is bounded per worker.
+
+    ``export`` only queues the finished trace. A writer thread encodes
+    whatever has queued (up to ``max_batch``) and appends it in one
+    write, so requests never wait on JSON encoding or the disk. When
+    ``queue_size`` traces are already waiting, new ones are shed.
+    """
+
+    def __init__(self, directory, max_file_bytes=16 * 1024 ** 2, max_files=8, queue_size=1024, max_batch=64):
+        self.directory = directory
+        self.max_file_bytes = int(max_file_bytes)
+        self.max_files = max(1, int(max_files))
+        self.max_batch = max(1, int(max_batch))
+        os.makedirs(directory, exist_ok=True)
+
+        self._queue = queue.Queue(maxsize=int(queue_size))
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_bytes = 0
+        self._index = 0
+        self._paths = []
+        self._closed = False
+        self.exported = 0
+        self.failed = 0
+        self.shed = 0
+
+        self._writer = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+        self._writer.start()
+
+    def export(self, trace, resource):
+        """Queue a finished trace for the writer; never blocks the caller"""
+        try:
+            self._queue.put_nowait((trace, resource))
+        except queue.Full:
+            with self._lock:
+                self.shed += 1
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self._write(self._next_batch())
+
+    def _write(self, batch):
+        try:
+            data = ''.join(
+                json.dumps(trace.to_otlp(resource), separators=(',', ':')) + '\n' for trace, resource in batch
+            ).encode()
+        except Exception as e:
+            print(f" Trace export failed: {e}")
+            with self._lock:
+                self.failed += len(batch)
+            return
+        with self._lock:
+            if self._closed:
+                self.failed += len(batch)
+                return
+            try:
+                if self._file is None or self._file_bytes + len(data) > self.max_file_bytes:
+                    self._rotate_locked()
+                self._file.write(data)
+                self._file.flush()
+                self._file_bytes += len(data)
+                self.exported += len(batch)
+            except OSError as e:
+                self.failed += len(batch)
+                print(f" Trace export failed: {e}")
+
+    def _rotate_locked(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, f'traces-{os.getpid()}-{self._index:04d}.jsonl')
+        self._index += 1
+        self._file = open(path, 'ab')
+        self._file_bytes = self._file.tell()
+        self._paths.append(path)
+        while len(self._paths) > self.max_files:
+            try:
+                os.remove(self._paths.pop(0))
+            except OSError:
+                pass
+
+    def close(self):
+        """Write what is still queued, then close the file; later traces are counted as failed"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+        with self._lock:
+            self._closed = True
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'exported': self.exported,
+                'failed': self.failed,
+                'queued': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'shed': self.shed,
+                'files': len(self._paths),
+                'max_files': self.max_files,
+                'max_file_bytes': self.max_file_bytes,
+            }
+
+
+def trace_files(directory):
+    """Every exporter file in a directory, oldest first"""
+    return sorted(glob.glob(os.path.join(directory, 'traces-*.jsonl')), key=os.path.getmtime)
+
+
+class Tracer:
+    """Starts a trace per request and keeps it by tail sampling
+
+    A finished trace is exported when it failed (an exception left a
+    span, or the response was a 5xx), took at least ``slow_ms``, arrived
+    with the sampled flag set in its traceparent, or wins a
+    ``sample_rate`` draw; everything else is dropped. The trace id comes
+    from an incoming traceparent or X-Trace-Id header when there is one
+    and is returned in both on the response.
+    """
+
+    def __init__(self, exporter, slow_ms=250, sample_rate=0.01, max_spans=256, service_name=SERVICE_NAME):
+        self.exporter = exporter
+        self.slow_ms = float(slow_ms)
+        self.sample_rate = float(sample_rate)
+        self.max_spans = int(max_spans)
+        self.resource = {
+            'service.name': service_name,
+            'process.pid': os.getpid(),
+            'host.name': os.uname().nodename if hasattr(os, 'uname') else None,
+        }
+        self._lock = threading.Lock()
+        self.started = 0
+        self.kept = {'error': 0, 'slow': 0, 'upstream': 0, 'sampled': 0}
+        self.dropped = 0
+
+    def start(self, name, headers, attributes=None):
+        trace_id, parent_id, sampled = None, None, False
+        match = _TRACEPARENT.match(headers.get(TRACEPARENT_HEADER, '').strip().lower())
+        if match and match.group(1) != _ZERO_TRACE:
+            trace_id, parent_id = match.group(1), match.group(2)
+            sampled = bool(int(match.group(3), 16) & 1)
+        else:
+            supplied = headers.get(TRACE_HEADER, '').strip().lower().replace('-', '')
+            if _TRACE_ID.match(supplied) and supplied != _ZERO_TRACE:
+                trace_id = supplied
+        with self._lock:
+            self.started += 1
+        return Trace(name, trace_id or os.urandom(16).hex(), parent_id, sampled, attributes, self.max_spans)
+
+    def finish(self, trace, status_code=None):
+        """End the root span and export the trace if the sampling rules keep it; returns the reason or None"""
+        trace.end(trace.root)
+        if status_code is not None:
+            trace.set(**{'http.response.status_code': status_code})
+            if status_code >= 500:
+                trace.error = True
+        if trace.error:
+            trace.root.status = STATUS_ERROR
+
+        if trace.error:
+            reason = 'error'
+        elif trace.duration_ms >= self.slow_ms:
+            reason = 'slow'
+        elif trace.sampled:
+            reason = 'upstream'
+        elif random.random() < self.sample_rate:
+            reason = 'sampled'
+        else:
+            reason = None
+
+        with self._lock:
+            if reason is None:
+                self.dropped += 1
+            else:
+                self.kept[reason] += 1
+        if reason is not None:
+            trace.set(**{'sampling.reason': reason})
+            self.exporter.export(trace, self.resource)
+        return reason
+
+    def install(self, app):
+        """Trace every request of ``app``; call before registering other before_request hooks"""
+
+        @app.before_request
+        def start_trace():
+            g.trace = self.start(f'{request.method} {request.path}', request.headers, {
+                'http.request.method': request.method,
+                'url.path': request.path,
+                'http.route': request.url_rule.rule if request.url_rule is not None else None,
+                'client.id': request.headers.get('X-Client-Id'),
+            })
+
+        @app.after_request
+        def finish_trace(response):
+            trace = g.pop('trace', None)
+            if trace is None:
+                return response
+            if response.headers.get('Idempotent-Replayed'):
+                trace.set(**{'idempotency.replayed': True})
+            response.headers[TRACE_HEADER] = trace.trace_id
+            response.headers[TRACEPARENT_HEADER] = trace.traceparent()
+            self.finish(trace, response.status_code)
+            return response
+
+        @app.teardown_request
+        def abandon_trace(error=None):
+            # Only reached with a trace when the view raised past Flask's error handling
+            trace = g.pop('trace', None)
+            if trace is not None:
+                if error is not None:
+                    trace.root.fail(f'{type(error).__name__}: {error}')
+                    trace.error = True
+                self.finish(trace, 500)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'started': self.started,
+                'kept': dict(self.kept),
+                'dropped': self.dropped,
+                'slow_ms': self.slow_ms,
+                'sample_rate': self.sample_rate,
+            }
+        stats['exporter'] = self.exporter.stats()
+        return stats
+
+
+def current_trace():
+    return g.get('trace') if has_request_context() else None
+
+
+def span(name, **attributes):
+    """Stage span in the current request's trace; a no-op when it isn't traced"""
+    trace = current_trace()
+    if trace is None:
+        return NULL_SPAN
+    return trace.span(name, **attributes)
+
+
+def annotate(**attributes):
+    """Attributes on the current request's root span (model version, fallback reason, ...)"""
+    trace = current_trace()
+    if trace is not None:
+        trace.set(**attributes)
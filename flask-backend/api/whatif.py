@@ -0,0 +1,106 @@
+from itertools import combinations
+
+from .schema import STUDY_TIME_VALUES
+
+STUDY_TIME_LABELS = {
+    'less_than_2': 'under 2 hours/week',
+    '2_to_5': '2-5 hours/week',
+    '5_to_10': '5-10 hours/week',
+    'more_than_10': 'over 10 hours/week',
+}
+
+ABSENCE_LABELS = {
+    'none': 'no absences',
+    '1_to_5': '1-5 days',
+    '6_to_10': '6-10 days',
+    'more_than_10': 'over 10 days',
+}
+
+# Fewest absences first, so "fewer" means a lower index
+ABSENCES_BEST_FIRST = ('none', '1_to_5', '6_to_10', 'more_than_10')
+
+ATTENDANCE_STEPS = (10, 20)
+
+# English average each level starts at, as in api.rules and the training labels
+RISK_LEVEL_THRESHOLDS = (('satisfactory', 60), ('high_achiever', 80))
+
+
+def single_interventions(student):
+    """Feasible one-field changes to a student as (field, changes, slots, description)"""
+    interventions = []
+
+    current = STUDY_TIME_VALUES.index(student.study_time_per_week)
+    for value in STUDY_TIME_VALUES[current + 1:]:
+        interventions.append((
+            'studyTimePerWeek',
+            {'studyTimePerWeek': value},
+            {'study_time_per_week': value},
+            f'Increase study time to {STUDY_TIME_LABELS[value]}'
+        ))
+
+    current = ABSENCES_BEST_FIRST.index(student.absences)
+    for value in ABSENCES_BEST_FIRST[:current]:
+        interventions.append((
+            'absences',
+            {'absences': value},
+            {'absences': value},
+            f'Reduce absences to {ABSENCE_LABELS[value]}'
+        ))
+
+    # No test preparation intervention: prepare_ml_features sends a constant
+    # for that input, so completing it could never move the prediction.
+
+    for step in ATTENDANCE_STEPS:
+        value = min(100.0, student.attendance_rate + step)
+        if value > student.attendance_rate:
+            interventions.append((
+                'attendanceRate',
+                {'attendanceRate': value},
+                {'attendance_rate': value},
+                f'Raise attendance rate to {value:.0f}%'
+            ))
+
+    # No score interventions: the risk levels are defined by the English
+    # average of these scores, so raising them restates the label rather
+    # than recommending anything. score_targets reports them apart.
+
+    return interventions
+
+
+def generate_counterfactuals(student, pairs=True):
+    """Single changes plus, optionally, pairs of changes to different fields
+
+    Returns a list of (changes, description, record) in payload terms.
+    """
+    singles = single_interventions(student)
+    candidates = [
+        (changes, description, student.replace(**slots))
+        for _, changes, slots, description in singles
+    ]
+
+    if pairs:
+        for first, second in combinations(singles, 2):
+            if first[0] == second[0]:
+                continue
+            changes = {**first[1], **second[1]}
+            slots = {**first[2], **second[2]}
+            candidates.append((changes, f'{first[3]} and {second[3].lower()}', student.replace(**slots)))
+
+    return candidates
+
+
+
+def score_targets(student):
+    """English average each higher level starts at and how many points short of it the student is
+
+    Not ranked with the interventions, for the reason given there.
+    """
+    return [
+        {
+            'riskLevel': level,
+            'englishAverage': threshold,
+            'pointsNeeded': round(threshold - student.english_avg, 1),
+        }
+        for level, threshold in RISK_LEVEL_THRESHOLDS
+        if student.english_avg < threshold
+    ]
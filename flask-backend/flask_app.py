@@ -1,17 +1,51 @@
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
+import atexit
 import joblib
 import numpy as np
 import json
 import os
+import time
 from datetime import datetime
 
+from api.admission import BULK, CLIENT_HEADER, CRITICAL, INTERACTIVE, AdmissionController, Rejected, upstream_wait_ms
+from api.attribution import ForestExplainer
+from api import columnar
+from api.drift import DriftMonitor, load_reference
+from api.early_exit import MODES as EARLY_EXIT_MODES, EarlyExitForest
+from api.inference_pool import InferencePool
+from api.idempotency import IdempotencyStore, SQLiteIdempotencyStore, idempotent
+from api.memory_debug import GROUPINGS, MemoryProfiler, collect_garbage, debug_guarded, gc_summary, process_memory
+from api.model_cache import TENANT_HEADER, ModelBundle, TenantModelCache, deep_size
+from api.model_metadata import conditional_json, json_snapshot, model_info_snapshot
+from api.negotiation import BATCH_FIELDS, SCORE_FIELDS, RequestDecompressionMiddleware, compress_response, requested_fields
+from api.prediction_log import PredictionLog, model_version, read_segment, segment_paths
+from api.retraining import RetrainScheduler
+from api.resilience import CircuitBreaker, Deadline, LatencyEstimate, request_budget_ms
+from api.rules import rules_prediction
+from api.schema import ValidationError, validate_batch, validate_payload
+from api.scoring import find_model_file, load_score_models, score_batch
+from api.shadow import ShadowEvaluator
+from api import tracing
+from api.tracing import SpanFileExporter, Tracer
+from api.whatif import generate_counterfactuals, score_targets
+
 print("Starting Flask ML Backend...")
 print("=" * 60)
 
 app = Flask(__name__)
 CORS(app)  
 
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+app.wsgi_app = RequestDecompressionMiddleware(
+    app.wsgi_app, max_bytes=int(os.environ.get('MAX_REQUEST_BODY_BYTES', 16 * 1024 ** 2))
+)
+
+@app.after_request
+def negotiate_encoding(response):
+    return compress_response(response, request.headers.get('Accept-Encoding'), COMPRESS_MIN_BYTES, COMPRESS_LEVEL)
+
 @app.route('/test', methods=['GET'])
 def test_connection():
     return jsonify({
@@ -22,12 +56,31 @@ def test_connection():
 
 classifier = None
 encoders = None
+encoder_maps = {}
 model_config = None
+explainer = None
+active_model_version = None
+model_snapshot = None
 models_loaded = False
 
+# Labels for the positions produced by prepare_ml_features
+FEATURE_LABELS = [
+    'Gender',
+    'Study Time',
+    'Absences',
+    'Education Level',
+    'Attendance Rate',
+    'English Average Score',
+    'Test Preparation',
+    'Region',
+    'Lunch Type',
+]
+# prepare_ml_features always sends 0 for these, so no student's answer is behind them
+UNFILLED_FEATURES = (6, 7, 8)
+
 def load_ml_models():
     """Load trained ML models"""
-    global classifier, encoders, model_config, models_loaded
+    global classifier, encoders, encoder_maps, model_config, explainer, active_model_version, model_snapshot, models_loaded
     
     try:
         print(" Loading ML models...")
@@ -49,6 +102,8 @@ def load_ml_models():
             print(f"   ML model loaded from: {model_path}")
             print(f"   Model type: {type(classifier).__name__}")
             print(f"   Classes: {classifier.classes_}")
+            active_model_version = model_version(model_path)
+            print(f"   Version: {active_model_version}")
         else:
             print(f" Model file not found: {model_path}")
             return False
@@ -64,6 +119,16 @@ def load_ml_models():
             print(f" Encoders file not found: {encoder_path}")
             encoders = {}
         
+        # LabelEncoder.transform costs tens of microseconds per call; a dict
+        # lookup gives the same index for known classes.
+        encoder_maps = {
+            key: {label: index for index, label in enumerate(encoder.classes_)}
+            for key, encoder in (encoders or {}).items()
+        }
+
+        explainer = ForestExplainer(classifier, cache_size=int(os.environ.get('ATTRIBUTION_CACHE_SIZE', 4096)))
+        model_snapshot = model_info_snapshot(classifier, model_config, active_model_version, model_path)
+
         models_loaded = True
         print(" ML Models loaded successfully!")
         return True
@@ -75,60 +140,487 @@ def load_ml_models():
         return False
 
 models_loaded = load_ml_models()
+if not models_loaded:
+    model_snapshot = model_info_snapshot(None, model_config, None, None)
 
-def prepare_ml_features(student_data):
-    features = []
+# The global model as a bundle, so per-tenant and global requests share one code path
+global_bundle = (
+    ModelBundle(None, classifier, encoders, version=active_model_version, explainer=explainer)
+    if models_loaded else None
+)
 
-    gender = student_data.get('gender', 'female')
-    if encoders and 'gender' in encoders:
-        try:
-            features.append(encoders['gender'].transform([gender])[0])
-        except:
-            features.append(1 if gender.lower() == 'female' else 0)
-    else:
-        features.append(1 if gender.lower() == 'female' else 0)
+tenant_models = None
 
-    study_time = student_data.get('studyTimePerWeek', '2_to_5')
-    if encoders and 'study_time' in encoders:
-        try:
-            features.append(encoders['study_time'].transform([study_time])[0])
-        except:
-            study_time_map = {'less_than_2': 0, '2_to_5': 1, '5_to_10': 2, 'more_than_10': 3}
-            features.append(study_time_map.get(study_time, 1))
-    else:
-        study_time_map = {'less_than_2': 0, '2_to_5': 1, '5_to_10': 2, 'more_than_10': 3}
-        features.append(study_time_map.get(study_time, 1))
-    
-    absences = student_data.get('absences', 'none')
-    if encoders and 'attendance' in encoders:
-        try:
-            features.append(encoders['attendance'].transform([absences])[0])
-        except:
-            absences_map = {'none': 3, '1_to_5': 2, '6_to_10': 1, 'more_than_10': 0}
-            features.append(absences_map.get(absences, 3))
-    else:
-        absences_map = {'none': 3, '1_to_5': 2, '6_to_10': 1, 'more_than_10': 0}
-        features.append(absences_map.get(absences, 3))
-    
-    education = student_data.get('studentEducation', 'secondary')
-    if encoders and 'education' in encoders:
+def open_tenant_models():
+    """Per-tenant bundles from MODEL_TENANT_DIR, held within MODEL_CACHE_BUDGET_MB"""
+    global tenant_models
+
+    directory = os.environ.get('MODEL_TENANT_DIR', 'models/tenants')
+    if not os.path.isdir(directory):
+        return False
+
+    tenant_models = TenantModelCache(
+        directory,
+        budget_bytes=float(os.environ.get('MODEL_CACHE_BUDGET_MB', 512)) * 1024 ** 2,
+        fallback=global_bundle,
+        missing_ttl=float(os.environ.get('MODEL_CACHE_MISSING_TTL_SECONDS', 60)),
+        max_missing=int(os.environ.get('MODEL_CACHE_MAX_MISSING', 1024)),
+        # prepare_ml_features builds the global model's inputs; tenant models must take the same
+        n_features=classifier.n_features_in_ if models_loaded else None
+    )
+    print(f" Tenant models: {directory} (budget {tenant_models.budget_bytes / 1024 ** 2:.0f} MB)")
+    return True
+
+open_tenant_models()
+
+def model_for(student=None):
+    """Bundle for this request's tenant (X-Tenant-Id, ?tenant= or the payload's region)"""
+    tenant = request.headers.get(TENANT_HEADER) or request.args.get('tenant')
+    if not tenant and student is not None:
+        tenant = student.region
+    if tenant_models is None or not tenant:
+        return global_bundle
+    return tenant_models.get(tenant)
+
+def model_summary(bundle):
+    return {'tenant': bundle.tenant, 'version': bundle.version} if bundle is not None else None
+
+SCORE_BUDGET_MS = float(os.environ.get('SCORE_BUDGET_MS', 50))
+
+try:
+    regressor, linear_model = load_score_models(n_features=classifier.n_features_in_ if models_loaded else None)
+except Exception as e:
+    print(f" Error loading score models: {e}")
+    regressor, linear_model = None, None
+
+PREDICT_BUDGET_MS = float(os.environ.get('PREDICT_BUDGET_MS', 500))
+BATCH_MAX_ROWS = int(os.environ.get('BATCH_MAX_ROWS', 1000))
+COLUMNAR_MAX_ROWS = int(os.environ.get('COLUMNAR_MAX_ROWS', 100000))
+
+inference_latency = LatencyEstimate()
+inference_breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 5)),
+    recovery_timeout=float(os.environ.get('BREAKER_RECOVERY_SECONDS', 30)),
+    slow_call_ms=float(os.environ.get('BREAKER_SLOW_CALL_MS', 250))
+)
+
+admission = AdmissionController(
+    max_in_flight=int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 8)),
+    max_bulk_in_flight=int(os.environ.get('ADMISSION_MAX_BULK_IN_FLIGHT', 0)) or None,
+    max_queue_wait_ms=float(os.environ.get('ADMISSION_MAX_QUEUE_WAIT_MS', 200)),
+    max_queued=int(os.environ.get('ADMISSION_MAX_QUEUED', 16)),
+    client_rate=float(os.environ.get('CLIENT_RATE_PER_SECOND', 0)),
+    client_burst=float(os.environ.get('CLIENT_BURST', 0)) or None
+)
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+
+tracer = None
+
+def open_tracer():
+    """Trace requests into TRACE_DIR, keeping errored, slow (TRACE_SLOW_MS) and sampled ones"""
+    global tracer
+
+    trace_dir = os.environ.get('TRACE_DIR')
+    if not trace_dir:
+        return False
+
+    try:
+        exporter = SpanFileExporter(
+            trace_dir,
+            max_file_bytes=float(os.environ.get('TRACE_FILE_MB', 16)) * 1024 ** 2,
+            max_files=int(os.environ.get('TRACE_MAX_FILES', 8))
+        )
+        tracer = Tracer(
+            exporter,
+            slow_ms=float(os.environ.get('TRACE_SLOW_MS', 250)),
+            sample_rate=float(os.environ.get('TRACE_SAMPLE_RATE', 0.01))
+        )
+        # Before admission's hook, so time spent queued for a slot is inside the trace
+        tracer.install(app)
+        atexit.register(exporter.close)
+        print(f" Request traces: {trace_dir} (slow >= {tracer.slow_ms:.0f} ms, sample rate {tracer.sample_rate:g})")
+        return True
+
+    except Exception as e:
+        print(f" Error opening trace exporter: {e}")
+        tracer = None
+        return False
+
+open_tracer()
+
+# Probes bypass admission; batches may only hold part of the in-flight slots
+REQUEST_PRIORITY = {
+    '/health': CRITICAL,
+    '/ready': CRITICAL,
+    '/test': CRITICAL,
+    '/predict/batch': BULK,
+}
+
+def acquire_admission(resumed=False):
+    """Take an in-flight slot for this request into g.admission_token; the rejection response, or None
+
+    A ``resumed`` request was already admitted once, so it isn't charged
+    to its client's rate or its upstream queueing again.
+    """
+    priority = REQUEST_PRIORITY.get(request.path, INTERACTIVE)
+    if not ADMISSION_ENABLED or priority == CRITICAL or request.method == 'OPTIONS':
+        return None
+
+    # A rejection is load shedding, not a failure, so it doesn't mark the trace as errored
+    with tracing.span('admission', priority=priority, resumed=resumed or None) as stage:
         try:
-            features.append(encoders['education'].transform([education])[0])
-        except:
-            education_map = {'secondary': 2, 'bachelors': 1, 'masters': 3, 'doctorate': 4}
-            features.append(education_map.get(education, 2))
-    else:
-        education_map = {'secondary': 2, 'bachelors': 1, 'masters': 3, 'doctorate': 4}
-        features.append(education_map.get(education, 2))
-    
-    attendance_rate = float(student_data.get('attendanceRate', 65))
-    features.append(attendance_rate)
-    
-    writing = float(student_data.get('writingScore', 0))
-    reading = float(student_data.get('readingScore', 0))
-    speaking = float(student_data.get('speakingScore', 0))
-    english_avg = (writing + reading + speaking) / 3
-    features.append(english_avg)
+            g.admission_token = admission.acquire(
+                request.path,
+                priority,
+                client=None if resumed else request.headers.get(CLIENT_HEADER) or request.remote_addr,
+                queued_ms=0.0 if resumed else upstream_wait_ms(request.headers)
+            )
+            return None
+        except Rejected as e:
+            stage.set(rejected=e.reason)
+            rejection = e
+
+    response = jsonify({
+        'success': False,
+        'error': 'Too many requests from this client' if rejection.status == 429 else 'Server is overloaded, retry shortly',
+        'reason': rejection.reason,
+        'retryAfterSeconds': rejection.retry_after
+    })
+    response.status_code = rejection.status
+    response.headers['Retry-After'] = str(rejection.retry_after)
+    return response
+
+@app.before_request
+def admit_request():
+    return acquire_admission()
+
+def suspend_admission():
+    """Give the slot back while a duplicate request waits for its original
+
+    Returns what idempotent() calls if the duplicate has to run the view
+    after all: it takes a slot again, or returns the rejection.
+    """
+    token = g.pop('admission_token', None)
+    if token is None:
+        return lambda: None
+    admission.release(token)
+    return lambda: acquire_admission(resumed=True)
+
+@app.teardown_request
+def release_admission(error=None):
+    token = g.pop('admission_token', None)
+    if token is not None:
+        admission.release(token)
+
+shadow = None
+
+def load_shadow_model():
+    """Load a candidate classifier to score sampled traffic in the background"""
+    global shadow
+
+    shadow_path = os.environ.get('SHADOW_MODEL_PATH')
+    if not shadow_path:
+        return False
+
+    try:
+        if not os.path.exists(shadow_path):
+            print(f" Shadow model not found: {shadow_path}")
+            return False
+
+        candidate = joblib.load(shadow_path)
+        shadow = ShadowEvaluator(
+            candidate,
+            sample_rate=float(os.environ.get('SHADOW_SAMPLE_RATE', 0.1)),
+            queue_size=int(os.environ.get('SHADOW_QUEUE_SIZE', 256))
+        )
+        print(f" Shadow model loaded from: {shadow_path} (sample rate {shadow.sample_rate:.0%})")
+        return True
+
+    except Exception as e:
+        print(f" Error loading shadow model: {e}")
+        shadow = None
+        return False
+
+load_shadow_model()
+
+prediction_log = None
+
+def open_prediction_log():
+    """Record every model-scored feature vector to a binary log when PREDICTION_LOG_DIR is set"""
+    global prediction_log
+
+    log_dir = os.environ.get('PREDICTION_LOG_DIR')
+    if not log_dir or not models_loaded:
+        return False
+
+    try:
+        prediction_log = PredictionLog(
+            log_dir,
+            n_features=classifier.n_features_in_,
+            classes=classifier.classes_,
+            max_segment_bytes=float(os.environ.get('PREDICTION_LOG_SEGMENT_MB', 64)) * 1024 ** 2,
+            buffer_records=int(os.environ.get('PREDICTION_LOG_BUFFER', 256))
+        )
+        print(f" Prediction log: {log_dir} ({prediction_log.dtype.itemsize} bytes/record)")
+        return True
+
+    except Exception as e:
+        print(f" Error opening prediction log: {e}")
+        prediction_log = None
+        return False
+
+open_prediction_log()
+
+drift_monitor = None
+
+def load_drift_monitor():
+    """Track input distributions against the reference saved by the training script"""
+    global drift_monitor
+
+    reference_path = os.environ.get('DRIFT_REFERENCE_PATH') or find_model_file('drift_reference.json')
+    if not reference_path or not os.path.exists(reference_path):
+        print(" Drift reference not found, drift monitoring disabled")
+        return False
+
+    try:
+        drift_monitor = DriftMonitor(
+            load_reference(reference_path),
+            window_seconds=float(os.environ.get('DRIFT_WINDOW_SECONDS', 3600)),
+            buckets=int(os.environ.get('DRIFT_BUCKETS', 12)),
+            state_dir=os.environ.get('DRIFT_STATE_DIR'),
+            min_samples=int(os.environ.get('DRIFT_MIN_SAMPLES', 100))
+        )
+        print(f" Drift reference loaded from: {reference_path}")
+        return True
+
+    except Exception as e:
+        print(f" Error loading drift reference: {e}")
+        drift_monitor = None
+        return False
+
+load_drift_monitor()
+
+inference_pool = None
+
+def start_inference_pool():
+    """Score in INFERENCE_PROCESSES worker processes sharing the forest, for threaded servers"""
+    global inference_pool
+
+    processes = int(os.environ.get('INFERENCE_PROCESSES', 0))
+    if processes <= 0 or not models_loaded:
+        return False
+
+    try:
+        inference_pool = InferencePool(
+            classifier,
+            processes=processes,
+            max_rows=int(os.environ.get('INFERENCE_MAX_ROWS', 1024)),
+            timeout=float(os.environ.get('INFERENCE_TIMEOUT_SECONDS', 30))
+        )
+        atexit.register(inference_pool.close)
+        print(f" Inference pool: {processes} processes sharing {inference_pool.model_bytes / 1024:.0f} KB of trees")
+        return True
+
+    except Exception as e:
+        print(f" Error starting inference pool: {e}")
+        inference_pool = None
+        return False
+
+start_inference_pool()
+
+early_exit = None
+
+def load_early_exit():
+    """Stop walking trees once the vote is settled when EARLY_EXIT is 'exact' or 'confidence'"""
+    global early_exit
+
+    mode = os.environ.get('EARLY_EXIT', 'off').lower()
+    if mode not in EARLY_EXIT_MODES or not models_loaded:
+        early_exit = None
+        return False
+
+    try:
+        # Recent logged traffic, when there is any, orders the trees by agreement with the forest
+        reference = None
+        if prediction_log is not None:
+            paths = segment_paths(prediction_log.directory)
+            if paths:
+                records, _ = read_segment(paths[-1])
+                if len(records) and records['features'].shape[1] == classifier.n_features_in_:
+                    reference = records['features'][-2000:]
+
+        early_exit = EarlyExitForest(
+            classifier,
+            mode=mode,
+            delta=float(os.environ.get('EARLY_EXIT_DELTA', 0.01)),
+            min_trees=int(os.environ.get('EARLY_EXIT_MIN_TREES', 10)),
+            block=int(os.environ.get('EARLY_EXIT_BLOCK', 5)),
+            min_rows=int(os.environ.get('EARLY_EXIT_MIN_ROWS', 32)),
+            reference=reference,
+            flat=explainer.flat
+        )
+        print(f" Early exit: {mode}, {early_exit.n_trees} trees ordered by {early_exit.ordered_by}")
+        if inference_pool is not None:
+            print(" Early exit is not used while the inference pool is running")
+        return True
+
+    except Exception as e:
+        print(f" Error setting up early exit: {e}")
+        early_exit = None
+        return False
+
+load_early_exit()
+
+def risk_model(bundle):
+    """What score_batch should call predict_proba on: the pool or early-exit walker when they hold this bundle's model"""
+    if inference_pool is not None and bundle is global_bundle:
+        return inference_pool
+    if early_exit is not None and early_exit.forest is bundle.classifier:
+        return early_exit
+    return bundle.classifier
+
+def log_predictions(bundle, X, probabilities, latency_ms):
+    """Append to the prediction log when the bundle's classes fit its record layout"""
+    if prediction_log is not None and len(bundle.classifier.classes_) == len(prediction_log.classes):
+        prediction_log.append(X, bundle.version, probabilities, latency_ms)
+
+idempotency_store = None
+
+def open_idempotency_store():
+    """Remember responses by Idempotency-Key; IDEMPOTENCY_DB shares them across workers"""
+    global idempotency_store
+
+    if os.environ.get('IDEMPOTENCY_ENABLED', 'true').lower() in ('0', 'false', 'no'):
+        return False
+
+    ttl_seconds = float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400))
+    max_entries = int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 10000))
+    wait_seconds = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 10))
+    db_path = os.environ.get('IDEMPOTENCY_DB')
+
+    try:
+        if db_path:
+            idempotency_store = SQLiteIdempotencyStore(
+                db_path, ttl_seconds=ttl_seconds, max_entries=max_entries, wait_seconds=wait_seconds
+            )
+            print(f" Idempotency keys shared through: {db_path}")
+        else:
+            idempotency_store = IdempotencyStore(
+                ttl_seconds=ttl_seconds,
+                max_entries=max_entries,
+                max_bytes=float(os.environ.get('IDEMPOTENCY_MAX_MB', 32)) * 1024 ** 2,
+                wait_seconds=wait_seconds
+            )
+        return True
+
+    except Exception as e:
+        print(f" Error opening idempotency store: {e}")
+        idempotency_store = None
+        return False
+
+open_idempotency_store()
+
+# /debug/memory answers only requests carrying this token; unset, the surface is a 404
+DEBUG_MEMORY_TOKEN = os.environ.get('DEBUG_MEMORY_TOKEN') or None
+memory_profiler = MemoryProfiler(
+    frames=int(os.environ.get('MEMORY_TRACE_FRAMES', 1)),
+    max_snapshots=int(os.environ.get('MEMORY_MAX_SNAPSHOTS', 4))
+)
+
+def activate_model(directory):
+    """Put the classifier and encoders in ``directory`` into service in place of the current ones"""
+    global classifier, encoders, encoder_maps, explainer, active_model_version, model_snapshot, global_bundle, inference_pool
+
+    model_path = os.path.join(directory, 'student-model.pkl')
+    new_classifier = joblib.load(model_path)
+    encoder_path = os.path.join(directory, 'encoders.pkl')
+    new_encoders = joblib.load(encoder_path) if os.path.exists(encoder_path) else encoders
+    new_explainer = ForestExplainer(new_classifier, cache_size=int(os.environ.get('ATTRIBUTION_CACHE_SIZE', 4096)))
+    version = model_version(model_path)
+    bundle = ModelBundle(None, new_classifier, new_encoders, version=version, explainer=new_explainer)
+
+    # Requests already holding the old bundle finish on it; new ones get the new one
+    classifier, encoders, encoder_maps, explainer = new_classifier, new_encoders, bundle.encoder_maps, new_explainer
+    active_model_version = version
+    model_snapshot = model_info_snapshot(new_classifier, model_config, version, model_path)
+    global_bundle = bundle
+    if tenant_models is not None:
+        tenant_models.fallback = bundle
+
+    if inference_pool is not None:
+        retired = inference_pool
+        start_inference_pool()
+        retired.close()
+    load_early_exit()
+
+retraining = None
+
+def open_retraining():
+    """Retrain from the prediction log in a capped background process when RETRAIN_ENABLED is set"""
+    global retraining
+
+    if os.environ.get('RETRAIN_ENABLED', 'false').lower() not in ('1', 'true', 'yes'):
+        return False
+    if prediction_log is None:
+        print(" Retraining needs PREDICTION_LOG_DIR; not started")
+        return False
+
+    try:
+        retraining = RetrainScheduler(
+            prediction_log.directory,
+            os.environ.get('RETRAIN_DIR', 'models/versions'),
+            get_active=lambda: (classifier, active_model_version),
+            activate=activate_model,
+            encoder_path='models/encoders.pkl',
+            min_records=int(os.environ.get('RETRAIN_MIN_RECORDS', 5000)),
+            interval_seconds=float(os.environ.get('RETRAIN_INTERVAL_HOURS', 24)) * 3600,
+            check_seconds=float(os.environ.get('RETRAIN_CHECK_SECONDS', 60)),
+            threads=int(os.environ.get('RETRAIN_THREADS', 1)),
+            memory_mb=float(os.environ.get('RETRAIN_MEMORY_MB', 1024)),
+            cpu_seconds=int(os.environ.get('RETRAIN_CPU_SECONDS', 1800)),
+            timeout_seconds=float(os.environ.get('RETRAIN_TIMEOUT_SECONDS', 3600)),
+            max_regression=float(os.environ.get('RETRAIN_MAX_REGRESSION', 0.01)),
+            keep_versions=int(os.environ.get('RETRAIN_KEEP_VERSIONS', 5)),
+            auto_activate=os.environ.get('RETRAIN_AUTO_ACTIVATE', 'false').lower() in ('1', 'true', 'yes')
+        )
+        retraining.start()
+        print(f" Retraining: every {retraining.min_records} new records or "
+              f"{retraining.interval_seconds / 3600:g} h, into {retraining.artifact_dir}")
+        if retraining.blocked:
+            print(f" Retraining paused: {retraining.blocked}")
+        return True
+
+    except Exception as e:
+        print(f" Error starting retraining scheduler: {e}")
+        retraining = None
+        return False
+
+open_retraining()
+
+def encode_category(key, value, fallback_map, default, maps=None):
+    """Encoder index for a category, or the fallback mapping when the encoder doesn't know it"""
+    mapping = (encoder_maps if maps is None else maps).get(key)
+    if mapping is not None and value in mapping:
+        return mapping[value]
+    return fallback_map.get(value, default)
+
+def prepare_ml_features(student, maps=None):
+    features = []
+
+    gender = student.gender
+    features.append(encode_category('gender', gender, {'female': 1}, 0, maps))
+
+    study_time_map = {'less_than_2': 0, '2_to_5': 1, '5_to_10': 2, 'more_than_10': 3}
+    features.append(encode_category('study_time', student.study_time_per_week, study_time_map, 1, maps))
+
+    absences_map = {'none': 3, '1_to_5': 2, '6_to_10': 1, 'more_than_10': 0}
+    features.append(encode_category('attendance', student.absences, absences_map, 3, maps))
+
+    education_map = {'secondary': 2, 'bachelors': 1, 'masters': 3, 'doctorate': 4}
+    features.append(encode_category('education', student.student_education, education_map, 2, maps))
+
+    features.append(student.attendance_rate)
+    features.append(student.english_avg)
 
     features.append(0)
     features.append(0)
@@ -136,37 +628,65 @@ def prepare_ml_features(student_data):
 
     return features
 
-def get_top_factors(student_data, english_avg):
-    """Get top factors affecting prediction"""
+def factor_value(student, index):
+    """Display value of one model input for the factors screen"""
+    if index == 0:
+        return student.gender.title()
+    if index == 1:
+        return student.study_time_per_week.replace('_', ' ')
+    if index == 2:
+        return student.absences.replace('_', ' ')
+    if index == 3:
+        return student.student_education.title()
+    if index == 4:
+        return f'{student.attendance_rate:.0f}%'
+    return f'{student.english_avg:.1f}/100'
+
+def get_model_factors(student, contributions, class_name, top_k=3):
+    """Top factors from this prediction's per-feature contributions to the predicted class
+
+    Inputs the server never fills are left out of the ranking and the
+    percentages: they can't be something the student changes.
+    """
+    filled = np.setdiff1d(np.arange(len(contributions)), UNFILLED_FEATURES)
+    total = float(np.abs(contributions[filled]).sum()) or 1.0
+    order = filled[np.argsort(-np.abs(contributions[filled]), kind='stable')][:top_k]
+
     factors = []
+    for index in order:
+        impact = float(contributions[index])
+        direction = 'Raises' if impact >= 0 else 'Lowers'
+        factors.append({
+            'name': FEATURE_LABELS[index],
+            'value': factor_value(student, index),
+            'impact': round(impact, 4),
+            'explanation': f'{direction} the {class_name.replace("_", " ")} probability by {abs(impact):.1%}',
+            'percentage': f'{abs(impact) / total:.1%}'
+        })
+    return factors
 
-    factors.append({
+def get_rules_factors(english_avg):
+    """The rules path only looks at the English average"""
+    return [{
         'name': 'English Average Score',
         'value': f'{english_avg:.1f}/100',
-        'impact': 0.905,
-        'explanation': 'Most important predictor (90.5% impact)',
-        'percentage': '90.5%'
-    })
+        'impact': 1.0,
+        'explanation': 'Primary performance indicator',
+        'percentage': '100%'
+    }]
 
-    study_time = student_data.get('studyTimePerWeek', '2_to_5')
-    factors.append({
-        'name': 'Study Time',
-        'value': study_time.replace('_', ' '),
-        'impact': 0.017,
-        'explanation': 'Weekly study commitment',
-        'percentage': '1.7%'
-    })
+def prediction_factors(students, score_result, X, bundle_explainer=None):
+    """Factors for every row, using one batched attribution pass when the model answered"""
+    bundle_explainer = bundle_explainer or explainer
+    if score_result is None or bundle_explainer is None:
+        return [get_rules_factors(student.english_avg) for student in students]
 
-    test_prep = student_data.get('testPrep', 'not_prepared')
-    factors.append({
-        'name': 'Test Preparation',
-        'value': 'Prepared' if test_prep == 'prepared' else 'Not Prepared',
-        'impact': 0.022,
-        'explanation': 'Preparation level affects performance',
-        'percentage': '2.2%'
-    })
-    
-    return factors
+    class_indices = np.argmax(score_result['probabilities'], axis=1)
+    contributions = bundle_explainer.contributions(X)
+    return [
+        get_model_factors(student, contributions[row, :, class_indices[row]], score_result['classes'][class_indices[row]])
+        for row, student in enumerate(students)
+    ]
 
 def get_recommendations(risk_level, english_avg):
     """Generate personalized recommendations"""
@@ -205,102 +725,206 @@ def get_recommendations(risk_level, english_avg):
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    return jsonify({
+    """Health check endpoint; the ETag lets pollers skip unchanged bodies"""
+    return conditional_json(json_snapshot({
         'status': 'healthy',
         'ml_models_loaded': models_loaded,
         'model_type': 'RandomForest' if models_loaded else 'None',
         'accuracy': model_config.get('metadata', {}).get('accuracy', 0.995) if model_config else 0.85,
-    })
+        'circuit_breaker': inference_breaker.snapshot(),
+        'inference_latency_ms': round(inference_latency.value_ms, 2),
+        'default_budget_ms': PREDICT_BUDGET_MS,
+        'model_version': active_model_version,
+        'admission': admission.snapshot(),
+        'prediction_log': prediction_log.stats() if prediction_log is not None else None,
+        'idempotency': idempotency_store.stats() if idempotency_store is not None else None,
+        'inference_pool': inference_pool.stats() if inference_pool is not None else None,
+        'early_exit': early_exit.stats() if early_exit is not None else None,
+        'tenant_models': tenant_models.stats() if tenant_models is not None else None,
+        'tracing': tracer.stats() if tracer is not None else None,
+        'retraining': {'current': retraining.stats()['current'], 'running': retraining.running} if retraining is not None else None,
+    }))
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 while this worker is saturated so the router sends traffic elsewhere"""
+    saturated = ADMISSION_ENABLED and admission.saturated()
+    ready = not saturated
+    return jsonify({
+        'ready': ready,
+        'ml_models_loaded': models_loaded,
+        'saturated': saturated,
+    }), 200 if ready else 503
+
+def ml_result(score_result, row):
+    """Prediction fields for one row of a score_batch result"""
+    probabilities = score_result['probabilities'][row]
+
+    class_index = int(np.argmax(probabilities))
+    prediction = score_result['classes'][class_index]
+    confidence = float(probabilities[class_index])
+
+    probabilities_dict = {}
+    for i, class_name in enumerate(score_result['classes']):
+        probabilities_dict[class_name] = float(probabilities[i])
+
+    return {
+        'riskLevel': prediction,
+        'confidence': confidence,
+        'probabilities': probabilities_dict,
+        'predictionMethod': 'random_forest',
+        'modelLoaded': True
+    }
+
+def rules_result(english_avg, degraded_reason=None):
+    """Prediction fields from the simple rules, marked degraded when the model was skipped"""
+    risk, confidence, probabilities = rules_prediction(english_avg)
+
+    result = {
+        'riskLevel': risk,
+        'confidence': confidence,
+        'probabilities': probabilities,
+        'predictionMethod': 'simple_rules_degraded' if degraded_reason else 'simple_rules',
+        'modelLoaded': models_loaded
+    }
+    if degraded_reason:
+        result['degradedReason'] = degraded_reason
+    return result
+
+def score_fields(score_result, row, english_avg):
+    """predictedScore, its spread and the model that produced it"""
+    if score_result is not None and score_result['scores'] is not None:
+        fields = {
+            'predictedScore': round(float(score_result['scores'][row]), 1),
+            'modelsUsed': {
+                'riskLevel': score_result['risk_model'],
+                'predictedScore': score_result['score_model']
+            }
+        }
+        if score_result['score_spread'] is not None:
+            fields['scoreSpread'] = round(float(score_result['score_spread'][row]), 2)
+        return fields
+
+    return {
+        'predictedScore': round(english_avg, 1),
+        'modelsUsed': {
+            'riskLevel': score_result['risk_model'] if score_result is not None else 'simple_rules',
+            'predictedScore': 'english_average'
+        }
+    }
+
+def invalid_payload(error):
+    return jsonify({
+        'success': False,
+        'error': 'Invalid prediction payload',
+        'details': error.errors
+    }), 400
 
 @app.route('/predict', methods=['POST'])
+@idempotent(lambda: idempotency_store, suspend=suspend_admission)
 def predict():
     """Main prediction endpoint"""
     try:
-        data = request.json
-        if not data:
-            return jsonify({'success': False, 'error': 'No data provided'}), 400
+        with tracing.span('validate'):
+            data = request.get_json(silent=True)
+            if not data:
+                return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+            try:
+                student = validate_payload(data)
+                fields = requested_fields(request.args)
+            except ValidationError as e:
+                return invalid_payload(e)
+
+        if drift_monitor is not None:
+            drift_monitor.observe(student)
             
-        print(f" Received prediction request for: {data.get('name', 'Unknown')}")
-        
-        writing = float(data.get('writingScore', 0))
-        reading = float(data.get('readingScore', 0))
-        speaking = float(data.get('speakingScore', 0))
-        english_avg = (writing + reading + speaking) / 3
+        print(f" Received prediction request for: {student.name}")
+
+        want_scores = fields.wants_any(SCORE_FIELDS)
+        with tracing.span('model.resolve'):
+            bundle = model_for(student)
+        if bundle is not None:
+            tracing.annotate(model_tenant=bundle.tenant, model_version=bundle.version)
         
+        english_avg = student.english_avg
+        default_budget_ms = student.latency_budget_ms or PREDICT_BUDGET_MS
+        deadline = Deadline(request_budget_ms(request.headers, None, default_budget_ms))
         prediction_result = None
+        score_result = None
+        features = None
+        degraded_reason = None
+
+        if bundle is not None:
+            if not deadline.allows(inference_latency.value_ms):
+                degraded_reason = 'deadline'
+                inference_latency.decay()
+            elif not inference_breaker.allow():
+                degraded_reason = 'circuit_open'
 
-        if models_loaded and classifier is not None:
+        if bundle is not None and degraded_reason is None:
             try:
-                features = prepare_ml_features(data)
-                prediction = classifier.predict([features])[0]
-                probabilities = classifier.predict_proba([features])[0]
-                
-                class_index = list(classifier.classes_).index(prediction)
-                confidence = float(probabilities[class_index])
-                
-                probabilities_dict = {}
-                for i, class_name in enumerate(classifier.classes_):
-                    probabilities_dict[class_name] = float(probabilities[i])
-                
-                prediction_result = {
-                    'riskLevel': prediction,
-                    'confidence': confidence,
-                    'probabilities': probabilities_dict,
-                    'predictionMethod': 'random_forest',
-                    'modelLoaded': True
-                }
-                
-                print(f" ML Prediction: {prediction} ({confidence:.1%} confidence)")
+                with tracing.span('features'):
+                    features = prepare_ml_features(student, bundle.encoder_maps)
+                inference_start = time.perf_counter()
+                score_budget_ms = min(SCORE_BUDGET_MS, deadline.remaining_ms())
+                with tracing.span('inference', rows=1, model_version=bundle.version, scores=want_scores) as stage:
+                    score_result = score_batch(
+                        risk_model(bundle),
+                        regressor if want_scores else None,
+                        linear_model if want_scores else None,
+                        [features],
+                        score_budget_ms
+                    )
+                    stage.set(score_model=score_result['score_model'])
+                inference_ms = (time.perf_counter() - inference_start) * 1000
+                inference_latency.observe(inference_ms)
+                inference_breaker.record_success(inference_ms)
+
+                prediction_result = ml_result(score_result, 0)
+                print(f" ML Prediction: {prediction_result['riskLevel']} ({prediction_result['confidence']:.1%} confidence)")
+
+                if shadow is not None and bundle is global_bundle:
+                    shadow.submit(features, classifier.classes_, score_result['probabilities'][0])
+                log_predictions(bundle, features, score_result['probabilities'], inference_ms)
                 
             except Exception as ml_error:
                 print(f" ML prediction failed: {ml_error}")
+                inference_breaker.record_failure('error')
+                degraded_reason = 'inference_error'
+                score_result = None
 
         if prediction_result is None:
-            if english_avg >= 80:
-                risk = 'high_achiever'
-                confidence = 0.9
-            elif english_avg >= 60:
-                risk = 'satisfactory'
-                confidence = 0.85
-            else:
-                risk = 'at_risk'
-                confidence = 0.8
-
-            if english_avg >= 80:
-                probabilities = {'at_risk': 0.05, 'satisfactory': 0.25, 'high_achiever': 0.70}
-            elif english_avg >= 70:
-                probabilities = {'at_risk': 0.15, 'satisfactory': 0.70, 'high_achiever': 0.15}
-            elif english_avg >= 60:
-                probabilities = {'at_risk': 0.30, 'satisfactory': 0.60, 'high_achiever': 0.10}
-            else:
-                probabilities = {'at_risk': 0.70, 'satisfactory': 0.25, 'high_achiever': 0.05}
-            
-            prediction_result = {
-                'riskLevel': risk,
-                'confidence': confidence,
-                'probabilities': probabilities,
-                'predictionMethod': 'simple_rules',
-                'modelLoaded': models_loaded
-            }
+            tracing.annotate(fallback_reason=degraded_reason or 'no_model')
+            with tracing.span('fallback', reason=degraded_reason or 'no_model'):
+                prediction_result = rules_result(english_avg, degraded_reason)
+            if degraded_reason:
+                print(f" Answered from rules path ({degraded_reason})")
 
-        prediction_result.update({
-            'predictedScore': round(english_avg, 1),
-            'englishAverage': round(english_avg, 1),
-            'factors': get_top_factors(data, english_avg),
-            'recommendations': get_recommendations(prediction_result['riskLevel'], english_avg),
-            'modelInfo': {
+        # Optional parts are only computed when the fieldset asks for them
+        if want_scores:
+            prediction_result.update(score_fields(score_result, 0, english_avg))
+        prediction_result['englishAverage'] = round(english_avg, 1)
+        if 'factors' in fields:
+            with tracing.span('explain'):
+                prediction_result['factors'] = prediction_factors(
+                    [student], score_result, [features], bundle.explainer if bundle is not None else None
+                )[0]
+        if 'recommendations' in fields:
+            prediction_result['recommendations'] = get_recommendations(prediction_result['riskLevel'], english_avg)
+        if 'modelInfo' in fields:
+            prediction_result['modelInfo'] = {
                 'type': 'RandomForest' if models_loaded else 'SimpleRules',
                 'accuracy': model_config.get('metadata', {}).get('accuracy', 0.995) if model_config else 0.85,
                 'featuresUsed': 6
             }
-        })
         
         print(f" Prediction complete: {prediction_result['riskLevel']}")
         
         return jsonify({
             'success': True,
-            'prediction': prediction_result,
+            'prediction': fields.apply(prediction_result),
+            'model': model_summary(bundle),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -313,57 +937,467 @@ def predict():
             'error': str(e)
         }), 500
 
-@app.route('/model-info', methods=['GET'])
-def model_info():
-    """Get information about the loaded ML model"""
+@app.route('/predict/batch', methods=['POST'])
+@idempotent(lambda: idempotency_store, suspend=suspend_admission)
+def predict_batch():
+    """Score many students with one shared feature matrix"""
+    if request.mimetype == columnar.CONTENT_TYPE:
+        return predict_columnar()
+
     try:
-        if models_loaded and classifier is not None:
-            accuracy = 0.85  
-            
-            if model_config and 'metadata' in model_config:
-                metadata = model_config['metadata']
-        
-                accuracy_keys = ['accuracy', 'test_accuracy', 'testing_accuracy', 'training_accuracy', 'model_accuracy']
-                for key in accuracy_keys:
-                    if key in metadata:
-                        accuracy = metadata[key]
-                        break
-            
-            info = {
-                'status': 'loaded',
-                'model_type': type(classifier).__name__,
-                'accuracy': float(accuracy),
-                'classes': classifier.classes_.tolist(),
-                'n_features': classifier.n_features_in_ if hasattr(classifier, 'n_features_in_') else 6,
-            }
-            
-            if hasattr(classifier, 'feature_importances_'):
-                info['feature_importance'] = classifier.feature_importances_.tolist()
+        with tracing.span('validate'):
+            data = request.get_json(silent=True)
+            if not data:
+                return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+            try:
+                students = validate_batch(data, max_rows=BATCH_MAX_ROWS)
+                fields = requested_fields(request.args, BATCH_FIELDS)
+            except ValidationError as e:
+                return invalid_payload(e)
+        tracing.annotate(batch_size=len(students), format='json')
+
+        print(f" Received batch prediction request for {len(students)} students")
+
+        if drift_monitor is not None:
+            for student in students:
+                drift_monitor.observe(student)
+
+        explain = request.args.get('explain', 'false').lower() in ('1', 'true', 'yes')
+        # Naming factors in ?fields= asks for them just like ?explain=1
+        explain = 'factors' in fields and (explain or fields.names is not None)
+        want_scores = fields.wants_any(SCORE_FIELDS)
+        degraded_reason = None
+
+        # Rows are scored together per model: one group unless rows name different regions
+        groups = {}
+        with tracing.span('model.resolve') as stage:
+            for row, student in enumerate(students):
+                bundle = model_for(student)
+                groups.setdefault(id(bundle), (bundle, []))[1].append(row)
+            stage.set(groups=len(groups))
+
+        scored = [None] * len(students)
+        factors = [None] * len(students) if explain else None
+        if any(bundle is not None for bundle, _ in groups.values()) and not inference_breaker.allow():
+            degraded_reason = 'circuit_open'
+
+        for bundle, rows in groups.values():
+            if bundle is None or degraded_reason == 'circuit_open':
+                continue
+            group = [students[row] for row in rows]
+            try:
+                with tracing.span('features', rows=len(group)):
+                    X = [prepare_ml_features(student, bundle.encoder_maps) for student in group]
+                inference_start = time.perf_counter()
+                with tracing.span('inference', rows=len(group), model_tenant=bundle.tenant,
+                                  model_version=bundle.version, scores=want_scores) as stage:
+                    score_result = score_batch(
+                        risk_model(bundle),
+                        regressor if want_scores else None,
+                        linear_model if want_scores else None,
+                        X,
+                        SCORE_BUDGET_MS
+                    )
+                    stage.set(score_model=score_result['score_model'])
+                row_ms = (time.perf_counter() - inference_start) * 1000 / len(group)
+                inference_breaker.record_success(row_ms)
+                log_predictions(bundle, X, score_result['probabilities'], row_ms)
+            except Exception as ml_error:
+                print(f" Batch ML prediction failed: {ml_error}")
+                inference_breaker.record_failure('error')
+                degraded_reason = 'inference_error'
+                continue
+
+            for position, row in enumerate(rows):
+                scored[row] = (score_result, position, bundle)
+            if explain:
+                with tracing.span('explain', rows=len(group)):
+                    for row, row_factors in zip(rows, prediction_factors(group, score_result, X, bundle.explainer)):
+                        factors[row] = row_factors
+
+        fallback_rows = scored.count(None)
+        if fallback_rows:
+            tracing.annotate(fallback_reason=degraded_reason or 'no_model', fallback_rows=fallback_rows)
+
+        predictions = []
+        for row, student in enumerate(students):
+            if scored[row] is not None:
+                score_result, position, bundle = scored[row]
+                result = ml_result(score_result, position)
             else:
-                info['feature_importance'] = []
-                
-        else:
-            info = {
-                'status': 'not_loaded',
-                'message': 'Using fallback prediction system'
-            }
-        
+                score_result, position, bundle = None, 0, None
+                result = rules_result(student.english_avg, degraded_reason)
+            if want_scores:
+                result.update(score_fields(score_result, position, student.english_avg))
+            result['englishAverage'] = round(student.english_avg, 1)
+            result['name'] = student.name
+            if explain:
+                result['factors'] = factors[row] or get_rules_factors(student.english_avg)
+            if len(groups) > 1:
+                result['model'] = model_summary(bundle)
+            predictions.append(fields.apply(result))
+
         return jsonify({
             'success': True,
-            'model_info': info,
+            'count': len(predictions),
+            'predictions': predictions,
+            'model': model_summary(next(iter(groups.values()))[0]) if len(groups) == 1 else None,
             'timestamp': datetime.now().isoformat()
         })
-    
+
+    except Exception as e:
+        print(f' Error in predict_batch: {e}')
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def predict_columnar():
+    """/predict/batch for a columnar body: encoded features in, result columns out
+
+    The body is already the feature matrix, so there is no per-student
+    validation, drift observation or rules fallback; without a usable
+    model the answer is a 503 rather than degraded predictions.
+    """
+    try:
+        with tracing.span('decode') as stage:
+            body = request.get_data(cache=False)
+            stage.set(bytes=len(body))
+            try:
+                X = columnar.feature_matrix(body)
+                fields = requested_fields(request.args)
+            except columnar.FormatError as e:
+                return jsonify({'success': False, 'error': f'Invalid columnar body: {e}'}), 400
+            except ValidationError as e:
+                return invalid_payload(e)
+        tracing.annotate(batch_size=len(X), format='columnar')
+
+        if len(X) == 0 or len(X) > COLUMNAR_MAX_ROWS:
+            return jsonify({'success': False, 'error': f'Columnar batches need 1 to {COLUMNAR_MAX_ROWS} rows'}), 400
+        if not np.isfinite(X).all():
+            return jsonify({'success': False, 'error': 'Invalid columnar body: non-finite feature values'}), 400
+
+        with tracing.span('model.resolve'):
+            bundle = model_for()
+        if bundle is None:
+            return jsonify({'success': False, 'error': 'ML model not loaded'}), 503
+        tracing.annotate(model_tenant=bundle.tenant, model_version=bundle.version)
+        if not inference_breaker.allow():
+            return jsonify({'success': False, 'error': 'ML inference unavailable (circuit_open)'}), 503
+
+        want_scores = fields.wants_any(SCORE_FIELDS)
+        try:
+            inference_start = time.perf_counter()
+            with tracing.span('inference', rows=len(X), model_version=bundle.version, scores=want_scores) as stage:
+                score_result = score_batch(
+                    risk_model(bundle),
+                    regressor if want_scores else None,
+                    linear_model if want_scores else None,
+                    X,
+                    SCORE_BUDGET_MS
+                )
+                stage.set(score_model=score_result['score_model'])
+            row_ms = (time.perf_counter() - inference_start) * 1000 / len(X)
+            inference_breaker.record_success(row_ms)
+        except Exception:
+            inference_breaker.record_failure('error')
+            raise
+
+        log_predictions(bundle, X, score_result['probabilities'], row_ms)
+
+        with tracing.span('encode'):
+            result = columnar.encode_columns(columnar.result_columns(
+                score_result['classes'],
+                score_result['probabilities'],
+                score_result['scores'] if want_scores else None,
+                score_result['score_spread'] if want_scores else None
+            ))
+        return app.response_class(result, mimetype=columnar.CONTENT_TYPE)
+
     except Exception as e:
-        print(f' Error in /model-info: {e}')
+        print(f' Error in predict_columnar: {e}')
         import traceback
         traceback.print_exc()
         return jsonify({
             'success': False,
-            'error': str(e),
+            'error': str(e)
+        }), 500
+
+@app.route('/what-if', methods=['POST'])
+def what_if():
+    """Rank feasible changes to a student's inputs by how much they lower the at-risk probability"""
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+        try:
+            student = validate_payload(data)
+        except ValidationError as e:
+            return invalid_payload(e)
+
+        if not models_loaded or explainer is None:
+            return jsonify({
+                'success': False,
+                'error': 'What-if analysis needs the ML model, which is not loaded'
+            }), 503
+
+        limit = request.args.get('limit', 10, type=int)
+        candidates = generate_counterfactuals(student)
+
+        # Row 0 is the student as-is; every counterfactual is scored in the same call.
+        X = [prepare_ml_features(student)] + [prepare_ml_features(record) for _, _, record in candidates]
+        probabilities = explainer.flat.predict(X)
+
+        classes = explainer.flat.classes
+        at_risk_index = classes.index('at_risk')
+        p_safe = 1.0 - probabilities[:, at_risk_index]
+        gains = p_safe[1:] - p_safe[0]
+
+        interventions = []
+        for i in np.argsort(-gains)[:max(0, limit)]:
+            changes, description, _ = candidates[i]
+            row = i + 1
+            interventions.append({
+                'description': description,
+                'changes': changes,
+                'riskLevel': classes[int(np.argmax(probabilities[row]))],
+                'pNonAtRisk': round(float(p_safe[row]), 4),
+                'gain': round(float(gains[i]), 4)
+            })
+
+        return jsonify({
+            'success': True,
+            'baseline': {
+                'riskLevel': classes[int(np.argmax(probabilities[0]))],
+                'probabilities': {name: float(p) for name, p in zip(classes, probabilities[0])},
+                'pNonAtRisk': round(float(p_safe[0]), 4)
+            },
+            'interventions': interventions,
+            'evaluated': len(candidates),
+            # Score needed for each higher level; unranked, since the levels are defined by it
+            'scoreTargets': score_targets(student),
             'timestamp': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        print(f' Error in what_if: {e}')
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': str(e)
         }), 500
 
+@app.route('/shadow', methods=['GET'])
+def shadow_report():
+    """Agreement and latency of the shadow candidate against the active model"""
+    if shadow is None:
+        return jsonify({
+            'success': True,
+            'enabled': False,
+            'message': 'Set SHADOW_MODEL_PATH to enable shadow evaluation',
+            'timestamp': datetime.now().isoformat()
+        })
+
+    return jsonify({
+        'success': True,
+        'enabled': True,
+        'shadow': shadow.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/drift', methods=['GET'])
+def drift_report():
+    """PSI / KS of recent inputs against the training distribution, merged across workers"""
+    if drift_monitor is None:
+        return jsonify({
+            'success': True,
+            'enabled': False,
+            'message': 'No drift_reference.json found; run scripts/train-with-evaluation.py or set DRIFT_REFERENCE_PATH',
+            'timestamp': datetime.now().isoformat()
+        })
+
+    merge = request.args.get('local', 'false').lower() not in ('1', 'true', 'yes')
+    return jsonify({
+        'success': True,
+        'enabled': True,
+        'drift': drift_monitor.report(merge=merge),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/retraining', methods=['GET'])
+def retraining_report():
+    """Retraining triggers, the last run's duration and resource use, and its validation"""
+    if retraining is None:
+        return jsonify({
+            'success': True,
+            'enabled': False,
+            'message': 'Set RETRAIN_ENABLED=true and PREDICTION_LOG_DIR to enable background retraining',
+            'timestamp': datetime.now().isoformat()
+        })
+
+    return jsonify({
+        'success': True,
+        'enabled': True,
+        'retraining': retraining.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/model-info', methods=['GET'])
+def model_info():
+    """Metadata of the loaded model, built once at load time; honours If-None-Match"""
+    return conditional_json(model_snapshot)
+
+memory_debug = debug_guarded(lambda: DEBUG_MEMORY_TOKEN)
+
+def model_footprints():
+    """Measured deep size of everything model-shaped this worker holds"""
+    return {
+        'global': global_bundle.footprint() if global_bundle is not None else None,
+        'score_models': {
+            'random_forest_regressor': deep_size(regressor) if regressor is not None else None,
+            'linear_regression': deep_size(linear_model) if linear_model is not None else None,
+        },
+        'shadow': deep_size(shadow.candidate) if shadow is not None else None,
+        'tenants': [
+            dict(bundle.describe(), footprint=bundle.footprint())
+            for bundle in (tenant_models.resident() if tenant_models is not None else [])
+        ],
+        # Mapped from shared memory, so it shows up in shared rather than private pages
+        'inference_pool_shared_bytes': inference_pool.model_bytes if inference_pool is not None else None,
+    }
+
+def snapshot_query():
+    """group_by and limit from the query string, or a 400 response"""
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in GROUPINGS:
+        return None, None, (jsonify({
+            'success': False,
+            'error': f"group_by must be one of: {', '.join(GROUPINGS)}"
+        }), 400)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    return group_by, limit, None
+
+@app.route('/debug/memory', methods=['GET'])
+@memory_debug
+def memory_report():
+    """RSS/USS, per-model deep sizes, GC counters and tracing state; ?top=N adds allocation sites"""
+    report = {
+        'success': True,
+        'process': process_memory(),
+        'models': model_footprints(),
+        'gc': gc_summary(),
+        'tracemalloc': memory_profiler.status(),
+        'timestamp': datetime.now().isoformat()
+    }
+    top = request.args.get('top', 0, type=int)
+    if top > 0 and report['tracemalloc']['tracing']:
+        group_by, _, error = snapshot_query()
+        if error:
+            return error
+        # Not kept, so polling this doesn't push named snapshots out
+        snapshot = memory_profiler.snapshot()
+        report['top'] = memory_profiler.top(snapshot, group_by, min(top, 200))
+    return jsonify(report)
+
+@app.route('/debug/memory/tracing', methods=['POST'])
+@memory_debug
+def memory_tracing():
+    """Turn tracemalloc on ({"enabled": true, "frames": N}) or off; off drops the snapshots"""
+    data = request.get_json(silent=True) or {}
+    if data.get('enabled', True):
+        try:
+            status = memory_profiler.start(data.get('frames'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    else:
+        status = memory_profiler.stop()
+    return jsonify({
+        'success': True,
+        'tracemalloc': status,
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/debug/memory/snapshots', methods=['POST'])
+@memory_debug
+def memory_snapshot():
+    """Keep a named snapshot ({"name": ...}) and return its top allocation sites"""
+    group_by, limit, error = snapshot_query()
+    if error:
+        return error
+    data = request.get_json(silent=True) or {}
+    try:
+        name, snapshot = memory_profiler.take(data.get('name'))
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    return jsonify({
+        'success': True,
+        'name': name,
+        'process': process_memory(),
+        'top': memory_profiler.top(snapshot, group_by, limit),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/debug/memory/snapshots/<name>', methods=['GET'])
+@memory_debug
+def memory_snapshot_sites(name):
+    group_by, limit, error = snapshot_query()
+    if error:
+        return error
+    try:
+        snapshot = memory_profiler.get(name)
+    except KeyError:
+        return jsonify({'success': False, 'error': f'No snapshot named {name}'}), 404
+    return jsonify({
+        'success': True,
+        'name': name,
+        'top': memory_profiler.top(snapshot, group_by, limit),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/debug/memory/diff', methods=['GET'])
+@memory_debug
+def memory_diff():
+    """Allocation growth from snapshot ?from= to ?to= (default: now), largest first"""
+    group_by, limit, error = snapshot_query()
+    if error:
+        return error
+    older_name = request.args.get('from')
+    newer_name = request.args.get('to')
+    if not older_name:
+        return jsonify({'success': False, 'error': 'from is required'}), 400
+    try:
+        older = memory_profiler.get(older_name)
+        if newer_name:
+            newer = memory_profiler.get(newer_name)
+        else:
+            newer_name, newer = 'now', memory_profiler.snapshot()
+    except KeyError as e:
+        return jsonify({'success': False, 'error': f'No snapshot named {e.args[0]}'}), 404
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    return jsonify({
+        'success': True,
+        'from': older_name,
+        'to': newer_name,
+        'growth': memory_profiler.diff(older, newer, group_by, limit),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/debug/memory/gc', methods=['POST'])
+@memory_debug
+def memory_gc():
+    """Run a full collection and report what it freed"""
+    return jsonify({
+        'success': True,
+        'gc': collect_garbage(),
+        'timestamp': datetime.now().isoformat()
+    })
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') == 'development'
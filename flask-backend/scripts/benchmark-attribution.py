@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.attribution import ForestExplainer
+
+MODEL_PATH = 'models/student-model.pkl'
+
+
+def synthetic_features(n_rows, seed=0):
+    """Feature rows in the order prepare_ml_features emits them"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(0, 2, n_rows),
+        rng.integers(0, 4, n_rows),
+        rng.integers(0, 4, n_rows),
+        rng.integers(0, 6, n_rows),
+        rng.uniform(30, 100, n_rows),
+        rng.uniform(30, 100, n_rows),
+        np.zeros(n_rows),
+        np.zeros(n_rows),
+        np.zeros(n_rows),
+    ]).astype(np.float32)
+
+
+def best_ms(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    warnings.simplefilter('ignore')
+    classifier = joblib.load(MODEL_PATH)
+    classifier.n_jobs = 1
+
+    explainer = ForestExplainer(classifier, cache_size=0)
+    cached = ForestExplainer(classifier)
+
+    X = synthetic_features(1000)
+    error = np.abs(explainer.bias + explainer.contributions(X).sum(axis=1) - classifier.predict_proba(X)).max()
+
+    print(" FEATURE ATTRIBUTION BENCHMARK")
+    print("=" * 60)
+    print(f"  Trees: {explainer.flat.n_trees}, nodes: {len(explainer.flat.value)}, max depth: {explainer.flat.max_depth}")
+    print(f"  Max |bias + contributions - predict_proba|: {error:.2e}")
+    print()
+    print(f"  {'rows':>6} {'predict_proba':>15} {'attribution':>13} {'cached':>10}")
+
+    for n_rows in (1, 10, 100, 1000):
+        batch = X[:n_rows]
+        cached.contributions(batch)
+        inference = best_ms(lambda: classifier.predict_proba(batch))
+        attribution = best_ms(lambda: explainer.contributions(batch))
+        hit = best_ms(lambda: cached.contributions(batch))
+        print(f"  {n_rows:>6} {inference:>12.2f} ms {attribution:>10.2f} ms {hit:>7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import columnar
+
+SAMPLE = {
+    'name': 'Benchmark Student',
+    'age': 17,
+    'gender': 'female',
+    'studentEducation': 'secondary',
+    'studyTimePerWeek': '5_to_10',
+    'absences': '1_to_5',
+    'testPrep': 'prepared',
+    'attendanceRate': 88,
+    'writingScore': 72,
+    'readingScore': 81,
+    'speakingScore': 69.5,
+}
+
+GENDERS = ['female', 'male']
+STUDY_TIMES = ['less_than_2', '2_to_5', '5_to_10', 'more_than_10']
+ABSENCES = ['none', '1_to_5', '6_to_10', 'more_than_10']
+EDUCATION = ['secondary', 'bachelors', 'masters', 'doctorate']
+
+
+def students(n):
+    return [
+        dict(SAMPLE, name=f'Student {i}', gender=GENDERS[i % 2], studyTimePerWeek=STUDY_TIMES[i % 4],
+             absences=ABSENCES[(i // 4) % 4], studentEducation=EDUCATION[(i // 16) % 4],
+             attendanceRate=50 + i % 50, writingScore=40 + (i * 7) % 60,
+             readingScore=45 + (i * 11) % 55, speakingScore=50 + (i * 13) % 50)
+        for i in range(n)
+    ]
+
+
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Compare JSON and columnar /predict/batch throughput')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    warnings.simplefilter('ignore')
+    os.environ.setdefault('BATCH_MAX_ROWS', str(max(args.rows)))
+    os.environ.setdefault('ADMISSION_ENABLED', 'false')
+    sys.stdout, real_stdout = open(os.devnull, 'w'), sys.stdout
+    import flask_app
+    from api.schema import validate_batch
+    # Keep the server's per-request prints out of the table
+    report = real_stdout
+
+    client = flask_app.app.test_client()
+    query = '?fields=riskLevel,confidence,probabilities'
+
+    print(" JSON VS COLUMNAR BATCH SCORING", file=report)
+    print("=" * 60, file=report)
+    print(f"  {'rows':>6} {'format':<9} {'sent B':>10} {'recv B':>10} {'decode ms':>10} {'total ms':>9} {'rows/s':>10}", file=report)
+
+    for n in args.rows:
+        batch = students(n)
+        records = validate_batch({'students': batch}, max_rows=n)
+        X = np.asarray([flask_app.prepare_ml_features(record) for record in records], dtype=np.float32)
+
+        json_body = json.dumps({'students': batch}).encode()
+        columnar_body = columnar.encode_columns([(name, X[:, i]) for i, name in enumerate(columnar.FEATURE_COLUMNS)])
+
+        # Request parsing up to the feature matrix, without scoring
+        json_decode_ms, _ = best_of(args.repeat, lambda: [
+            flask_app.prepare_ml_features(record)
+            for record in validate_batch(json.loads(json_body), max_rows=n)
+        ])
+        columnar_decode_ms, decoded = best_of(args.repeat, lambda: columnar.feature_matrix(columnar_body))
+        assert np.array_equal(decoded, X)
+
+        json_ms, json_response = best_of(args.repeat, lambda: client.post(
+            '/predict/batch' + query, data=json_body, content_type='application/json'))
+        columnar_ms, columnar_response = best_of(args.repeat, lambda: client.post(
+            '/predict/batch' + query, data=columnar_body, content_type=columnar.CONTENT_TYPE))
+        assert json_response.status_code == 200 and columnar_response.status_code == 200
+
+        # Both paths must give the same answers
+        result = columnar.decode_columns(columnar_response.data)
+        labels = np.asarray(columnar.classes_of(result))[result['riskLevel']]
+        expected = [p['riskLevel'] for p in json_response.get_json()['predictions']]
+        assert list(labels) == expected
+
+        for label, sent, received, decode_ms, total_ms in (
+            ('json', len(json_body), len(json_response.data), json_decode_ms, json_ms),
+            ('columnar', len(columnar_body), len(columnar_response.data), columnar_decode_ms, columnar_ms),
+        ):
+            print(f"  {n:>6} {label:<9} {sent:>10} {received:>10} {decode_ms:>10.3f} {total_ms:>9.2f} {n / total_ms * 1000:>10.0f}", file=report)
+
+
+if __name__ == '__main__':
+    main()
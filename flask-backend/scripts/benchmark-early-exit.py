@@ -0,0 +1,135 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATA_PATH = '../data/raw/PhilipineStudentsPerformance_with_StudyingHours.csv'
+
+DEGREE_EDUCATION = {
+    'Junior High School': 'secondary',
+    'Senior High School': 'secondary',
+    'Bachelors': 'bachelors',
+    'Masters': 'masters',
+    'Doctorate': 'doctorate',
+}
+
+
+def to_payloads(frame):
+    """/predict payloads for rows of the raw dataset"""
+    hours = frame['Studying Hours'].to_numpy(dtype=float)
+    attendance = frame['Attendance Rate (%)'].to_numpy(dtype=float)
+    return pd.DataFrame({
+        'name': frame['Student ID'].astype(str),
+        'gender': frame['Gender'].astype(str).str.lower(),
+        'studentEducation': frame['Degree Program'].astype(str).map(DEGREE_EDUCATION).fillna('secondary'),
+        'studyTimePerWeek': np.select([hours < 2, hours < 5, hours < 10],
+                                      ['less_than_2', '2_to_5', '5_to_10'], 'more_than_10'),
+        'absences': np.select([attendance >= 90, attendance >= 70, attendance >= 50],
+                              ['none', '1_to_5', '6_to_10'], 'more_than_10'),
+        'testPrep': np.where(frame['Test Prep'] == 'Prepared', 'prepared', 'not_prepared'),
+        'attendanceRate': frame['Attendance Rate (%)'].clip(0, 100),
+        'writingScore': frame['Writing'].clip(0, 100),
+        'readingScore': frame['Reading'].clip(0, 100),
+        'speakingScore': frame['Speaking'].clip(0, 100),
+    }).to_dict('records')
+
+
+def per_row_ms(predict_proba, X, repeat):
+    """Median and mean latency of scoring one row at a time, as /predict does"""
+    timings = []
+    for _ in range(repeat):
+        for row in X:
+            start = time.perf_counter()
+            predict_proba(row[None, :])
+            timings.append(time.perf_counter() - start)
+    timings = np.asarray(timings) * 1000
+    return float(np.median(timings)), float(timings.mean())
+
+
+def batch_ms(predict_proba, X, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict_proba(X)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Trees walked and latency of early-exit inference on the dataset')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--rows', type=int, default=None, help='score only the first N rows')
+    parser.add_argument('--block', type=int, nargs='+', default=[1, 5, 10])
+    parser.add_argument('--delta', type=float, default=0.01)
+    parser.add_argument('--min-trees', type=int, default=10)
+    parser.add_argument('--min-rows', type=int, default=32, help='exact mode walks smaller batches in full')
+    parser.add_argument('--repeat', type=int, default=3)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    warnings.simplefilter('ignore')
+    import flask_app
+    from api.early_exit import EarlyExitForest
+    from api.schema import validate_batch
+
+    if not flask_app.models_loaded:
+        sys.exit("No model loaded; run from flask-backend/ with models/student-model.pkl present")
+    classifier = flask_app.classifier
+    flat = flask_app.explainer.flat
+
+    frame = pd.read_csv(args.data, nrows=args.rows, encoding='utf-8-sig')
+    students = validate_batch(to_payloads(frame), max_rows=len(frame))
+    X = np.array([flask_app.prepare_ml_features(student) for student in students], dtype=np.float32)
+    # Half the rows order the trees, the other half are scored
+    reference, X = X[::2], X[1::2]
+
+    served_jobs = classifier.n_jobs
+    expected = classifier.predict_proba(X)
+    labels = expected.argmax(axis=1)
+
+    print(" EARLY-EXIT INFERENCE BENCHMARK")
+    print("=" * 60)
+    print(f"  {args.data}: {len(X)} rows scored, {len(reference)} used to order trees; {flat.n_trees} trees")
+
+    print(f"\n  {'predictor':<34} {'trees':>6} {'labels':>8} {'max dp':>8} {'p50 ms':>8} {'mean ms':>8} {'batch ms':>9}")
+    baselines = {}
+    for name, jobs in ((f'predict_proba n_jobs={served_jobs}', served_jobs), ('predict_proba n_jobs=1', 1)):
+        classifier.n_jobs = jobs
+        p50, mean = per_row_ms(classifier.predict_proba, X, args.repeat)
+        baselines[name] = (p50, mean, batch_ms(classifier.predict_proba, X, args.repeat))
+    classifier.n_jobs = served_jobs
+    baselines['flat walk, all trees'] = (*per_row_ms(flat.predict, X, args.repeat), batch_ms(flat.predict, X, args.repeat))
+    for name, (p50, mean, batch) in baselines.items():
+        print(f"  {name:<34} {flat.n_trees:>6} {'100.0%':>8} {'0':>8} {p50:>8.3f} {mean:>8.3f} {batch:>9.1f}")
+
+    served_mean, served_batch = baselines[f'predict_proba n_jobs={served_jobs}'][1:]
+    flat_mean, flat_batch = baselines['flat walk, all trees'][1:]
+    for mode in ('exact', 'confidence'):
+        for ordering in ('purity', 'agreement'):
+            for block in args.block:
+                forest = EarlyExitForest(classifier, mode=mode, delta=args.delta, min_trees=args.min_trees, block=block,
+                                         min_rows=args.min_rows, reference=reference if ordering == 'agreement' else None, flat=flat)
+                probabilities = forest.predict_proba(X)
+                # Trees walked per row on the whole set; single-row calls may skip the exit (min_rows)
+                trees = forest.stats()['avg_trees']
+                agreement = np.mean(probabilities.argmax(axis=1) == labels)
+                max_dp = np.abs(probabilities - expected).max()
+                p50, mean = per_row_ms(forest.predict_proba, X, args.repeat)
+                batch = batch_ms(forest.predict_proba, X, args.repeat)
+                name = f'{mode}, {ordering}, block {block}'
+                print(f"  {name:<34} {trees:>6.1f} {agreement:>8.1%} {max_dp:>8.3f} {p50:>8.3f} {mean:>8.3f} {batch:>9.1f}"
+                      f"   saves {1 - mean / served_mean:.0%}/{1 - batch / served_batch:.0%} vs served, "
+                      f"{1 - mean / flat_mean:.0%}/{1 - batch / flat_batch:.0%} vs flat walk")
+    print("\n  Savings are per-row mean / whole batch; negative means slower.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.inference_pool import InferencePool
+
+
+def feature_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(0, 2, n), rng.integers(0, 4, n), rng.integers(0, 4, n), rng.integers(0, 5, n),
+        rng.uniform(40, 100, n), rng.uniform(30, 100, n), np.zeros((n, 3)),
+    ]).astype(np.float32)
+
+
+def run(model, threads, batch, duration):
+    """Requests/s when each thread parses a JSON body, scores it and serializes the answer"""
+    body = json.dumps({'rows': feature_rows(batch).tolist()})
+    counts = [0] * threads
+    stop = time.perf_counter() + duration
+
+    def worker(index):
+        while time.perf_counter() < stop:
+            X = np.asarray(json.loads(body)['rows'], dtype=np.float32)
+            probabilities = model.predict_proba(X)
+            json.dumps({'probabilities': probabilities.tolist()})
+            counts[index] += 1
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='In-thread predict_proba vs the shared-memory inference pool')
+    parser.add_argument('--model', default='models/student-model.pkl')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--duration', type=float, default=3)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    warnings.simplefilter('ignore')
+    classifier = joblib.load(args.model)
+    # In-thread baseline as a threaded worker would run it, without joblib fan-out
+    classifier.n_jobs = 1
+
+    pool = InferencePool(classifier, processes=args.processes)
+    X = feature_rows(2000, seed=1)
+    parity = np.abs(pool.predict_proba(X) - classifier.predict_proba(X)).max()
+
+    print(" INFERENCE POOL VS IN-THREAD")
+    print("=" * 60)
+    print(f"  {os.cpu_count()} cores, {args.processes} pool processes, "
+          f"{pool.model_bytes / 1024:.0f} KB shared trees, max |diff| {parity:.1e}")
+    print(f"  {'batch':>6} {'threads':>8} {'in-thread req/s':>16} {'pool req/s':>11} {'speedup':>8}")
+    try:
+        for batch in args.batch:
+            for threads in args.threads:
+                local = run(classifier, threads, batch, args.duration)
+                pooled = run(pool, threads, batch, args.duration)
+                print(f"  {batch:>6} {threads:>8} {local:>16.1f} {pooled:>11.1f} {pooled / local:>7.2f}x")
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import gzip
+import json
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE = {
+    'name': 'Benchmark Student',
+    'age': 17,
+    'gender': 'female',
+    'studentEducation': 'secondary',
+    'studyTimePerWeek': '5_to_10',
+    'absences': '1_to_5',
+    'testPrep': 'prepared',
+    'attendanceRate': 88,
+    'writingScore': 72,
+    'readingScore': 81,
+    'speakingScore': 69.5,
+}
+
+MODES = [
+    ('full', '', None),
+    ('full', '', 'gzip'),
+    ('full', '', 'deflate'),
+    ('sparse', 'fields=riskLevel,confidence', None),
+    ('sparse', 'fields=riskLevel,confidence', 'gzip'),
+]
+
+
+def students(n):
+    """Distinct rows, so compression ratios aren't flattered by repetition"""
+    return {'students': [
+        dict(SAMPLE, name=f'Student {i}', attendanceRate=50 + i % 50,
+             writingScore=40 + (i * 7) % 60, readingScore=45 + (i * 11) % 55, speakingScore=50 + (i * 13) % 50)
+        for i in range(n)
+    ]}
+
+
+def measure(client, path, body, encoding, compress_body=False, repeat=20):
+    """Bytes on the wire and server CPU per request (the test client runs in-process)"""
+    headers = {'Accept-Encoding': encoding or 'identity', 'Content-Type': 'application/json'}
+    data = json.dumps(body).encode()
+    if compress_body:
+        data = gzip.compress(data)
+        headers['Content-Encoding'] = 'gzip'
+
+    client.post(path, data=data, headers=headers)
+    cpu = time.process_time()
+    for _ in range(repeat):
+        response = client.post(path, data=data, headers=headers)
+    cpu_ms = (time.process_time() - cpu) * 1000 / repeat
+    assert response.status_code == 200, response.data[:200]
+    return len(data), len(response.data), cpu_ms
+
+
+def main():
+    warnings.simplefilter('ignore')
+    sys.stdout, real_stdout = open(os.devnull, 'w'), sys.stdout
+    import flask_app
+    client = flask_app.app.test_client()
+
+    rows = []
+    for label, path, body, repeat in (
+        ('/predict', '/predict', SAMPLE, 50),
+        ('/predict/batch x100', '/predict/batch?explain=1', students(100), 10),
+        ('/predict/batch x1000', '/predict/batch?explain=1', students(1000), 3),
+    ):
+        for fieldset, query, encoding in MODES:
+            url = path + ('&' if '?' in path else '?') + query if query else path
+            sent, received, cpu_ms = measure(client, url, body, encoding, repeat=repeat)
+            rows.append((label, fieldset, encoding or 'identity', 'json', sent, received, cpu_ms))
+        sent, received, cpu_ms = measure(client, path, body, 'gzip', compress_body=True, repeat=repeat)
+        rows.append((label, 'full', 'gzip', 'gzip', sent, received, cpu_ms))
+    sys.stdout = real_stdout
+
+    print(" RESPONSE SIZE AND CPU BY MODE")
+    print("=" * 60)
+    print(f"  {'endpoint':<22} {'fields':<7} {'response':<9} {'request':<8} {'sent B':>8} {'recv B':>9} {'cpu ms':>8}")
+    for label, fieldset, encoding, request_encoding, sent, received, cpu_ms in rows:
+        print(f"  {label:<22} {fieldset:<7} {encoding:<9} {request_encoding:<8} {sent:>8} {received:>9} {cpu_ms:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
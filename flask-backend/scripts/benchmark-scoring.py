@@ -0,0 +1,125 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SYNTHETIC_PATH = '../data/synthetic/students.csv'
+
+DEGREE_EDUCATION = {
+    'Junior High School': 'secondary',
+    'Senior High School': 'secondary',
+    'Associate': 'secondary',
+    'Bachelors': 'bachelors',
+    'Masters': 'masters',
+    'PhD': 'doctorate',
+}
+
+
+def study_time(hours):
+    return np.select(
+        [hours < 2, hours < 5, hours < 10],
+        ['less_than_2', '2_to_5', '5_to_10'],
+        'more_than_10'
+    )
+
+
+def absences(attendance):
+    return np.select(
+        [attendance >= 90, attendance >= 70, attendance >= 50],
+        ['none', '1_to_5', '6_to_10'],
+        'more_than_10'
+    )
+
+
+def to_payloads(chunk):
+    """/predict payloads for rows of the raw (or synthetic) dataset"""
+    return pd.DataFrame({
+        'name': chunk['Student ID'].astype(str),
+        'gender': chunk['Gender'].astype(str).str.lower(),
+        'studentEducation': chunk['Degree Program'].astype(str).map(DEGREE_EDUCATION).fillna('secondary'),
+        'studyTimePerWeek': study_time(chunk['Studying Hours'].to_numpy()),
+        'absences': absences(chunk['Attendance Rate (%)'].to_numpy()),
+        'testPrep': np.where(chunk['Test Prep'] == 'Prepared', 'prepared', 'not_prepared'),
+        'attendanceRate': chunk['Attendance Rate (%)'].clip(0, 100),
+        'writingScore': chunk['Writing'].clip(0, 100),
+        'readingScore': chunk['Reading'].clip(0, 100),
+        'speakingScore': chunk['Speaking'].clip(0, 100),
+    }).to_dict('records')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Score a synthetic dataset end to end through the API code path')
+    parser.add_argument('--data', default=SYNTHETIC_PATH,
+                        help='CSV written by scripts/synthetic_data.py')
+    parser.add_argument('--rows', type=int, default=100_000, help='stop after this many rows')
+    parser.add_argument('--batch', type=int, default=1000, help='rows per /predict/batch-sized request')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.data):
+        sys.exit(f"{args.data} not found; generate it with: python scripts/synthetic_data.py --rows {args.rows}")
+
+    warnings.simplefilter('ignore')
+    import flask_app
+    from api.schema import validate_batch
+
+    if not flask_app.models_loaded:
+        sys.exit("No model loaded; run from flask-backend/ with models/student-model.pkl present")
+    classifier = flask_app.classifier
+    classifier.n_jobs = 1
+
+    timings = {'parse': 0.0, 'validate': 0.0, 'features': 0.0, 'predict': 0.0, 'attribution': 0.0}
+    scored = 0
+    at_risk = 0
+    at_risk_index = list(classifier.classes_).index('at_risk')
+
+    print(" SYNTHETIC SCORING BENCHMARK")
+    print("=" * 60)
+    print(f"  Source: {args.data}")
+
+    reader = pd.read_csv(args.data, chunksize=args.batch, nrows=args.rows)
+    while True:
+        start = time.perf_counter()
+        chunk = next(reader, None)
+        if chunk is None:
+            break
+        payloads = to_payloads(chunk)
+        timings['parse'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        students = validate_batch(payloads, max_rows=args.batch)
+        timings['validate'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        X = np.array([flask_app.prepare_ml_features(student) for student in students], dtype=float)
+        timings['features'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        probabilities = classifier.predict_proba(X)
+        timings['predict'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        flask_app.explainer.contributions(X)
+        timings['attribution'] += time.perf_counter() - start
+
+        scored += len(students)
+        at_risk += int((probabilities.argmax(axis=1) == at_risk_index).sum())
+
+    total = sum(timings.values())
+    print(f"  Rows scored: {scored:,} in batches of {args.batch} ({at_risk / max(scored, 1):.1%} at_risk)")
+    print()
+    for stage, seconds in timings.items():
+        print(f"  {stage:<12} {seconds:>8.2f} s {seconds / max(scored, 1) * 1e6:>9.1f} us/row {seconds / total:>6.1%}")
+    print(f"  {'total':<12} {total:>8.2f} s {scored / total:>9,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.schema import validate_batch, validate_payload
+
+SAMPLE = {
+    'name': 'Benchmark Student',
+    'age': 17,
+    'gender': 'female',
+    'studentEducation': 'secondary',
+    'studyTimePerWeek': '5_to_10',
+    'absences': '1_to_5',
+    'testPrep': 'prepared',
+    'attendanceRate': 88,
+    'writingScore': 72,
+    'readingScore': '81',
+    'speakingScore': 69.5,
+    'extraCurricular': True,
+    'internetAccess': 'true',
+    'tutoring': 0,
+}
+
+
+def ad_hoc_coercion(data):
+    """The per-field float()/int() calls /predict used to make"""
+    writing = float(data.get('writingScore', 0))
+    reading = float(data.get('readingScore', 0))
+    speaking = float(data.get('speakingScore', 0))
+    return (
+        int(data.get('age', 0)),
+        float(data.get('attendanceRate', 65)),
+        (writing + reading + speaking) / 3,
+        bool(data.get('extraCurricular', False)),
+    )
+
+
+def per_row_us(fn, repeat=5, number=20000):
+    return min(timeit.repeat(fn, repeat=repeat, number=number)) / number * 1e6
+
+
+def main():
+    print(" PREDICTION PAYLOAD VALIDATION BENCHMARK")
+    print("=" * 60)
+
+    print(f"  ad-hoc coercion (no checks): {per_row_us(lambda: ad_hoc_coercion(SAMPLE)):.2f} us/row")
+    print(f"  validate_payload:            {per_row_us(lambda: validate_payload(SAMPLE)):.2f} us/row")
+
+    for size in (10, 100, 1000):
+        rows = {'students': [SAMPLE] * size}
+        total_us = per_row_us(lambda: validate_batch(rows), number=max(1, 20000 // size))
+        print(f"  validate_batch x{size:<5}        {total_us / size:.2f} us/row ({total_us / 1000:.2f} ms total)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+
+SAMPLE = {
+    'name': 'Load Test Student',
+    'age': 17,
+    'gender': 'female',
+    'studentEducation': 'secondary',
+    'studyTimePerWeek': '5_to_10',
+    'absences': '1_to_5',
+    'testPrep': 'prepared',
+    'attendanceRate': 88,
+    'writingScore': 72,
+    'readingScore': 81,
+    'speakingScore': 69.5,
+}
+
+
+def start_local_server(port):
+    """Run flask_app.py in a child process so client threads don't share its GIL"""
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen(
+        [sys.executable, 'flask_app.py'],
+        cwd=backend,
+        env={**os.environ, 'PORT': str(port)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(120):
+        if call(url, '/test', timeout=1)[0] == 200:
+            return server, url
+        time.sleep(0.5)
+    server.terminate()
+    sys.exit("Local server did not start")
+
+
+def call(url, path, body=None, client=None, timeout=10):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url + path, data=data, method='POST' if data else 'GET')
+    req.add_header('Content-Type', 'application/json')
+    if client:
+        req.add_header('X-Client-Id', client)
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 'error'
+    return status, (time.perf_counter() - start) * 1000
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.status = defaultdict(lambda: defaultdict(int))
+
+    def add(self, path, status, elapsed_ms):
+        with self.lock:
+            self.status[path][status] += 1
+            if status == 200:
+                self.latency[path].append(elapsed_ms)
+
+
+def run_clients(url, concurrency, duration, batch_every, batch_size, clients, results):
+    stop = time.monotonic() + duration
+    batch = {'students': [SAMPLE] * batch_size}
+
+    def worker(index):
+        client = f'client-{index % clients}'
+        n = 0
+        while time.monotonic() < stop:
+            n += 1
+            if batch_every and n % batch_every == 0:
+                results.add('/predict/batch', *call(url, '/predict/batch', batch, client))
+            else:
+                results.add('/predict', *call(url, '/predict', SAMPLE, client))
+
+    def prober():
+        # Health checks the way a load balancer sends them, alongside the burst
+        while time.monotonic() < stop:
+            results.add('/health', *call(url, '/health'))
+            results.add('/ready', *call(url, '/ready'))
+            time.sleep(0.2)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    threads.append(threading.Thread(target=prober))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def report(url, results, elapsed):
+    print()
+    print(f"  {'path':<16} {'requests':>8} {'ok/s':>7} {'p50 ms':>8} {'p99 ms':>8}  status counts")
+    for path in ('/predict', '/predict/batch', '/health', '/ready'):
+        statuses = results.status.get(path)
+        if not statuses:
+            continue
+        total = sum(statuses.values())
+        latency = results.latency.get(path) or [float('nan')]
+        counts = ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str))
+        print(f"  {path:<16} {total:>8} {len(results.latency.get(path, [])) / elapsed:>7.1f} "
+              f"{np.percentile(latency, 50):>8.1f} {np.percentile(latency, 99):>8.1f}  {counts}")
+
+    status, _ = call(url, '/health')
+    if status == 200:
+        with urllib.request.urlopen(url + '/health') as response:
+            admission = json.load(response).get('admission')
+        if admission:
+            print(f"\n  Server admission: admitted {admission['admitted']}, shed {admission['shed']}, "
+                  f"peak in flight {admission['peak_in_flight']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Burst /predict traffic at the backend and report shedding')
+    parser.add_argument('--url', default=None, help='running server; default starts flask_app.py locally')
+    parser.add_argument('--port', type=int, default=5057, help='port for the local server')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--batch-every', type=int, default=10, help='every Nth request is a batch (0: never)')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--clients', type=int, default=4, help='distinct X-Client-Id values')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    url = args.url
+    server = None
+    if url is None:
+        server, url = start_local_server(args.port)
+
+    print(" LOAD GENERATOR")
+    print("=" * 60)
+    print(f"  {url}: {args.concurrency} clients for {args.duration:.0f}s, batch of {args.batch_size} every {args.batch_every}")
+
+    results = Results()
+    start = time.perf_counter()
+    try:
+        run_clients(url, args.concurrency, args.duration, args.batch_every, args.batch_size, args.clients, results)
+        elapsed = time.perf_counter() - start
+        report(url, results, elapsed)
+    finally:
+        if server is not None:
+            server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.prediction_log import read_log, replay, segment_paths
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize a prediction log and replay it against a model')
+    parser.add_argument('log_dir', help='directory the server wrote with PREDICTION_LOG_DIR')
+    parser.add_argument('--model', default='models/student-model.pkl', help='classifier to replay against')
+    parser.add_argument('--hours', type=float, default=None, help='only records from the last N hours')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    warnings.simplefilter('ignore')
+
+    since = time.time() - args.hours * 3600 if args.hours else None
+    start = time.perf_counter()
+    records, classes = read_log(args.log_dir, since=since)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    print(" PREDICTION LOG REPLAY")
+    print("=" * 60)
+    if records is None:
+        print(f"  No records in {args.log_dir}")
+        return
+
+    print(f"  Segments: {len(segment_paths(args.log_dir))}, records: {len(records):,} "
+          f"({records.dtype.itemsize} bytes each), mapped in {load_ms:.1f} ms")
+    first, last = records['timestamp'].min(), records['timestamp'].max()
+    print(f"  Span: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(first))} .. "
+          f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last))}")
+
+    versions, counts = np.unique(records['model_version'], return_counts=True)
+    print("\n  Served by model version:")
+    for version, count in zip(versions, counts):
+        print(f"    {version.decode()}: {count:,}")
+
+    latency = records['latency_ms']
+    print(f"\n  Latency ms: p50 {np.percentile(latency, 50):.2f}, p95 {np.percentile(latency, 95):.2f}, "
+          f"max {latency.max():.2f}")
+
+    served = np.bincount(records['probabilities'].argmax(axis=1), minlength=len(classes))
+    print("\n  Served class mix:")
+    for name, count in zip(classes, served):
+        print(f"    {name}: {count / len(records):.1%}")
+
+    model = joblib.load(args.model)
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = -1
+    start = time.perf_counter()
+    result = replay(records, classes, model)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n  Replayed against {args.model} in {elapsed:.2f}s")
+    print(f"  Label agreement: {result['agreement_rate']:.2%}")
+    for name, delta in result['probability_delta'].items():
+        print(f"    P({name}) |delta|: mean {delta['mean_abs']:.4f}, max {delta['max_abs']:.4f}")
+
+
+if __name__ == '__main__':
+    main()
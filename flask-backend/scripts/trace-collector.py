@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.tracing import trace_files
+
+STATE_FILE = '.collector-offsets.json'
+
+
+def attribute_map(attributes):
+    values = {}
+    for attribute in attributes:
+        value = attribute['value']
+        values[attribute['key']] = next(iter(value.values())) if value else None
+    return values
+
+
+def spans_of(document):
+    for resource_spans in document.get('resourceSpans', []):
+        resource = attribute_map(resource_spans.get('resource', {}).get('attributes', []))
+        for scope_spans in resource_spans.get('scopeSpans', []):
+            for span in scope_spans.get('spans', []):
+                yield resource, span
+
+
+class Collector:
+    """Stand-in for an OTLP collector: ingests the exporter's files incrementally
+
+    Byte offsets per file are remembered in a state file, so each run
+    (or each --follow poll) reads only lines appended since the last; a
+    file that shrank or was replaced is read again from the start.
+    Ingested documents can be forwarded, unchanged, to one merged file.
+    """
+
+    def __init__(self, directory, forward=None):
+        self.directory = directory
+        self.state_path = os.path.join(directory, STATE_FILE)
+        self.offsets = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.offsets = json.load(f)
+        self.forward = open(forward, 'a') if forward else None
+        self.traces = []
+
+    def poll(self):
+        ingested = 0
+        for path in trace_files(self.directory):
+            name = os.path.basename(path)
+            offset = self.offsets.get(name, 0)
+            if os.path.getsize(path) < offset:
+                offset = 0
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Still being written; pick it up next poll
+                        break
+                    offset += len(line)
+                    try:
+                        document = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.ingest(document)
+                    if self.forward is not None:
+                        self.forward.write(line.decode())
+                    ingested += 1
+            self.offsets[name] = offset
+
+        # Forget files the exporter has rotated away
+        present = {os.path.basename(path) for path in trace_files(self.directory)}
+        self.offsets = {name: offset for name, offset in self.offsets.items() if name in present}
+        with open(self.state_path, 'w') as f:
+            json.dump(self.offsets, f)
+        if self.forward is not None:
+            self.forward.flush()
+        return ingested
+
+    def ingest(self, document):
+        spans = [span for _, span in spans_of(document)]
+        root = next((span for span in spans if 'parentSpanId' not in span), None) or spans[0]
+        start = int(root['startTimeUnixNano'])
+        self.traces.append({
+            'trace_id': root['traceId'],
+            'name': root['name'],
+            'start_ns': start,
+            'duration_ms': (int(root['endTimeUnixNano']) - start) / 1e6,
+            'attributes': attribute_map(root.get('attributes', [])),
+            'stages': [
+                (span['name'], (int(span['endTimeUnixNano']) - int(span['startTimeUnixNano'])) / 1e6,
+                 span.get('status', {}).get('code') == 2)
+                for span in spans if span is not root
+            ],
+        })
+
+
+def report(traces, slowest):
+    print(f"\n {len(traces)} trace(s)")
+    reasons = {}
+    for trace in traces:
+        reason = trace['attributes'].get('sampling.reason', 'unknown')
+        reasons[reason] = reasons.get(reason, 0) + 1
+    print("  kept because: " + ', '.join(f'{reason} {count}' for reason, count in sorted(reasons.items())))
+
+    durations = {}
+    for trace in traces:
+        durations.setdefault(trace['name'], []).append(trace['duration_ms'])
+        for name, ms, _ in trace['stages']:
+            durations.setdefault(f'  {name}', []).append(ms)
+    print(f"\n  {'span':<28} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for name, values in durations.items():
+        values = np.asarray(values)
+        print(f"  {name:<28} {len(values):>6} {np.percentile(values, 50):>9.2f} "
+              f"{np.percentile(values, 95):>9.2f} {values.max():>9.2f}")
+
+    print(f"\n  Slowest {min(slowest, len(traces))}:")
+    for trace in sorted(traces, key=lambda t: -t['duration_ms'])[:slowest]:
+        attributes = trace['attributes']
+        notes = [f"{key}={attributes[key]}" for key in ('http.response.status_code', 'model_version', 'batch_size',
+                                                        'fallback_reason') if key in attributes]
+        print(f"  {trace['trace_id']} {trace['name']} {trace['duration_ms']:.1f} ms  {' '.join(notes)}")
+        for name, ms, failed in trace['stages']:
+            print(f"      {name:<20} {ms:>9.2f} ms{'  ERROR' if failed else ''}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest and summarize the OTLP/JSON trace files written under TRACE_DIR')
+    parser.add_argument('directory', nargs='?', default=os.environ.get('TRACE_DIR', 'traces'))
+    parser.add_argument('--forward', default=None, help='append every ingested document to this JSON lines file')
+    parser.add_argument('--follow', action='store_true', help='keep polling for new traces')
+    parser.add_argument('--interval', type=float, default=2.0)
+    parser.add_argument('--slowest', type=int, default=5)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    collector = Collector(args.directory, args.forward)
+
+    print(" TRACE COLLECTOR")
+    print("=" * 60)
+    print(f"  {args.directory}: {collector.poll()} new trace(s)")
+    if collector.traces:
+        report(collector.traces, args.slowest)
+
+    while args.follow:
+        time.sleep(args.interval)
+        before = len(collector.traces)
+        if collector.poll():
+            report(collector.traces[before:], args.slowest)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import hashlib
+import inspect
+import json
+import os
+import time
+
+import joblib
+
+DEFAULT_ARTIFACT_DIR = 'data/cache/artifacts'
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Parameters that change how fast a stage runs but not what it produces
+IGNORED_PARAMS = {'n_jobs', 'verbose'}
+
+
+def _canonical(value):
+    """JSON-stable form of stage parameters"""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items()) if k not in IGNORED_PARAMS}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+class ArtifactCache:
+    """Content-addressed store for training pipeline stage outputs
+
+    A stage's key hashes its name, its function's source, the keys of the
+    stages it consumes and its parameters, so editing one stage (or any
+    upstream input) recomputes it and everything downstream while
+    unchanged stages load from disk. Entries are evicted least recently
+    used first once the store exceeds ``max_bytes``.
+    """
+
+    def __init__(self, root=DEFAULT_ARTIFACT_DIR, max_bytes=DEFAULT_MAX_BYTES, force=False, enabled=True):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.force = force
+        self.enabled = enabled
+        self._used = set()
+
+    def key(self, stage, fn, inputs=(), params=None):
+        payload = {
+            'stage': stage,
+            'source': inspect.getsource(fn),
+            'inputs': list(inputs),
+            'params': _canonical(params or {}),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f'{key}.joblib')
+
+    def run(self, stage, fn, inputs=(), params=None, args=()):
+        """Return (output, key) for a stage, loading it from the store when its key is known"""
+        params = params or {}
+        key = self.key(stage, fn, inputs, params)
+        path = self._path(key)
+        self._used.add(key)
+
+        if self.enabled and not self.force and os.path.exists(path):
+            start = time.perf_counter()
+            value = joblib.load(path)
+            os.utime(path)
+            print(f" [cache] {stage}: loaded {key[:12]} in {time.perf_counter() - start:.2f}s")
+            return value, key
+
+        start = time.perf_counter()
+        value = fn(*args, **params)
+        elapsed = time.perf_counter() - start
+
+        if self.enabled:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            staging = f'{path}.tmp-{os.getpid()}'
+            joblib.dump(value, staging)
+            os.replace(staging, path)
+            print(f" [cache] {stage}: computed {key[:12]} in {elapsed:.2f}s")
+            self.evict()
+
+        return value, key
+
+    def entries(self):
+        """(path, size, last_used) for every stored artifact"""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith('.joblib'):
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    found.append((path, stat.st_size, stat.st_mtime))
+        return found
+
+    def evict(self):
+        """Drop least recently used artifacts until the store fits its size cap"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= self.max_bytes:
+                break
+            key = os.path.basename(path)[:-len('.joblib')]
+            if key in self._used:
+                continue
+            os.remove(path)
+            total -= size
+            removed += 1
+
+        if removed:
+            print(f" [cache] evicted {removed} artifact(s), store now {total / 1024 ** 2:.1f} MB")
+        return removed
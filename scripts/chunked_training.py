@@ -0,0 +1,300 @@
+import json
+import math
+import os
+import resource
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import accuracy_score, f1_score, mean_absolute_error, r2_score
+
+from drift_reference import ReferenceBuilder, save_reference
+from student_features import FEATURES, RAW_COLUMNS, derive_columns, encode_features, vocabulary_encoders
+
+RISK_LEVELS = ['at_risk', 'high_achiever', 'satisfactory']
+
+DEFAULT_MEMORY_MB = 1024
+DEFAULT_EVAL_ROWS = 200_000
+
+# Parsed chunk, derived columns, float32 copies and the tree builder's
+# sample buffers together take a few times a row's in-frame footprint.
+WORKING_SET_FACTOR = 6
+
+
+def _mix64(values):
+    """splitmix64 finaliser, vectorised; wraps modulo 2**64 by design"""
+    z = values.astype(np.uint64)
+    with np.errstate(over='ignore'):
+        z = z + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def holdout_mask(start, n_rows, test_size, seed):
+    """Test-set membership of rows start..start+n_rows, independent of chunking"""
+    index = np.arange(start, start + n_rows, dtype=np.uint64) + np.uint64(seed) * np.uint64(0x100000001B3)
+    return (_mix64(index) >> np.uint64(11)).astype(np.float64) / float(1 << 53) < test_size
+
+
+def scan_dataset(csv_path, chunk_rows=500_000):
+    """One cheap pass for the row count, the Gender vocabulary and a per-row memory estimate"""
+    n_rows = 0
+    genders = set()
+    for chunk in pd.read_csv(csv_path, usecols=['Gender'], chunksize=chunk_rows, encoding='utf-8-sig'):
+        n_rows += len(chunk)
+        genders.update(chunk['Gender'].dropna().astype(str).unique())
+
+    sample = derive_columns(pd.read_csv(csv_path, usecols=RAW_COLUMNS, nrows=10_000, encoding='utf-8-sig'))
+    row_bytes = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    return n_rows, sorted(genders), row_bytes
+
+
+def plan_chunks(n_rows, row_bytes, memory_mb, workers, n_estimators, chunk_rows=None):
+    """Rows per chunk under the memory cap, and trees to grow on each"""
+    if chunk_rows is None:
+        # One chunk being parsed by the reader plus one in flight per worker
+        budget = memory_mb * 1024 ** 2 / (workers + 1)
+        chunk_rows = int(budget / (row_bytes * WORKING_SET_FACTOR))
+    chunk_rows = max(1000, min(chunk_rows, n_rows))
+    n_chunks = math.ceil(n_rows / chunk_rows)
+    trees_per_chunk = max(1, math.ceil(n_estimators / n_chunks))
+    return chunk_rows, n_chunks, trees_per_chunk
+
+
+def _shard_seed(seed, shard_index):
+    return int(np.random.SeedSequence(seed, spawn_key=(shard_index,)).generate_state(1)[0])
+
+
+def fit_shard(shard_index, X, y_cls, y_reg, n_trees, classifier_params, regressor_params, seed):
+    """Grow n_trees classifier and regressor trees on one chunk
+
+    A zero-weight anchor row for every risk level missing from the chunk
+    keeps each shard's classes_ identical, so their trees can be pooled.
+    """
+    start = time.perf_counter()
+    missing = [level for level in RISK_LEVELS if level not in set(y_cls)]
+    weights = np.ones(len(y_cls))
+    if missing:
+        X_cls = pd.concat([X, pd.DataFrame(np.zeros((len(missing), X.shape[1])), columns=X.columns)])
+        y_all = np.concatenate([y_cls, missing])
+        weights = np.concatenate([weights, np.zeros(len(missing))])
+    else:
+        X_cls, y_all = X, y_cls
+
+    shard_seed = _shard_seed(seed, shard_index)
+    classifier = RandomForestClassifier(**{**classifier_params, 'n_estimators': n_trees, 'random_state': shard_seed})
+    classifier.fit(X_cls, y_all, sample_weight=weights)
+    regressor = RandomForestRegressor(**{**regressor_params, 'n_estimators': n_trees, 'random_state': shard_seed})
+    regressor.fit(X, y_reg)
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return shard_index, classifier, regressor, time.perf_counter() - start, peak_mb
+
+
+def merge_forests(shards, params):
+    """One forest whose estimators_ are every shard's trees, in shard order"""
+    merged = clone(shards[0]).set_params(**params)
+    for attribute in ('n_features_in_', 'feature_names_in_', 'n_outputs_', 'classes_', 'n_classes_'):
+        if hasattr(shards[0], attribute):
+            setattr(merged, attribute, getattr(shards[0], attribute))
+    merged.estimators_ = [tree for shard in shards for tree in shard.estimators_]
+    merged.n_estimators = len(merged.estimators_)
+    return merged
+
+
+class LinearAccumulator:
+    """Ordinary least squares from streamed X'X and X'y sums; exact, O(features^2) memory"""
+
+    def __init__(self, n_features):
+        self.gram = np.zeros((n_features + 1, n_features + 1))
+        self.moment = np.zeros(n_features + 1)
+
+    def update(self, X, y):
+        design = np.column_stack([np.ones(len(X)), np.asarray(X, dtype=float)])
+        self.gram += design.T @ design
+        self.moment += design.T @ np.asarray(y, dtype=float)
+
+    def model(self, feature_names):
+        solution = np.linalg.lstsq(self.gram, self.moment, rcond=None)[0]
+        lr = LinearRegression()
+        lr.intercept_ = float(solution[0])
+        lr.coef_ = solution[1:]
+        lr.n_features_in_ = len(feature_names)
+        lr.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        return lr
+
+
+def read_chunks(csv_path, chunk_rows, encoders, test_size, seed, eval_rows, held_out, reference):
+    """Yield (X_train, y_cls, y_reg) per chunk; append up to eval_rows held-out rows to held_out"""
+    offset = 0
+    kept = 0
+    for chunk in pd.read_csv(csv_path, usecols=RAW_COLUMNS, chunksize=chunk_rows, encoding='utf-8-sig'):
+        derive_columns(chunk)
+        reference.update(chunk)
+        X = encode_features(chunk, encoders)
+        test = holdout_mask(offset, len(chunk), test_size, seed)
+
+        if kept < eval_rows and test.any():
+            rows = np.flatnonzero(test)[:eval_rows - kept]
+            held_out.append((X.iloc[rows], chunk['risk_level'].iloc[rows], chunk['english_avg'].iloc[rows]))
+            kept += len(rows)
+
+        train = ~test
+        yield X[train], chunk['risk_level'].to_numpy()[train], chunk['english_avg'].to_numpy()[train]
+        offset += len(chunk)
+
+
+def evaluate(models, X_test, y_test_cls, y_test_reg):
+    y_pred = models['random_forest_classifier'].predict(X_test)
+    return {
+        'accuracy': float(accuracy_score(y_test_cls, y_pred)),
+        'f1': float(f1_score(y_test_cls, y_pred, average='weighted')),
+        'r2_rf': float(r2_score(y_test_reg, models['random_forest_regressor'].predict(X_test))),
+        'mae_rf': float(mean_absolute_error(y_test_reg, models['random_forest_regressor'].predict(X_test))),
+        'r2_lr': float(r2_score(y_test_reg, models['linear_regression'].predict(X_test))),
+    }
+
+
+def train_in_memory(csv_path, encoders, test_size, seed, eval_index, classifier_params, regressor_params):
+    """The regular whole-frame fit on the same split, for comparison"""
+    start = time.perf_counter()
+    df = derive_columns(pd.read_csv(csv_path, usecols=RAW_COLUMNS, encoding='utf-8-sig'))
+    X = encode_features(df, encoders)
+    test = holdout_mask(0, len(df), test_size, seed)
+    train = ~test
+
+    models = {
+        'random_forest_classifier': RandomForestClassifier(**classifier_params).fit(X[train], df['risk_level'][train]),
+        'random_forest_regressor': RandomForestRegressor(**regressor_params).fit(X[train], df['english_avg'][train]),
+        'linear_regression': LinearRegression().fit(X[train], df['english_avg'][train]),
+    }
+    elapsed = time.perf_counter() - start
+    rows = np.flatnonzero(test)[eval_index]
+    metrics = evaluate(models, X.iloc[rows], df['risk_level'].iloc[rows], df['english_avg'].iloc[rows])
+    return metrics, elapsed
+
+
+def train_chunked(csv_path, out_dir, classifier_params, regressor_params, test_size=0.2, seed=42,
+                  memory_mb=DEFAULT_MEMORY_MB, workers=1, chunk_rows=None,
+                  eval_rows=DEFAULT_EVAL_ROWS, baseline=False):
+    """Train the forests shard by shard from a CSV that need not fit in memory
+
+    Each chunk's training rows grow their own group of trees (in a worker
+    process when workers > 1); at most one chunk per worker is in flight,
+    so peak memory tracks chunk size rather than dataset size. The shards
+    are pooled into ordinary RandomForest estimators written where the
+    serving loader looks for them. Linear regression is solved exactly
+    from accumulated normal equations.
+    """
+    start = time.perf_counter()
+    n_rows, genders, row_bytes = scan_dataset(csv_path)
+    encoders = vocabulary_encoders(genders)
+    chunk_rows, n_chunks, trees_per_chunk = plan_chunks(
+        n_rows, row_bytes, memory_mb, workers, classifier_params['n_estimators'], chunk_rows
+    )
+
+    print(f"\n Out-of-core training: {n_rows:,} rows in {n_chunks} chunk(s) of {chunk_rows:,}")
+    print(f" {trees_per_chunk} tree(s) per chunk, {workers} worker(s), {memory_mb:,.0f} MB memory cap")
+
+    shard_params = classifier_params, regressor_params
+    if workers > 1:
+        # Parallelism comes from the pool; keep each shard single-threaded
+        shard_params = tuple({**params, 'n_jobs': 1} for params in shard_params)
+
+    linear = LinearAccumulator(len(FEATURES))
+    held_out = []
+    reference = ReferenceBuilder()
+    results = {}
+    pending = set()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def record(result):
+        shard_index, classifier, regressor, elapsed, peak_mb = result
+        results[shard_index] = (classifier, regressor, elapsed, peak_mb)
+        print(f"   shard {shard_index + 1}/{n_chunks}: {elapsed:.1f}s, peak RSS {peak_mb:,.0f} MB")
+
+    try:
+        chunks = read_chunks(csv_path, chunk_rows, encoders, test_size, seed, eval_rows, held_out, reference)
+        for shard_index, (X, y_cls, y_reg) in enumerate(chunks):
+            linear.update(X, y_reg)
+            args = (shard_index, X, y_cls, y_reg, trees_per_chunk, *shard_params, seed)
+            if pool is None:
+                record(fit_shard(*args))
+                continue
+            if len(pending) >= workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future.result())
+            pending.add(pool.submit(fit_shard, *args))
+        for future in wait(pending).done:
+            record(future.result())
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    ordered = [results[i] for i in sorted(results)]
+    models = {
+        'random_forest_classifier': merge_forests([r[0] for r in ordered], classifier_params),
+        'random_forest_regressor': merge_forests([r[1] for r in ordered], regressor_params),
+        'linear_regression': linear.model(FEATURES),
+    }
+    train_seconds = time.perf_counter() - start
+
+    X_test = pd.concat([part[0] for part in held_out])
+    y_test_cls = pd.concat([part[1] for part in held_out])
+    y_test_reg = pd.concat([part[2] for part in held_out])
+    metrics = evaluate(models, X_test, y_test_cls, y_test_reg)
+
+    summary = {
+        'trained_date': datetime.now().isoformat(),
+        'mode': 'out_of_core',
+        'source': os.path.abspath(csv_path),
+        'rows': n_rows,
+        'chunks': n_chunks,
+        'chunk_rows': chunk_rows,
+        'trees': models['random_forest_classifier'].n_estimators,
+        'workers': workers,
+        'memory_cap_mb': memory_mb,
+        'max_worker_rss_mb': max(r[3] for r in ordered),
+        'train_seconds': train_seconds,
+        'evaluation_rows': len(X_test),
+        'metrics': metrics,
+    }
+
+    print(f"\n Merged forests: {summary['trees']} trees in {train_seconds:.1f}s")
+    print(f" Held-out rows: {len(X_test):,}")
+
+    if baseline:
+        print("\n Fitting in-memory baseline on the same split...")
+        baseline_metrics, baseline_seconds = train_in_memory(
+            csv_path, encoders, test_size, seed, slice(0, len(X_test)), classifier_params, regressor_params
+        )
+        summary['baseline'] = {'train_seconds': baseline_seconds, 'metrics': baseline_metrics}
+
+    print(f"\n {'metric':<10} {'chunked':>10}" + (f" {'in-memory':>10} {'delta':>9}" if baseline else ''))
+    for name, value in metrics.items():
+        line = f" {name:<10} {value:>10.4f}"
+        if baseline:
+            expected = summary['baseline']['metrics'][name]
+            line += f" {expected:>10.4f} {value - expected:>+9.4f}"
+        print(line)
+    if baseline:
+        print(f" {'seconds':<10} {train_seconds:>10.1f} {summary['baseline']['train_seconds']:>10.1f}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, model in models.items():
+        joblib.dump(model, os.path.join(out_dir, f'{name}.pkl'))
+    joblib.dump(encoders, os.path.join(out_dir, 'encoders.pkl'))
+    save_reference(reference, os.path.join(out_dir, 'drift_reference.json'))
+    with open(os.path.join(out_dir, 'chunked_training.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"\n Models written to {out_dir}/")
+    return models, summary
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import struct
+from datetime import datetime
+
+import numpy as np
+
+from student_features import (
+    ABSENCE_CATEGORIES,
+    ATTENDANCE_CUTS,
+    DEGREE_MAPPING,
+    STUDY_HOUR_CUTS,
+    STUDY_TIME_CATEGORIES,
+    TEST_PREP_MAPPING,
+)
+
+MAGIC = b'SPCF'
+FORMAT_VERSION = 1
+# Leaf probability widths tried in order until predictions match sklearn.
+# 8 bits can match on the training rows yet flip near-ties on inputs the
+# dataset never had, so it is opt-in.
+VALUE_BITS = (16, 32)
+ALIGNMENT = 8
+
+# How a client builds each model input from a raw student record
+FEATURE_RECIPES = {
+    'study_time_encoded': {'column': 'Studying Hours', 'below': STUDY_HOUR_CUTS,
+                           'categories': STUDY_TIME_CATEGORIES, 'encoder': 'study_time'},
+    'absence_encoded': {'column': 'Attendance Rate (%)', 'at_least': ATTENDANCE_CUTS,
+                        'categories': ABSENCE_CATEGORIES, 'encoder': 'absence'},
+    'education_encoded': {'column': 'Degree Program', 'mapping': DEGREE_MAPPING, 'default': 'secondary',
+                          'encoder': 'education'},
+    'Gender_encoded': {'column': 'Gender', 'encoder': 'Gender'},
+    'Attendance Rate (%)': {'column': 'Attendance Rate (%)'},
+    'has_tutoring': {'column': 'Test Prep', 'mapping': TEST_PREP_MAPPING, 'default': 0},
+}
+
+
+def _float32_floor(threshold):
+    """Largest float32 not above each threshold; for float32 inputs x <= t and x <= floor(t) agree"""
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _int_dtype(low, high):
+    for dtype in (np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype).newbyteorder('<')
+    raise ValueError('forest too large for 32-bit node indices')
+
+
+def _quantize(probabilities, bits):
+    if bits == 32:
+        return probabilities.astype('<f4'), 1.0
+    scale = float(2 ** bits - 1)
+    dtype = np.dtype(np.uint8 if bits == 8 else np.uint16).newbyteorder('<')
+    return np.rint(probabilities * scale).astype(dtype), scale
+
+
+def flatten_forest(classifier):
+    """Internal nodes and leaves of every tree, split and renumbered globally
+
+    A child reference ``n >= 0`` is internal node ``n``; ``n < 0`` is leaf
+    ``~n``. Thresholds become ranks into a sorted per-feature cut table,
+    so a node stores a small integer instead of a float.
+    """
+    n_features = int(classifier.n_features_in_)
+    trees = [estimator.tree_ for estimator in classifier.estimators_]
+
+    feature, threshold, left, right, leaf_values, roots = [], [], [], [], [], []
+    internal_base = leaf_base = 0
+    for tree in trees:
+        is_leaf = tree.children_left < 0
+        # Position of every node among its tree's internal nodes or leaves
+        rank = np.where(is_leaf, np.cumsum(is_leaf) - 1, np.cumsum(~is_leaf) - 1)
+        code = np.where(is_leaf, ~(rank + leaf_base), rank + internal_base)
+
+        internal = ~is_leaf
+        feature.append(tree.feature[internal])
+        threshold.append(tree.threshold[internal])
+        left.append(code[tree.children_left[internal]])
+        right.append(code[tree.children_right[internal]])
+        roots.append(code[0])
+
+        values = tree.value[is_leaf, 0, :].astype(np.float64)
+        totals = values.sum(axis=1, keepdims=True)
+        leaf_values.append(values / np.where(totals == 0, 1, totals))
+        internal_base += int(internal.sum())
+        leaf_base += int(is_leaf.sum())
+
+    feature = np.concatenate(feature).astype(np.intp)
+    threshold = _float32_floor(np.concatenate(threshold))
+    left, right = np.concatenate(left), np.concatenate(right)
+    roots = np.asarray(roots)
+
+    cuts, offsets = [], [0]
+    node_bin = np.zeros(len(feature), dtype=np.int64)
+    for f in range(n_features):
+        mine = feature == f
+        table = np.unique(threshold[mine])
+        node_bin[mine] = np.searchsorted(table, threshold[mine])
+        cuts.append(table)
+        offsets.append(offsets[-1] + len(table))
+
+    child_dtype = _int_dtype(min(left.min(initial=0), right.min(initial=0), roots.min()),
+                             max(left.max(initial=0), right.max(initial=0), roots.max()))
+    bin_dtype = np.dtype(np.uint8 if node_bin.max(initial=0) < 256 else np.uint16).newbyteorder('<')
+    return {
+        'cuts': np.concatenate(cuts).astype('<f4'),
+        'cut_offsets': np.asarray(offsets, dtype='<u4'),
+        'feature': feature.astype(np.uint8),
+        'bin': node_bin.astype(bin_dtype),
+        'left': left.astype(child_dtype),
+        'right': right.astype(child_dtype),
+        'roots': roots.astype('<i4'),
+    }, np.concatenate(leaf_values)
+
+
+class CompactModel:
+    """Reference scorer over the compact format, using nothing but its header and arrays
+
+    Scoring mirrors what an on-device client does: round each input to
+    float32, replace it by its bin (how many of the feature's cuts lie
+    below it), then walk each tree comparing bins to node ranks and
+    average the leaves' quantized class distributions.
+    """
+
+    def __init__(self, header, arrays):
+        self.header = header
+        self.arrays = arrays
+        self.classes = header['classes']
+        self.features = header['features']
+        self.n_trees = header['n_trees']
+        self.scale = header['values']['scale']
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != MAGIC:
+            raise ValueError('not a compact model file')
+        version, header_bytes = struct.unpack_from('<HxxI', data, 4)
+        if version > FORMAT_VERSION:
+            raise ValueError(f'format version {version} is newer than this reader ({FORMAT_VERSION})')
+        header = json.loads(data[12:12 + header_bytes])
+        arrays = {
+            entry['name']: np.frombuffer(data, dtype=entry['dtype'], count=int(np.prod(entry['shape'])),
+                                         offset=header['data_offset'] + entry['offset']).reshape(entry['shape'])
+            for entry in header['arrays']
+        }
+        return cls(header, arrays)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def encode(self, frame):
+        """Model inputs from raw records (a DataFrame or dict of columns) via the header's recipes"""
+        tables = self.header['encoders']
+        columns = []
+        for name in self.features:
+            recipe = self.header['recipes'][name]
+            raw = np.asarray(frame[recipe['column']])
+            if 'below' in recipe or 'at_least' in recipe:
+                numbers = raw.astype(np.float64)
+                cuts = recipe.get('below') or recipe['at_least']
+                conditions = [numbers < cut for cut in cuts] if 'below' in recipe else [numbers >= cut for cut in cuts]
+                values = np.select(conditions, recipe['categories'][:len(cuts)], recipe['categories'][len(cuts)])
+            elif 'mapping' in recipe:
+                values = np.array([recipe['mapping'].get(value, recipe['default']) for value in raw.tolist()])
+            else:
+                values = raw
+
+            if 'encoder' in recipe:
+                index = {value: code for code, value in enumerate(tables[recipe['encoder']])}
+                unknown = sorted({str(value) for value in values.tolist()} - set(index))
+                if unknown:
+                    raise ValueError(f"{recipe['column']}: unknown value(s) {', '.join(unknown)}")
+                values = [index[str(value)] for value in values.tolist()]
+            columns.append(np.asarray(values, dtype=np.float32))
+        return np.column_stack(columns)
+
+    def bins(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        cuts, offsets = self.arrays['cuts'], self.arrays['cut_offsets']
+        return np.column_stack([
+            np.searchsorted(cuts[offsets[f]:offsets[f + 1]], X[:, f], side='left')
+            for f in range(X.shape[1])
+        ])
+
+    def leaves(self, X):
+        """Leaf index reached in every tree, shape (n_rows, n_trees)"""
+        bins = self.bins(X)
+        feature, node_bin = self.arrays['feature'], self.arrays['bin']
+        left, right = self.arrays['left'].astype(np.int64), self.arrays['right'].astype(np.int64)
+        node = np.repeat(self.arrays['roots'].astype(np.int64)[None, :], bins.shape[0], axis=0)
+        rows = np.arange(bins.shape[0])[:, None]
+        while True:
+            active = node >= 0
+            if not active.any():
+                return ~node
+            at = np.where(active, node, 0)
+            go_left = bins[rows, feature[at]] <= node_bin[at]
+            node = np.where(active, np.where(go_left, left[at], right[at]), node)
+
+    def predict_proba(self, X):
+        values = self.arrays['leaf_values']
+        # Integer sums are exact, so rounding only happens in the final division
+        totals = values[self.leaves(X)].sum(axis=1, dtype=np.int64 if self.scale > 1 else np.float64)
+        return totals / (self.n_trees * self.scale)
+
+    def predict(self, X):
+        return np.asarray(self.classes)[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def check_parity(model, classifier, X, frame=None):
+    """Compare the compact scorer with sklearn on the same rows
+
+    With ``frame`` (the raw records X was built from) the scorer also
+    encodes the inputs itself, so the client-side feature recipes are
+    checked along with the trees.
+    """
+    expected = classifier.predict_proba(X)
+    X = np.asarray(X, dtype=np.float32)
+    report = {'rows': len(X)}
+    if frame is not None:
+        encoded = model.encode(frame)
+        report['feature_mismatches'] = int(np.count_nonzero((encoded != X).any(axis=1)))
+        X = encoded
+    proba = model.predict_proba(X)
+    report['label_mismatches'] = int(np.count_nonzero(
+        np.asarray(model.classes)[proba.argmax(axis=1)] != classifier.classes_[expected.argmax(axis=1)].astype(str)
+    ))
+    report['max_probability_error'] = float(np.abs(proba - expected).max()) if len(X) else 0.0
+    report['exact'] = report['label_mismatches'] == 0 and not report.get('feature_mismatches')
+    return report
+
+
+def pack(header, arrays):
+    """Magic, format version and header length, the JSON header, then 8-byte aligned little-endian arrays"""
+    entries, chunks, offset = [], [], 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        entries.append({'name': name, 'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset})
+        padded = -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        chunks.append(array.tobytes() + b'\0' * (padded - array.nbytes))
+        offset += padded
+    data = b''.join(chunks)
+
+    header = {**header, 'model_version': hashlib.sha256(data).hexdigest()[:12], 'arrays': entries}
+    for _ in range(2):
+        # data_offset is part of the header it locates; settles on the second pass
+        header_bytes = json.dumps(header, separators=(',', ':')).encode()
+        header['data_offset'] = -(-(12 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    prefix = MAGIC + struct.pack('<HxxI', FORMAT_VERSION, len(header_bytes)) + header_bytes
+    return prefix + b'\0' * (header['data_offset'] - len(prefix)) + data
+
+
+def export_compact(classifier, encoders, path, features, X=None, frame=None, value_bits=VALUE_BITS):
+    """Write a fitted forest classifier and its encoders in the compact format
+
+    With ``X`` the leaf values use the narrowest width in ``value_bits``
+    whose predictions match sklearn on those rows, and the parity report
+    is stored in the header; without it the first width is used.
+    Returns the written header.
+    """
+    missing = [name for name in features if name not in FEATURE_RECIPES]
+    if missing:
+        raise ValueError(f"no client recipe for feature(s) {', '.join(missing)}")
+
+    nodes, probabilities = flatten_forest(classifier)
+    header = {
+        'format': 'student-performance-compact-forest',
+        'format_version': FORMAT_VERSION,
+        'created': datetime.now().isoformat(),
+        'model_type': type(classifier).__name__,
+        'n_trees': len(classifier.estimators_),
+        'n_features': int(classifier.n_features_in_),
+        'features': list(features),
+        'classes': [str(c) for c in classifier.classes_],
+        'recipes': {name: FEATURE_RECIPES[name] for name in features},
+        'encoders': {key: [str(c) for c in encoder.classes_] for key, encoder in encoders.items()},
+    }
+
+    for bits in value_bits:
+        leaf_values, scale = _quantize(probabilities, bits)
+        header['values'] = {'bits': bits, 'scale': scale}
+        data = pack(header, {**nodes, 'leaf_values': leaf_values})
+        if X is None:
+            break
+        parity = check_parity(CompactModel.from_bytes(data), classifier, X, frame)
+        if parity['exact']:
+            break
+    if X is not None:
+        header['parity'] = parity
+        data = pack(header, {**nodes, 'leaf_values': leaf_values})
+
+    with open(path, 'wb') as f:
+        f.write(data)
+    header = CompactModel.from_bytes(data).header
+    header['size_bytes'] = len(data)
+    return header
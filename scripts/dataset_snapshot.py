@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_VERSION = 1
+DEFAULT_CACHE_DIR = 'data/cache/snapshots'
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, streamed"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_dir(csv_path, digest, cache_dir=DEFAULT_CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f'{stem}-{digest[:16]}')
+
+
+def _typed_frame(csv_path):
+    """Parse the raw CSV once: text columns as categories, integers downcast"""
+    df = pd.read_csv(csv_path, encoding='utf-8-sig')
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            df[column] = series.astype('category')
+        elif pd.api.types.is_integer_dtype(series):
+            df[column] = pd.to_numeric(series, downcast='integer')
+    return df
+
+
+def _write_columns(df, staging):
+    columns = []
+    for i, column in enumerate(df.columns):
+        series = df[column]
+        filename = f'col{i:03d}.npy'
+        entry = {'name': column, 'file': filename}
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(staging, filename), series.cat.codes.to_numpy())
+            entry['kind'] = 'category'
+            entry['categories'] = [str(c) for c in series.cat.categories]
+        else:
+            np.save(os.path.join(staging, filename), series.to_numpy())
+            entry['kind'] = 'numeric'
+        entry['dtype'] = str(np.load(os.path.join(staging, filename), mmap_mode='r').dtype)
+        columns.append(entry)
+    return columns
+
+
+def build_snapshot(csv_path, target, digest):
+    """Write one .npy file per column plus a manifest; categoricals as codes + categories"""
+    start = time.perf_counter()
+    df = _typed_frame(csv_path)
+
+    staging = f'{target}.tmp-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    try:
+        columns = _write_columns(df, staging)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'source': os.path.abspath(csv_path),
+        'source_sha256': digest,
+        'rows': int(len(df)),
+        'columns': columns,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    print(f" Dataset snapshot built in {time.perf_counter() - start:.2f}s: {target}")
+    return manifest
+
+
+def read_snapshot(target):
+    """Memory-map every column of a snapshot back into a DataFrame"""
+    with open(os.path.join(target, 'manifest.json')) as f:
+        manifest = json.load(f)
+
+    data = {}
+    for entry in manifest['columns']:
+        values = np.load(os.path.join(target, entry['file']), mmap_mode='r')
+        if entry['kind'] == 'category':
+            data[entry['name']] = pd.Categorical.from_codes(values, categories=entry['categories'])
+        else:
+            data[entry['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _remove_stale(csv_path, keep, cache_dir):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(f'{stem}-') and path != keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load_dataset(csv_path, cache_dir=DEFAULT_CACHE_DIR, rebuild=False):
+    """DataFrame for a raw CSV, served from a typed columnar snapshot keyed by its content hash
+
+    The snapshot is rebuilt only when the CSV's contents change (or when
+    ``rebuild`` is set); older snapshots of the same file are removed.
+    """
+    digest = file_digest(csv_path)
+    target = snapshot_dir(csv_path, digest, cache_dir)
+    manifest_path = os.path.join(target, 'manifest.json')
+
+    current = False
+    if not rebuild and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        current = manifest.get('version') == SNAPSHOT_VERSION and manifest.get('source_sha256') == digest
+
+    if current:
+        print(f" Dataset snapshot hit: {target}")
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        build_snapshot(csv_path, target, digest)
+        _remove_stale(csv_path, target, cache_dir)
+
+    df = read_snapshot(target)
+    df.attrs['source_sha256'] = digest
+    return df
@@ -0,0 +1,83 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from student_features import ABSENCE_CATEGORIES, STUDY_TIME_CATEGORIES, derive_columns
+
+REFERENCE_VERSION = 1
+SCORE_EDGES = list(range(0, 105, 5))
+
+# Inputs as /predict sees them: payload key, kind, categories or bin edges
+DRIFT_FEATURES = [
+    ('gender', 'category', ['male', 'female']),
+    ('studyTimePerWeek', 'category', STUDY_TIME_CATEGORIES),
+    ('absences', 'category', ABSENCE_CATEGORIES),
+    ('studentEducation', 'category', ['secondary', 'bachelors', 'masters', 'doctorate']),
+    ('testPrep', 'category', ['prepared', 'not_prepared']),
+    ('attendanceRate', 'numeric', SCORE_EDGES),
+    ('englishAverage', 'numeric', SCORE_EDGES),
+]
+
+
+def _payload_columns(df):
+    """Training rows mapped onto the values the API receives"""
+    if 'risk_level' not in df:
+        df = derive_columns(df.copy())
+    return {
+        'gender': df['Gender'].astype(str).str.lower().to_numpy(),
+        'studyTimePerWeek': np.asarray(df['study_time_category']),
+        'absences': np.asarray(df['absence_category']),
+        'studentEducation': df['education_level'].fillna('secondary').to_numpy(),
+        'testPrep': np.where(df['has_tutoring'] == 1, 'prepared', 'not_prepared'),
+        'attendanceRate': df['Attendance Rate (%)'].to_numpy(dtype=float),
+        # The API averages three skills; training labels use all four
+        'englishAverage': df[['Writing', 'Reading', 'Speaking']].mean(axis=1).to_numpy(dtype=float),
+    }
+
+
+class ReferenceBuilder:
+    """Per-feature training histograms, accumulated over one frame or many chunks"""
+
+    def __init__(self):
+        self.rows = 0
+        self.counts = {}
+        for name, kind, spec in DRIFT_FEATURES:
+            # Categorical features get a trailing bucket for values outside the vocabulary
+            size = len(spec) + 1 if kind == 'category' else len(spec) - 1
+            self.counts[name] = np.zeros(size, dtype=np.int64)
+
+    def update(self, df):
+        columns = _payload_columns(df)
+        for name, kind, spec in DRIFT_FEATURES:
+            values = columns[name]
+            if kind == 'category':
+                codes = pd.Categorical(values, categories=spec).codes.astype(np.int64)
+                codes[codes < 0] = len(spec)
+                self.counts[name] += np.bincount(codes, minlength=len(spec) + 1)
+            else:
+                values = values[~np.isnan(values)]
+                self.counts[name] += np.histogram(np.clip(values, spec[0], spec[-1]), bins=spec)[0]
+        self.rows += len(df)
+        return self
+
+    def to_dict(self, source_sha256=None):
+        features = []
+        for name, kind, spec in DRIFT_FEATURES:
+            entry = {'name': name, 'kind': kind, 'counts': self.counts[name].tolist()}
+            entry['categories' if kind == 'category' else 'edges'] = list(spec)
+            features.append(entry)
+        return {
+            'version': REFERENCE_VERSION,
+            'created': datetime.now().isoformat(),
+            'rows': int(self.rows),
+            'source_sha256': source_sha256,
+            'features': features,
+        }
+
+
+def save_reference(builder, path, source_sha256=None):
+    with open(path, 'w') as f:
+        json.dump(builder.to_dict(source_sha256), f, indent=2)
+    return path
@@ -0,0 +1,269 @@
+import json
+import os
+import re
+import resource
+import shutil
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import accuracy_score, f1_score, mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from chunked_training import DEFAULT_MEMORY_MB, WORKING_SET_FACTOR
+from dataset_snapshot import file_digest
+from student_features import (
+    FEATURES, RAW_COLUMNS, SERVING_FEATURES, derive_columns, encode_features, serving_encoders, serving_features,
+    vocabulary_encoders
+)
+
+PARTITION_COLUMNS = ['Region', 'Degree Program']
+DEFAULT_MIN_ROWS = 100
+MANIFEST_FILE = 'manifest.json'
+
+# The server's tenant bundle layout (flask-backend/api/model_cache.py)
+TENANT_DIR = 'flask-backend/models/tenants'
+MODEL_FILE = 'student-model.pkl'
+ENCODER_FILE = 'encoders.pkl'
+SERVING_ENCODERS = serving_encoders()
+
+# A worker process with pandas and sklearn imported, before it holds any data
+WORKER_BASE_MB = 150
+# sklearn Tree node record plus one value row per node
+NODE_BYTES = 64 + 8 * 3
+
+
+def partition_slug(value):
+    """Directory name for a partition value; the serving side's tenant_slug rule"""
+    return re.sub(r'[^a-z0-9]+', '-', str(value).strip().lower()).strip('-')
+
+
+def default_partition_dir(column):
+    """Where bundles go without --partition-dir; the server reads TENANT_DIR (MODEL_TENANT_DIR)
+
+    Region bundles go straight there, since the server picks a tenant by
+    the payload's region. Other columns get a sibling directory to point
+    MODEL_TENANT_DIR at.
+    """
+    return TENANT_DIR if column == 'Region' else f'{TENANT_DIR}-{partition_slug(column)}'
+
+
+def estimate_partition_mb(n_rows, row_bytes, params):
+    """Working set of one partition fit: its frame copies plus both forests' nodes"""
+    leaves = max(1, 2 * n_rows // max(1, params.get('min_samples_leaf', 1)))
+    nodes = min(2 ** ((params.get('max_depth') or 32) + 1) - 1, 2 * leaves)
+    forests = 2 * params['n_estimators'] * nodes * NODE_BYTES
+    return (n_rows * row_bytes * WORKING_SET_FACTOR + forests) / 1024 ** 2
+
+
+def remove_stale_bundles(out_dir, trained_slugs, slugs):
+    """Delete the bundles of ``slugs`` that this run didn't train, so the server falls back for them
+
+    ``slugs`` are this run's skipped partitions plus every partition of the
+    previous manifest; other directories under ``out_dir`` are left alone.
+    """
+    removed = []
+    for slug in sorted(set(slugs) - set(trained_slugs)):
+        path = os.path.join(out_dir, slug)
+        if slug and os.path.isfile(os.path.join(path, MODEL_FILE)):
+            shutil.rmtree(path)
+            removed.append(slug)
+    return removed
+
+
+def previous_slugs(out_dir):
+    """Partitions named by the manifest an earlier run left in ``out_dir``"""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILE)) as f:
+            return [entry['slug'] for entry in json.load(f).get('partitions', [])]
+    except (OSError, ValueError, KeyError, TypeError):
+        return []
+
+
+def train_partition(value, slug, frame, encoders, out_dir, classifier_params, regressor_params, test_size, seed):
+    """Fit, evaluate and write one partition's bundle; returns its manifest entry
+
+    The bundle is what the server's tenant cache loads: the classifier as
+    ``student-model.pkl``, fitted on the inputs in the order and encoding
+    the server sends them, and the encoders it looks them up with. The
+    regressors are fitted on the training features only for the manifest
+    metrics and are not written.
+
+    Runs in a pool worker, so the models are written from here and only
+    the summary travels back to the parent.
+    """
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    derive_columns(frame)
+    X = encode_features(frame, encoders)
+    X_serving = serving_features(frame, SERVING_ENCODERS)
+    y_cls = frame['risk_level']
+    y_reg = frame['english_avg']
+
+    # Stratify when every risk level present can appear on both sides
+    counts = y_cls.value_counts()
+    stratify = y_cls if counts.min() >= 2 and len(counts) > 1 else None
+    train, test = train_test_split(np.arange(len(frame)), test_size=test_size, random_state=seed, stratify=stratify)
+
+    classifier = RandomForestClassifier(**classifier_params).fit(X_serving[train], y_cls.iloc[train])
+    regressor = RandomForestRegressor(**regressor_params).fit(X.iloc[train], y_reg.iloc[train])
+    linear = LinearRegression().fit(X.iloc[train], y_reg.iloc[train])
+    y_pred = classifier.predict(X_serving[test])
+    metrics = {
+        'accuracy': float(accuracy_score(y_cls.iloc[test], y_pred)),
+        'f1': float(f1_score(y_cls.iloc[test], y_pred, average='weighted')),
+        'r2_rf': float(r2_score(y_reg.iloc[test], regressor.predict(X.iloc[test]))),
+        'mae_rf': float(mean_absolute_error(y_reg.iloc[test], regressor.predict(X.iloc[test]))),
+        'r2_lr': float(r2_score(y_reg.iloc[test], linear.predict(X.iloc[test]))),
+    }
+
+    path = os.path.join(out_dir, slug)
+    os.makedirs(path, exist_ok=True)
+    joblib.dump(classifier, os.path.join(path, MODEL_FILE))
+    joblib.dump(SERVING_ENCODERS, os.path.join(path, ENCODER_FILE))
+
+    return {
+        'value': value,
+        'slug': slug,
+        'status': 'trained',
+        'rows': len(frame),
+        'train_rows': len(train),
+        'test_rows': len(test),
+        'stratified': stratify is not None,
+        'classes': [str(c) for c in classifier.classes_],
+        'distribution': {str(k): int(v) for k, v in counts.items()},
+        'path': path,
+        'fit_seconds': time.perf_counter() - start,
+        'cpu_seconds': time.process_time() - cpu_start,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'metrics': metrics,
+    }
+
+
+def train_partitioned(csv_path, out_dir, column, classifier_params, regressor_params, min_rows=DEFAULT_MIN_ROWS,
+                      test_size=0.2, seed=42, memory_mb=DEFAULT_MEMORY_MB, workers=1):
+    """Train one model bundle per value of ``column`` in a process pool
+
+    Partitions smaller than ``min_rows`` are skipped and recorded in the
+    manifest so serving keeps the global model for them; a bundle an
+    earlier run left for them (or for a partition no longer in the data)
+    is deleted, so the manifest and the served bundles agree. The rest are
+    scheduled largest first; a partition is only submitted while the
+    estimated working sets of those in flight fit under ``memory_mb``, so
+    the pool shrinks itself for big partitions instead of running out of
+    memory. Every model is single-threaded: the pool is the parallelism.
+    """
+    start = time.perf_counter()
+    frame = pd.read_csv(csv_path, usecols=sorted(set(RAW_COLUMNS) | {column}),
+                        dtype={column: 'category'}, encoding='utf-8-sig')
+    row_bytes = frame.memory_usage(deep=True).sum() / max(len(frame), 1)
+    encoders = vocabulary_encoders(frame['Gender'].dropna().astype(str).unique())
+    groups = frame.groupby(column, observed=True).indices
+
+    params = tuple({**p, 'n_jobs': 1} for p in (classifier_params, regressor_params))
+    entries = []
+    queue = []
+    for value, index in groups.items():
+        slug = partition_slug(value)
+        if len(index) < min_rows:
+            entries.append({'value': value, 'slug': slug, 'status': 'skipped', 'rows': len(index),
+                            'reason': f'fewer than {min_rows} rows', 'fallback': 'global'})
+        else:
+            queue.append((value, slug, index, estimate_partition_mb(len(index), row_bytes, params[0])))
+    queue.sort(key=lambda item: -len(item[2]))
+
+    if queue:
+        workers = max(1, min(workers, len(queue), int(memory_mb // (WORKER_BASE_MB + queue[0][3]))))
+    budget_mb = memory_mb - WORKER_BASE_MB * workers
+
+    print(f"\n Partitioned training by {column}: {len(frame):,} rows in {len(groups)} partition(s)")
+    print(f" {len(queue)} to train, {len(groups) - len(queue)} below {min_rows} rows fall back to the global model")
+    print(f" {workers} worker(s), {memory_mb:,.0f} MB memory cap")
+
+    os.makedirs(out_dir, exist_ok=True)
+    in_flight = {}
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def record(entry):
+        entries.append(entry)
+        m = entry['metrics']
+        print(f"   {entry['value']}: {entry['rows']:,} rows, accuracy {m['accuracy']:.4f}, "
+              f"r2 {m['r2_rf']:.4f}, {entry['fit_seconds']:.1f}s")
+
+    def drain(return_when):
+        done, _ = wait(in_flight, return_when=return_when)
+        for future in done:
+            in_flight.pop(future)
+            record(future.result())
+
+    try:
+        for value, slug, index, estimate_mb in queue:
+            while in_flight and (len(in_flight) >= workers or sum(in_flight.values()) + estimate_mb > budget_mb):
+                drain(FIRST_COMPLETED)
+            # The partition's copy is made only once it can be handed over
+            args = (value, slug, frame.iloc[index].reset_index(drop=True), encoders, out_dir,
+                    *params, test_size, seed)
+            if pool is None:
+                record(train_partition(*args))
+            else:
+                in_flight[pool.submit(train_partition, *args)] = estimate_mb
+        if in_flight:
+            drain(ALL_COMPLETED)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    entries.sort(key=lambda entry: str(entry['value']))
+    trained = [entry for entry in entries if entry['status'] == 'trained']
+    removed = remove_stale_bundles(out_dir, [entry['slug'] for entry in trained],
+                                   [entry['slug'] for entry in entries] + previous_slugs(out_dir))
+    wall_seconds = time.perf_counter() - start
+    cpu_seconds = sum(entry['cpu_seconds'] for entry in trained)
+    for entry in entries:
+        entry['value'] = str(entry['value'])
+
+    manifest = {
+        'trained_date': datetime.now().isoformat(),
+        'mode': 'partitioned',
+        'source': os.path.abspath(csv_path),
+        'source_sha256': file_digest(csv_path),
+        'partition_by': column,
+        'min_rows': min_rows,
+        'rows': len(frame),
+        'features': SERVING_FEATURES,
+        'regressor_features': FEATURES,
+        'classifier_params': params[0],
+        'regressor_params': params[1],
+        'workers': workers,
+        'memory_cap_mb': memory_mb,
+        'max_worker_rss_mb': max((entry['peak_rss_mb'] for entry in trained), default=None),
+        'wall_seconds': wall_seconds,
+        'cpu_seconds': cpu_seconds,
+        # Fitting CPU time per wall-clock second: how much of the pool was actually used
+        'parallelism': cpu_seconds / wall_seconds if wall_seconds else None,
+        'trained': len(trained),
+        'skipped': len(entries) - len(trained),
+        'removed_bundles': removed,
+        'partitions': entries,
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if trained:
+        accuracies = np.array([entry['metrics']['accuracy'] for entry in trained])
+        print(f"\n {len(trained)} bundle(s) in {wall_seconds:.1f}s wall, {cpu_seconds:.1f}s fitting CPU "
+              f"({manifest['parallelism']:.2f}x parallelism)")
+        print(f" Accuracy across partitions: min {accuracies.min():.4f}, "
+              f"mean {accuracies.mean():.4f}, max {accuracies.max():.4f}")
+    if removed:
+        print(f" Removed {len(removed)} bundle(s) left by an earlier run for partitions not trained now: "
+              f"{', '.join(removed)}")
+    print(f" Bundles and {MANIFEST_FILE} written to {out_dir}/")
+    print(f" Serve them with MODEL_TENANT_DIR={os.path.relpath(os.path.abspath(out_dir), 'flask-backend')} "
+          f"(relative to flask-backend/)")
+    return manifest
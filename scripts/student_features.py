@@ -0,0 +1,147 @@
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+ENGLISH_SCORES = ['Speaking', 'Reading', 'Writing', 'Listening']
+
+RAW_COLUMNS = ['Gender', 'Attendance Rate (%)', 'Degree Program', 'Test Prep', 'Studying Hours'] + ENGLISH_SCORES
+
+DEGREE_MAPPING = {
+    'Junior High School': 'secondary',
+    'Senior High School': 'secondary',
+    'Bachelors': 'bachelors',
+    'Masters': 'masters',
+    'Doctorate': 'doctorate',
+    'Others': 'secondary'
+}
+
+STUDY_TIME_CATEGORIES = ['less_than_2', '2_to_5', '5_to_10', 'more_than_10']
+ABSENCE_CATEGORIES = ['none', '1_to_5', '6_to_10', 'more_than_10']
+
+# Upper bounds (exclusive) of the first three study time buckets, in hours
+STUDY_HOUR_CUTS = [2, 5, 10]
+# Lower bounds (inclusive) of the first three absence buckets, as attendance %
+ATTENDANCE_CUTS = [90, 70, 50]
+TEST_PREP_MAPPING = {'Prepared': 1, 'Not Prepared': 0}
+
+FEATURES = [
+    'study_time_encoded',
+    'absence_encoded',
+    'education_encoded',
+    'Gender_encoded',
+    'Attendance Rate (%)',
+    'has_tutoring',
+]
+
+# The inputs flask_app.prepare_ml_features sends, in its order; the last
+# three are always 0 there
+SERVING_FEATURES = [
+    'gender',
+    'study_time',
+    'attendance',
+    'education',
+    'Attendance Rate (%)',
+    'english_avg',
+    'has_tutoring',
+    'region',
+    'lunch',
+]
+# The server's english_avg has no listening score
+SERVING_SCORES = ['Writing', 'Reading', 'Speaking']
+
+FEATURE_NAMES = [
+    'Study Time',
+    'Absences',
+    'Education Level',
+    'Gender',
+    'Attendance Rate',
+    'Tutoring',
+]
+
+
+def derive_columns(df):
+    """Add the label and category columns training reads, in place
+
+    Missing values fall through to the last bucket of each scale, the same
+    way the original per-row comparisons did.
+    """
+    df['english_avg'] = df[ENGLISH_SCORES].mean(axis=1)
+    english_avg = df['english_avg'].to_numpy()
+    df['risk_level'] = np.select(
+        [english_avg >= 80, english_avg >= 60], ['high_achiever', 'satisfactory'], 'at_risk'
+    )
+
+    df['education_level'] = df['Degree Program'].astype(object).map(DEGREE_MAPPING)
+
+    hours = df['Studying Hours'].to_numpy(dtype=float)
+    df['study_time_category'] = np.select(
+        [hours < cut for cut in STUDY_HOUR_CUTS], STUDY_TIME_CATEGORIES[:3], STUDY_TIME_CATEGORIES[3]
+    )
+
+    attendance = df['Attendance Rate (%)'].to_numpy(dtype=float)
+    df['absence_category'] = np.select(
+        [attendance >= cut for cut in ATTENDANCE_CUTS], ABSENCE_CATEGORIES[:3], ABSENCE_CATEGORIES[3]
+    )
+
+    df['has_tutoring'] = df['Test Prep'].map(TEST_PREP_MAPPING).astype(float).fillna(0)
+    return df
+
+
+def vocabulary_encoders(genders):
+    """Encoders fitted on each column's full vocabulary rather than on one frame
+
+    LabelEncoder sorts its classes, so these match encoders fitted on any
+    frame that contains every value.
+    """
+    encoders = {}
+    for key, values in (
+        ('Gender', genders),
+        ('education', set(DEGREE_MAPPING.values())),
+        ('study_time', STUDY_TIME_CATEGORIES),
+        ('absence', ABSENCE_CATEGORIES),
+    ):
+        encoders[key] = LabelEncoder().fit(sorted(values))
+    return encoders
+
+
+def encode_features(df, encoders):
+    """Model inputs for a derived frame using already-fitted encoders"""
+    df['Gender_encoded'] = encoders['Gender'].transform(df['Gender'].astype(str))
+    df['education_encoded'] = encoders['education'].transform(df['education_level'].fillna('secondary'))
+    df['study_time_encoded'] = encoders['study_time'].transform(df['study_time_category'])
+    df['absence_encoded'] = encoders['absence'].transform(df['absence_category'])
+    return df[FEATURES]
+
+
+def serving_encoders():
+    """Encoders keyed and labelled like the server's payloads, so its lookups hit
+
+    The server encodes with ``encoder.classes_`` when the key and the
+    lowercase payload value are found, which makes these indices the ones
+    it sends.
+    """
+    encoders = {}
+    for key, values in (
+        ('gender', ['female', 'male']),
+        ('study_time', STUDY_TIME_CATEGORIES),
+        ('attendance', ABSENCE_CATEGORIES),
+        ('education', set(DEGREE_MAPPING.values())),
+    ):
+        encoders[key] = LabelEncoder().fit(sorted(values))
+    return encoders
+
+
+def serving_features(df, encoders):
+    """Model inputs for a derived frame in the order and encoding the server sends, as float32"""
+    constant = np.zeros(len(df))
+    columns = [
+        encoders['gender'].transform(df['Gender'].astype(str).str.lower()),
+        encoders['study_time'].transform(df['study_time_category']),
+        encoders['attendance'].transform(df['absence_category']),
+        encoders['education'].transform(df['education_level'].fillna('secondary')),
+        df['Attendance Rate (%)'].clip(0, 100).to_numpy(dtype=float),
+        df[SERVING_SCORES].clip(0, 100).mean(axis=1).to_numpy(dtype=float),
+        constant,
+        constant,
+        constant,
+    ]
+    return np.column_stack(columns).astype(np.float32)
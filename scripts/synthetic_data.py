@@ -0,0 +1,197 @@
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+DATA_PATH = 'data/raw/PhilipineStudentsPerformance_with_StudyingHours.csv'
+
+ID_COLUMN = 'Student ID'
+CATEGORICAL_COLUMNS = ['Gender', 'Region', 'Degree Program', 'Lunch Type', 'Test Prep']
+NUMERIC_COLUMNS = [
+    'Attendance Rate (%)', 'Speaking', 'Reading', 'Writing', 'Listening', 'Studying Hours'
+]
+
+QUANTILE_KNOTS = 1001
+
+
+def fit_generator(df, seed=0):
+    """Fit a Gaussian copula to the dataset's columns
+
+    Numeric columns keep their empirical marginals (as quantile knots);
+    each categorical column is laid out as consecutive probability bins
+    on its latent axis. The copula correlation captures the dependence
+    between every pair of columns, categorical ones included.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = len(df)
+    columns = [column for column in df.columns if column != ID_COLUMN]
+    latent = np.empty((n_rows, len(columns)))
+    model = {'columns': columns, 'marginals': []}
+
+    for j, column in enumerate(columns):
+        values = df[column]
+        if column in CATEGORICAL_COLUMNS:
+            counts = values.astype(str).value_counts()
+            categories = counts.index.tolist()
+            probabilities = (counts / counts.sum()).to_numpy()
+            upper = np.cumsum(probabilities)
+            lower = upper - probabilities
+
+            # Spread each row uniformly inside its category's bin before
+            # mapping to normal scores, so ties don't collapse the correlation.
+            index = pd.Categorical(values.astype(str), categories=categories).codes
+            u = lower[index] + rng.random(n_rows) * probabilities[index]
+            model['marginals'].append({
+                'kind': 'category',
+                'categories': categories,
+                'cumulative': upper.tolist(),
+            })
+        else:
+            ranks = values.rank(method='average').to_numpy()
+            u = (ranks - 0.5) / n_rows
+            numeric = values.to_numpy(dtype=float)
+            model['marginals'].append({
+                'kind': 'numeric',
+                'quantiles': np.quantile(numeric, np.linspace(0, 1, QUANTILE_KNOTS)).tolist(),
+                'integer': bool(np.all(numeric == np.round(numeric))),
+            })
+        latent[:, j] = ndtri(np.clip(u, 1e-9, 1 - 1e-9))
+
+    correlation = np.corrcoef(latent, rowvar=False)
+    # Nudge to positive definite so the Cholesky factor always exists.
+    correlation += np.eye(len(correlation)) * 1e-9
+    model['cholesky'] = np.linalg.cholesky(correlation)
+    return model
+
+
+def sample_frame(model, n_rows, rng, id_offset=0):
+    """Draw n_rows synthetic students from a fitted copula"""
+    cholesky = model['cholesky']
+    z = rng.standard_normal((n_rows, cholesky.shape[0])) @ cholesky.T
+    u = ndtr(z)
+
+    data = {ID_COLUMN: [f'SY{i:09d}' for i in range(id_offset, id_offset + n_rows)]}
+    knots = np.linspace(0, 1, QUANTILE_KNOTS)
+    for j, (column, marginal) in enumerate(zip(model['columns'], model['marginals'])):
+        if marginal['kind'] == 'category':
+            codes = np.searchsorted(marginal['cumulative'], u[:, j], side='right')
+            codes = np.minimum(codes, len(marginal['categories']) - 1)
+            data[column] = pd.Categorical.from_codes(codes, categories=marginal['categories'])
+        else:
+            values = np.interp(u[:, j], knots, marginal['quantiles'])
+            data[column] = np.round(values).astype(np.int32) if marginal['integer'] else values
+    return pd.DataFrame(data)
+
+
+def chunk_rng(seed, chunk_index):
+    """Independent stream per chunk, so output doesn't depend on the worker count"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+
+
+def generate_frame(n_rows, seed=42, source=DATA_PATH):
+    """In-memory synthetic dataset for benchmarks and tests of scale"""
+    model = fit_generator(pd.read_csv(source, encoding='utf-8-sig'), seed=seed)
+    return sample_frame(model, n_rows, chunk_rng(seed, 0))
+
+
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+def _write_chunk(task):
+    chunk_index, n_rows, id_offset, seed, path = task
+    frame = sample_frame(_worker_model, n_rows, chunk_rng(seed, chunk_index), id_offset)
+    frame.to_csv(path, index=False, header=(chunk_index == 0))
+    return path
+
+
+def generate_csv(out_path, n_rows, seed=42, chunk_rows=250_000, workers=None, source=DATA_PATH):
+    """Write n_rows synthetic students to one CSV, chunked across worker processes
+
+    Each worker holds a single chunk at a time and parts are concatenated
+    by streaming, so memory stays flat whatever n_rows is.
+    """
+    start = time.perf_counter()
+    model = fit_generator(pd.read_csv(source, encoding='utf-8-sig'), seed=seed)
+
+    parts_dir = f'{out_path}.parts'
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+
+    tasks = []
+    for chunk_index, offset in enumerate(range(0, n_rows, chunk_rows)):
+        size = min(chunk_rows, n_rows - offset)
+        tasks.append((chunk_index, size, offset, seed, os.path.join(parts_dir, f'part-{chunk_index:05d}.csv')))
+
+    workers = workers or os.cpu_count() or 1
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model,)) as pool:
+            with open(out_path, 'wb') as out:
+                # map() yields in submission order, so parts are appended
+                # as soon as each one (and all before it) is ready.
+                for path in pool.map(_write_chunk, tasks):
+                    with open(path, 'rb') as part:
+                        shutil.copyfileobj(part, out, 1 << 20)
+                    os.remove(path)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    print(f" {n_rows:,} synthetic students written to {out_path} in {elapsed:.1f}s "
+          f"({n_rows / elapsed:,.0f} rows/s, {len(tasks)} chunks, {workers} workers)")
+    return out_path
+
+
+def compare(source_df, synthetic_df):
+    """Marginal and correlation drift between the real and synthetic datasets"""
+    print("\n Numeric marginals (real vs synthetic mean / std):")
+    for column in NUMERIC_COLUMNS:
+        real, fake = source_df[column], synthetic_df[column]
+        print(f"   {column}: {real.mean():.2f}/{real.std():.2f} vs {fake.mean():.2f}/{fake.std():.2f}")
+
+    encoded_real = pd.DataFrame({c: source_df[c] for c in NUMERIC_COLUMNS})
+    encoded_fake = pd.DataFrame({c: synthetic_df[c] for c in NUMERIC_COLUMNS})
+    for column in CATEGORICAL_COLUMNS:
+        categories = sorted(source_df[column].astype(str).unique())
+        encoded_real[column] = pd.Categorical(source_df[column].astype(str), categories=categories).codes
+        encoded_fake[column] = pd.Categorical(synthetic_df[column].astype(str), categories=categories).codes
+
+    difference = (encoded_real.corr(method='spearman') - encoded_fake.corr(method='spearman')).abs()
+    print(f"\n Max |Spearman correlation difference|: {difference.to_numpy().max():.3f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic students matching the raw dataset')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--out', default='data/synthetic/students.csv')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=250_000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--source', default=DATA_PATH)
+    parser.add_argument('--compare', action='store_true',
+                        help='print marginal and correlation drift against the source')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    generate_csv(args.out, args.rows, seed=args.seed, chunk_rows=args.chunk_rows,
+                 workers=args.workers, source=args.source)
+    if args.compare:
+        source_df = pd.read_csv(args.source, encoding='utf-8-sig')
+        sample = pd.read_csv(args.out, nrows=min(args.rows, 200_000))
+        compare(source_df, sample)
+
+
+if __name__ == '__main__':
+    main()
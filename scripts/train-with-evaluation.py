@@ -17,10 +17,45 @@ from sklearn.metrics import (
     f1_score
 )
 import joblib
+import argparse
 import json
 from datetime import datetime
 import os
 
+from artifact_cache import DEFAULT_ARTIFACT_DIR, DEFAULT_MAX_BYTES, ArtifactCache
+from compact_model import export_compact
+from chunked_training import DEFAULT_EVAL_ROWS, DEFAULT_MEMORY_MB, train_chunked
+from dataset_snapshot import load_dataset
+from partitioned_training import DEFAULT_MIN_ROWS, PARTITION_COLUMNS, default_partition_dir, train_partitioned
+from drift_reference import ReferenceBuilder, save_reference
+from student_features import FEATURE_NAMES, FEATURES, derive_columns
+
+DATA_PATH = 'data/raw/PhilipineStudentsPerformance_with_StudyingHours.csv'
+COMPACT_MODEL_PATH = 'assets/models/student-model.compact.bin'
+
+SPLIT_PARAMS = {'test_size': 0.2, 'random_state': 42}
+
+CLASSIFIER_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'random_state': 42,
+    'class_weight': 'balanced',
+    'n_jobs': -1
+}
+
+REGRESSOR_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'random_state': 42,
+    'n_jobs': -1
+}
+
+CV_PARAMS = {'n_splits': 5, 'random_state': 42}
+
 print(" ADVANCED ML TRAINING WITH PROPER EVALUATION")
 print("=" * 60)
 
@@ -39,148 +74,259 @@ def convert_numpy_types(obj):
     else:
         return obj
 
-def main():
-    os.makedirs('assets/models', exist_ok=True)
-    
-    try:
+def engineer_features(df):
+    """Derive risk labels and encoded model inputs from the raw dataset"""
+    derive_columns(df)
 
-        print("\n Loading Philippine student data...")
-        df = pd.read_csv('data/raw/PhilipineStudentsPerformance_with_StudyingHours.csv')
-        print(f" {len(df)} student records loaded")
+    encoders = {}
 
-        english_scores = ['Speaking', 'Reading', 'Writing', 'Listening']
-        df['english_avg'] = df[english_scores].mean(axis=1)
+    le_gender = LabelEncoder()
+    df['Gender_encoded'] = le_gender.fit_transform(df['Gender'])
+    encoders['Gender'] = le_gender
 
-        def categorize_performance(score):
-            if score >= 80:
-                return 'high_achiever'
-            elif score >= 60:
-                return 'satisfactory'
-            else:
-                return 'at_risk'
-        
-        df['risk_level'] = df['english_avg'].apply(categorize_performance)
-        
-        print(" Performance distribution:")
-        for level, count in df['risk_level'].value_counts().items():
-            percentage = (count / len(df)) * 100
-            print(f"   {level}: {count} students ({percentage:.1f}%)")
+    le_education = LabelEncoder()
+    df['education_encoded'] = le_education.fit_transform(df['education_level'].fillna('secondary'))
+    encoders['education'] = le_education
 
-        print("\n Feature engineering...")
+    le_study = LabelEncoder()
+    df['study_time_encoded'] = le_study.fit_transform(df['study_time_category'])
+    encoders['study_time'] = le_study
 
-        encoders = {}
+    le_absence = LabelEncoder()
+    df['absence_encoded'] = le_absence.fit_transform(df['absence_category'])
+    encoders['absence'] = le_absence
 
-        le_gender = LabelEncoder()
-        df['Gender_encoded'] = le_gender.fit_transform(df['Gender'])
-        encoders['Gender'] = le_gender
+    features = list(FEATURES)
+    feature_names = list(FEATURE_NAMES)
 
-        degree_mapping = {
-            'Junior High School': 'secondary',
-            'Senior High School': 'secondary', 
-            'Bachelors': 'bachelors',
-            'Masters': 'masters',
-            'Doctorate': 'doctorate',
-            'Others': 'secondary'
-        }
-        df['education_level'] = df['Degree Program'].map(degree_mapping)
-        le_education = LabelEncoder()
-        df['education_encoded'] = le_education.fit_transform(df['education_level'].fillna('secondary'))
-        encoders['education'] = le_education
-
-        def categorize_study_hours(hours):
-            if hours < 2:
-                return 'less_than_2'
-            elif hours < 5:
-                return '2_to_5'
-            elif hours < 10:
-                return '5_to_10'
-            else:
-                return 'more_than_10'
-        
-        df['study_time_category'] = df['Studying Hours'].apply(categorize_study_hours)
-        le_study = LabelEncoder()
-        df['study_time_encoded'] = le_study.fit_transform(df['study_time_category'])
-        encoders['study_time'] = le_study
-
-        def categorize_attendance(attendance):
-            if attendance >= 90:
-                return 'none'
-            elif attendance >= 70:
-                return '1_to_5'
-            elif attendance >= 50:
-                return '6_to_10'
-            else:
-                return 'more_than_10'
-        
-        df['absence_category'] = df['Attendance Rate (%)'].apply(categorize_attendance)
-        le_absence = LabelEncoder()
-        df['absence_encoded'] = le_absence.fit_transform(df['absence_category'])
-        encoders['absence'] = le_absence
+    X = df[features]
+    y_classification = df['risk_level']
+    y_regression = df['english_avg']
 
-        df['has_tutoring'] = df['Test Prep'].map({'Prepared': 1, 'Not Prepared': 0}).fillna(0)
 
+    return {
+        'X': X,
+        'y_classification': y_classification,
+        'y_regression': y_regression,
+        'encoders': encoders,
+        'features': features,
+        'feature_names': feature_names,
+        'dataset': {
+            'size': int(len(df)),
+            'performance_distribution': df['risk_level'].value_counts().to_dict(),
+            'avg_english_score': float(df['english_avg'].mean()),
+            'std_english_score': float(df['english_avg'].std())
+        }
+    }
+
+def split_dataset(X, y_classification, y_regression, test_size, random_state):
+    """Stratified train/test split of inputs and both targets"""
+    X_train, X_test, y_train_cls, y_test_cls, y_train_reg, y_test_reg = train_test_split(
+        X, y_classification, y_regression, test_size=test_size, random_state=random_state, stratify=y_classification
+    )
+    return {
+        'X_train': X_train,
+        'X_test': X_test,
+        'y_train_cls': y_train_cls,
+        'y_test_cls': y_test_cls,
+        'y_train_reg': y_train_reg,
+        'y_test_reg': y_test_reg
+    }
+
+def fit_models(X_train, y_train_cls, y_train_reg, classifier_params, regressor_params):
+    """Fit the classifier, forest regressor and linear regression"""
+    print("\n 1. Training Random Forest Classifier...")
+    rf_clf = RandomForestClassifier(**classifier_params)
+    rf_clf.fit(X_train, y_train_cls)
+
+    print(" 2. Training Random Forest Regressor...")
+    rf_reg = RandomForestRegressor(**regressor_params)
+    rf_reg.fit(X_train, y_train_reg)
+
+    print(" 3. Training Linear Regression...")
+    lr = LinearRegression()
+    lr.fit(X_train, y_train_reg)
+
+    return {
+        'random_forest_classifier': rf_clf,
+        'random_forest_regressor': rf_reg,
+        'linear_regression': lr
+    }
+
+def evaluate_models(models, X_test, y_test_cls, y_test_reg, X, y_classification, y_regression, n_splits, random_state):
+    """Hold-out metrics and k-fold cross-validation scores for all three models"""
+    rf_clf = models['random_forest_classifier']
+    rf_reg = models['random_forest_regressor']
+    lr = models['linear_regression']
+
+    y_pred_cls = rf_clf.predict(X_test)
+    y_pred_proba = rf_clf.predict_proba(X_test)
+
+    y_pred_reg_rf = rf_reg.predict(X_test)
+    mse_rf = mean_squared_error(y_test_reg, y_pred_reg_rf)
+
+    y_pred_reg_lr = lr.predict(X_test)
+    mse_lr = mean_squared_error(y_test_reg, y_pred_reg_lr)
+
+    print(f" Running {n_splits}-fold cross validation...")
+    kfold = KFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+
+    return {
+        'y_pred_cls': y_pred_cls,
+        'y_pred_proba': y_pred_proba,
+        'accuracy': accuracy_score(y_test_cls, y_pred_cls),
+        'precision': precision_score(y_test_cls, y_pred_cls, average='weighted'),
+        'recall': recall_score(y_test_cls, y_pred_cls, average='weighted'),
+        'f1': f1_score(y_test_cls, y_pred_cls, average='weighted'),
+        'y_pred_reg_rf': y_pred_reg_rf,
+        'r2_rf': r2_score(y_test_reg, y_pred_reg_rf),
+        'mse_rf': mse_rf,
+        'rmse_rf': np.sqrt(mse_rf),
+        'mae_rf': mean_absolute_error(y_test_reg, y_pred_reg_rf),
+        'explained_variance_rf': explained_variance_score(y_test_reg, y_pred_reg_rf),
+        'y_pred_reg_lr': y_pred_reg_lr,
+        'r2_lr': r2_score(y_test_reg, y_pred_reg_lr),
+        'mse_lr': mse_lr,
+        'rmse_lr': np.sqrt(mse_lr),
+        'mae_lr': mean_absolute_error(y_test_reg, y_pred_reg_lr),
+        'explained_variance_lr': explained_variance_score(y_test_reg, y_pred_reg_lr),
+        'cv_scores_clf': cross_val_score(rf_clf, X, y_classification, cv=kfold, scoring='accuracy'),
+        'cv_scores_reg_rf': cross_val_score(rf_reg, X, y_regression, cv=kfold, scoring='r2'),
+        'cv_scores_reg_lr': cross_val_score(lr, X, y_regression, cv=kfold, scoring='r2')
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Train and evaluate the student performance models')
+    parser.add_argument('--data', default=DATA_PATH,
+                        help='training CSV, e.g. one written by scripts/synthetic_data.py')
+    parser.add_argument('--force', action='store_true',
+                        help='recompute every pipeline stage and overwrite cached artifacts')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='run without reading or writing the artifact cache')
+    parser.add_argument('--cache-dir', default=DEFAULT_ARTIFACT_DIR,
+                        help='artifact cache directory')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2,
+                        help='evict least recently used artifacts above this size')
+    parser.add_argument('--chunked', action='store_true',
+                        help='stream the CSV in chunks and merge per-chunk forest shards (out-of-core)')
+    parser.add_argument('--memory-mb', type=float, default=DEFAULT_MEMORY_MB,
+                        help='memory cap used to size chunks in --chunked mode and to limit '
+                             'concurrent partitions in --partition-by mode')
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help='rows per chunk in --chunked mode, overriding --memory-mb sizing')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes growing shards in parallel in --chunked mode (default 1), '
+                             'or training partitions in --partition-by mode (default: one per core)')
+    parser.add_argument('--eval-rows', type=int, default=DEFAULT_EVAL_ROWS,
+                        help='held-out rows kept for evaluation in --chunked mode')
+    parser.add_argument('--baseline', action='store_true',
+                        help='also fit in memory on the same split and compare (--chunked mode)')
+    parser.add_argument('--partition-by', choices=PARTITION_COLUMNS, default=None,
+                        help='train one bundle per value of this column instead of the global models')
+    parser.add_argument('--min-partition-rows', type=int, default=DEFAULT_MIN_ROWS,
+                        help='partitions with fewer rows are skipped and fall back to the global model')
+    parser.add_argument('--partition-dir', default=None,
+                        help='output directory in --partition-by mode '
+                             '(default flask-backend/models/tenants, the server\'s MODEL_TENANT_DIR, for Region; '
+                             'flask-backend/models/tenants-<column> otherwise)')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs('assets/models', exist_ok=True)
 
+    if args.partition_by:
+        train_partitioned(
+            args.data,
+            args.partition_dir or default_partition_dir(args.partition_by),
+            args.partition_by, CLASSIFIER_PARAMS, REGRESSOR_PARAMS, min_rows=args.min_partition_rows,
+            test_size=SPLIT_PARAMS['test_size'], seed=SPLIT_PARAMS['random_state'],
+            memory_mb=args.memory_mb, workers=args.workers or os.cpu_count()
+        )
+        return
+
+    if args.chunked:
+        train_chunked(
+            args.data, 'assets/models', CLASSIFIER_PARAMS, REGRESSOR_PARAMS,
+            test_size=SPLIT_PARAMS['test_size'], seed=SPLIT_PARAMS['random_state'],
+            memory_mb=args.memory_mb, workers=args.workers or 1, chunk_rows=args.chunk_rows,
+            eval_rows=args.eval_rows, baseline=args.baseline
+        )
+        return
+
+    cache = ArtifactCache(
+        args.cache_dir,
+        max_bytes=args.cache_max_mb * 1024 ** 2,
+        force=args.force,
+        enabled=not args.no_cache
+    )
+    
+    try:
 
+        print(f"\n Loading Philippine student data from {args.data}...")
+        df = load_dataset(args.data)
+        print(f" {len(df)} student records loaded")
 
-        features = [
-            'study_time_encoded',
-            'absence_encoded', 
-            'education_encoded',
-            'Gender_encoded',
-            'Attendance Rate (%)', 
-            'has_tutoring',
+        print("\n Feature engineering...")
+        engineered, features_key = cache.run(
+            'features', engineer_features,
+            # derive_columns lives in its own module, so its source is keyed explicitly
+            inputs=[df.attrs['source_sha256'], cache.key('derive', derive_columns)], args=(df,)
+        )
+        X = engineered['X']
+        y_classification = engineered['y_classification']
+        y_regression = engineered['y_regression']
+        encoders = engineered['encoders']
+        features = engineered['features']
+        feature_names = engineered['feature_names']
+        dataset = engineered['dataset']
 
-        ]
-        
-        feature_names = [
-            'Study Time',
-            'Absences',
-            'Education Level',
-            'Gender',
-            'Attendance Rate',
-            'Tutoring',
-
-        ]
-        
-        X = df[features]
-        y_classification = df['risk_level']
-        y_regression = df['english_avg']
+        print(" Performance distribution:")
+        for level, count in sorted(dataset['performance_distribution'].items(), key=lambda item: -item[1]):
+            percentage = (count / dataset['size']) * 100
+            print(f"   {level}: {count} students ({percentage:.1f}%)")
 
-        X_train, X_test, y_train_cls, y_test_cls, y_train_reg, y_test_reg = train_test_split(
-            X, y_classification, y_regression, test_size=0.2, random_state=42, stratify=y_classification
+        split, split_key = cache.run(
+            'split', split_dataset,
+            inputs=[features_key], params=SPLIT_PARAMS,
+            args=(X, y_classification, y_regression)
         )
+        X_train, X_test = split['X_train'], split['X_test']
+        y_train_cls, y_test_cls = split['y_train_cls'], split['y_test_cls']
+        y_train_reg, y_test_reg = split['y_train_reg'], split['y_test_reg']
         
         print(f"\n Training with {len(features)} features")
         print(f" Train/Test split: {len(X_train)}/{len(X_test)} students")
 
-        print("\n 1. Training Random Forest Classifier...")
-        rf_clf = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=42,
-            class_weight='balanced',
-            n_jobs=-1
+        models, fit_key = cache.run(
+            'fit', fit_models,
+            inputs=[split_key],
+            params={'classifier_params': CLASSIFIER_PARAMS, 'regressor_params': REGRESSOR_PARAMS},
+            args=(X_train, y_train_cls, y_train_reg)
         )
-        
-        rf_clf.fit(X_train, y_train_cls)
-
-        print(" 2. Training Random Forest Regressor...")
-        rf_reg = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=42,
-            n_jobs=-1
+        rf_clf = models['random_forest_classifier']
+        rf_reg = models['random_forest_regressor']
+        lr = models['linear_regression']
+
+        evaluation, _ = cache.run(
+            'evaluate', evaluate_models,
+            inputs=[fit_key, split_key, features_key], params=CV_PARAMS,
+            args=(models, X_test, y_test_cls, y_test_reg, X, y_classification, y_regression)
         )
-        
-        rf_reg.fit(X_train, y_train_reg)
-
-        print(" 3. Training Linear Regression...")
-        lr = LinearRegression()
-        lr.fit(X_train, y_train_reg)
+        y_pred_cls = evaluation['y_pred_cls']
+        accuracy = evaluation['accuracy']
+        precision = evaluation['precision']
+        recall = evaluation['recall']
+        f1 = evaluation['f1']
+        y_pred_reg_rf = evaluation['y_pred_reg_rf']
+        r2_rf, mse_rf, rmse_rf = evaluation['r2_rf'], evaluation['mse_rf'], evaluation['rmse_rf']
+        mae_rf, explained_variance_rf = evaluation['mae_rf'], evaluation['explained_variance_rf']
+        y_pred_reg_lr = evaluation['y_pred_reg_lr']
+        r2_lr, mse_lr, rmse_lr = evaluation['r2_lr'], evaluation['mse_lr'], evaluation['rmse_lr']
+        mae_lr, explained_variance_lr = evaluation['mae_lr'], evaluation['explained_variance_lr']
+        cv_scores_clf = evaluation['cv_scores_clf']
+        cv_scores_reg_rf = evaluation['cv_scores_reg_rf']
+        cv_scores_reg_lr = evaluation['cv_scores_reg_lr']
         
         print("\n" + "=" * 60)
         print(" ADVANCED MODEL EVALUATION METRICS")
@@ -189,14 +335,6 @@ def main():
         print("\n RANDOM FOREST CLASSIFIER EVALUATION")
         print("-" * 40)
         
-        y_pred_cls = rf_clf.predict(X_test)
-        y_pred_proba = rf_clf.predict_proba(X_test)
-
-        accuracy = accuracy_score(y_test_cls, y_pred_cls)
-        precision = precision_score(y_test_cls, y_pred_cls, average='weighted')
-        recall = recall_score(y_test_cls, y_pred_cls, average='weighted')
-        f1 = f1_score(y_test_cls, y_pred_cls, average='weighted')
-        
         print(f"Accuracy: {accuracy:.4f}")
         print(f"Precision: {precision:.4f}")
         print(f"Recall: {recall:.4f}")
@@ -212,15 +350,6 @@ def main():
         print("\n RANDOM FOREST REGRESSOR EVALUATION")
         print("-" * 40)
         
-        y_pred_reg_rf = rf_reg.predict(X_test)
-
-        r2_rf = r2_score(y_test_reg, y_pred_reg_rf)
-        mse_rf = mean_squared_error(y_test_reg, y_pred_reg_rf)
-        rmse_rf = np.sqrt(mse_rf)
-
-        mae_rf = mean_absolute_error(y_test_reg, y_pred_reg_rf)
-        explained_variance_rf = explained_variance_score(y_test_reg, y_pred_reg_rf)
-        
         print(f"R-squared (R²): {r2_rf:.4f}")
         print(f"Root Mean Square Error (RMSE): {rmse_rf:.4f}")
         print(f"Mean Absolute Error (MAE): {mae_rf:.4f}")
@@ -229,15 +358,6 @@ def main():
         print("\n LINEAR REGRESSION EVALUATION")
         print("-" * 40)
         
-        y_pred_reg_lr = lr.predict(X_test)
-
-        r2_lr = r2_score(y_test_reg, y_pred_reg_lr)
-        mse_lr = mean_squared_error(y_test_reg, y_pred_reg_lr)
-        rmse_lr = np.sqrt(mse_lr)
-
-        mae_lr = mean_absolute_error(y_test_reg, y_pred_reg_lr)
-        explained_variance_lr = explained_variance_score(y_test_reg, y_pred_reg_lr)
-        
         print(f"R-squared (R²): {r2_lr:.4f}")
         print(f"Root Mean Square Error (RMSE): {rmse_lr:.4f}")
         print(f"Mean Absolute Error (MAE): {mae_lr:.4f}")
@@ -247,17 +367,6 @@ def main():
         print(" K-FOLD CROSS VALIDATION (k=5)")
         print("=" * 60)
         
-        kfold = KFold(n_splits=5, shuffle=True, random_state=42)
-
-        cv_scores_clf = cross_val_score(rf_clf, X, y_classification, 
-                                       cv=kfold, scoring='accuracy')
-
-        cv_scores_reg_rf = cross_val_score(rf_reg, X, y_regression, 
-                                         cv=kfold, scoring='r2')
-
-        cv_scores_reg_lr = cross_val_score(lr, X, y_regression, 
-                                         cv=kfold, scoring='r2')
-        
         print("\n Random Forest Classifier CV Results:")
         print(f"  CV Accuracy Scores: {cv_scores_clf}")
         print(f"  Mean CV Accuracy: {cv_scores_clf.mean():.4f} (±{cv_scores_clf.std():.4f})")
@@ -339,16 +448,28 @@ def main():
         joblib.dump(rf_reg, 'assets/models/random_forest_regressor.pkl')
         joblib.dump(lr, 'assets/models/linear_regression.pkl')
         joblib.dump(encoders, 'assets/models/encoders.pkl')
+        save_reference(ReferenceBuilder().update(df), 'assets/models/drift_reference.json', df.attrs['source_sha256'])
+
+        # On-device copy of the classifier, checked against sklearn on every row
+        compact = export_compact(rf_clf, encoders, COMPACT_MODEL_PATH, features, X=X, frame=df)
+        parity = compact['parity']
+        print(f" Compact model {compact['model_version']}: {compact['size_bytes'] / 1024:.1f} KB, "
+              f"{compact['values']['bits']}-bit leaf values")
+        print(f"   parity on {parity['rows']} rows: {parity['label_mismatches']} label mismatch(es), "
+              f"{parity['feature_mismatches']} encoding mismatch(es), "
+              f"max probability error {parity['max_probability_error']:.2e}")
+        if not parity['exact']:
+            print("   WARNING: the compact model does not reproduce sklearn's predictions")
 
         evaluation_data = {
             'metadata': {
                 'model_type': 'advanced_dual_algorithms',
                 'trained_date': datetime.now().isoformat(),
                 'dataset': {
-                    'size': int(len(df)),
-                    'performance_distribution': convert_numpy_types(df['risk_level'].value_counts().to_dict()),
-                    'avg_english_score': float(df['english_avg'].mean()),
-                    'std_english_score': float(df['english_avg'].std()),
+                    'size': int(dataset['size']),
+                    'performance_distribution': convert_numpy_types(dataset['performance_distribution']),
+                    'avg_english_score': dataset['avg_english_score'],
+                    'std_english_score': dataset['std_english_score'],
                     'features_used': int(len(features))
                 }
             },
@@ -410,6 +531,14 @@ def main():
                     }
                 }
             },
+            'compact_model': {
+                'path': COMPACT_MODEL_PATH,
+                'model_version': compact['model_version'],
+                'format_version': compact['format_version'],
+                'size_bytes': compact['size_bytes'],
+                'value_bits': compact['values']['bits'],
+                'parity': parity
+            },
             'mappings': {
                 'app_to_model': {
                     'studyTimePerWeek': 'study_time_encoded',
@@ -420,11 +549,11 @@ def main():
                     'tutoring': 'has_tutoring',
                     'attendanceRate': 'Attendance Rate (%)'
                 },
-                'study_time': dict(zip(le_study.classes_, range(len(le_study.classes_)))),
-                'absences': dict(zip(le_absence.classes_, range(len(le_absence.classes_)))),
+                'study_time': dict(zip(encoders['study_time'].classes_, range(len(encoders['study_time'].classes_)))),
+                'absences': dict(zip(encoders['absence'].classes_, range(len(encoders['absence'].classes_)))),
                 'gender': {'Male': 0, 'Female': 1},
                 'tutoring': {'Prepared': 1, 'Not Prepared': 0},
-                'education': dict(zip(le_education.classes_, range(len(le_education.classes_))))
+                'education': dict(zip(encoders['education'].classes_, range(len(encoders['education'].classes_))))
             },
             'encoders': {
                 key: {'classes': encoder.classes_.tolist()}
@@ -450,7 +579,7 @@ def main():
 
         simplified = {
             'trained_date': datetime.now().strftime('%Y-%m-%d %H:%M'),
-            'dataset_size': int(len(df)),
+            'dataset_size': int(dataset['size']),
             'models': {
                 'random_forest_classifier': {
                     'accuracy': f"{accuracy:.1%}",
@@ -488,6 +617,8 @@ def main():
         print(f"  ✓ assets/models/linear_regression.pkl")
         print(f"  ✓ assets/models/evaluation_results.json")
         print(f"  ✓ assets/models/model_evaluation.json")
+        print(f"  ✓ assets/models/drift_reference.json")
+        print(f"  ✓ {COMPACT_MODEL_PATH}")
         
         print(f"\n FINAL MODEL PERFORMANCE:")
         print(f"   Random Forest Classifier: {accuracy:.1%} accuracy")
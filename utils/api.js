@@ -40,37 +40,67 @@ export const testApiConnection = async () => {
   }
 };
 
+const PREDICT_ATTEMPTS = 3;
+const RETRY_DELAY_MS = 500;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// One key per submission: every retry of the same student reuses it, so the
+// backend replays its first answer instead of predicting and saving again.
+const idempotencyKey = (studentData) =>
+  `predict-${studentData.id || Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+
 export const predictWithML = async (studentData) => {
-  try {
-    console.log('📤 Sending prediction request to:', `${API_URL}/predict`);
-    
-    const response = await fetch(`${API_URL}/predict`, {
-      method: 'POST',
-      headers: {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(studentData),
-    });
+  const key = idempotencyKey(studentData);
+  let lastError;
 
-    if (response.ok) {
-      const result = await response.json();
-      if (result.success) {
-        return {
-          studentId: studentData.id,
-          ...result.prediction,
-          createdAt: new Date().toISOString(),
-        };
-      } else {
+  for (let attempt = 1; attempt <= PREDICT_ATTEMPTS; attempt++) {
+    try {
+      console.log('📤 Sending prediction request to:', `${API_URL}/predict`);
+
+      const response = await fetch(`${API_URL}/predict`, {
+        method: 'POST',
+        headers: {
+          'Accept': 'application/json',
+          'Content-Type': 'application/json',
+          'Idempotency-Key': key,
+        },
+        body: JSON.stringify(studentData),
+      });
+
+      if (response.ok) {
+        const result = await response.json();
+        if (result.success) {
+          return {
+            studentId: studentData.id,
+            ...result.prediction,
+            createdAt: new Date().toISOString(),
+          };
+        }
         throw new Error(result.error || 'Prediction failed');
       }
-    } else {
-      throw new Error(`HTTP ${response.status}`);
+
+      lastError = new Error(`HTTP ${response.status}`);
+      // 409: the first attempt is still running; 5xx: nothing was stored
+      if (response.status !== 409 && response.status < 500) {
+        break;
+      }
+    } catch (error) {
+      // fetch rejects on network failures; anything else is final
+      if (!(error instanceof TypeError)) {
+        console.error('ML prediction failed:', error.message);
+        throw error;
+      }
+      lastError = error;
+    }
+
+    if (attempt < PREDICT_ATTEMPTS) {
+      await sleep(RETRY_DELAY_MS * attempt);
     }
-  } catch (error) {
-    console.error('ML prediction failed:', error.message);
-    throw error;
   }
+
+  console.error('ML prediction failed:', lastError.message);
+  throw lastError;
 };
 
 // Export as default object